@@ -0,0 +1,65 @@
+"""
+Measures the setup overhead of the snapshot fixture across a large generated parametrization.
+
+Usage: python benchmarks/bench_fixture_setup.py [--cases N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import textwrap
+import time
+
+import pytest
+
+TEST_MODULE = """
+import pytest
+
+@pytest.mark.parametrize('case', ['case {{}} / {{}}'.format(i, i % 7) for i in range({cases})])
+def test_case(snapshot, case):
+    pass
+"""
+
+
+class FixtureSetupTimer:
+    """
+    A pytest plugin that measures the time spent setting up the snapshot fixture.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        if fixturedef.argname != 'snapshot':
+            yield
+            return
+        start = time.perf_counter()
+        yield
+        self.duration += time.perf_counter() - start
+        self.count += 1
+
+
+def run(cases: int) -> FixtureSetupTimer:
+    timer = FixtureSetupTimer()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, 'test_generated.py'), 'w') as f:
+            f.write(textwrap.dedent(TEST_MODULE.format(cases=cases)))
+        exit_code = pytest.main(['-q', '-p', 'no:cacheprovider', '--rootdir', tmp_dir, tmp_dir], plugins=[timer])
+    if exit_code != 0:
+        sys.exit('pytest failed with exit code {}'.format(exit_code))
+    return timer
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', type=int, default=20000, help='Number of parametrized cases (default: 20000).')
+    args = parser.parse_args(argv)
+
+    timer = run(args.cases)
+    print('snapshot fixture setup: {:.3f}s for {} tests, {:.1f}us per test'.format(
+        timer.duration, timer.count, timer.duration / max(timer.count, 1) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
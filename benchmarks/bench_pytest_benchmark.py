@@ -0,0 +1,21 @@
+"""
+Runs the snapshot plugin benchmarks using pytest-benchmark:
+
+    pytest benchmarks/bench_pytest_benchmark.py --benchmark-autosave
+    pytest benchmarks/bench_pytest_benchmark.py --benchmark-compare --benchmark-compare-fail=min:25%
+"""
+import pytest
+
+from scenarios import BENCHMARKS, prepare
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.mark.parametrize('name', list(BENCHMARKS))
+def test_benchmark(benchmark, tmp_path_factory, name):
+    def setup():
+        workload = prepare(name, tmp_path_factory.mktemp('benchmark'))
+        return (workload.run,), {}
+
+    benchmark.extra_info['name'] = name
+    benchmark.pedantic(lambda run: run(), setup=setup, rounds=3)
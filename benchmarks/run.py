@@ -0,0 +1,127 @@
+"""
+Runs the snapshot plugin benchmarks and optionally compares them against a stored baseline.
+
+Usage:
+
+    python benchmarks/run.py                            # run all benchmarks
+    python benchmarks/run.py -k small --scale 0.1       # run a subset with smaller snapshots
+    python benchmarks/run.py --save baseline.json       # store the results as a baseline
+    python benchmarks/run.py --compare baseline.json    # fail if a benchmark got slower than the baseline
+
+Every benchmark is timed ``--repeat`` times, each time on freshly prepared snapshots, and the fastest run is reported
+along with its throughput. Peak memory is measured in an additional run using ``tracemalloc``, so it only includes
+memory allocated by Python, not memory-mapped snapshot files.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from scenarios import BENCHMARKS, Workload, prepare
+
+DEFAULT_MAX_SLOWDOWN = 1.25
+
+
+def _run_prepared(name: str, scale: float, measure: Callable[[Workload], float]) -> Tuple[float, Workload]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workload = prepare(name, Path(tmp_dir), scale)
+        gc.collect()
+        return measure(workload), workload
+
+
+def _time(workload: Workload) -> float:
+    start = time.perf_counter()
+    workload.run()
+    return time.perf_counter() - start
+
+
+def _peak_memory(workload: Workload) -> float:
+    tracemalloc.start()
+    try:
+        workload.run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(name: str, scale: float, repeat: int) -> dict:
+    seconds, workload = min((_run_prepared(name, scale, _time) for _ in range(repeat)), key=lambda r: r[0])
+    peak_memory, _ = _run_prepared(name, scale, _peak_memory)
+    return {
+        'seconds': seconds,
+        'snapshots_per_second': workload.snapshots / seconds,
+        'mb_per_second': workload.size / seconds / (1 << 20),
+        'peak_memory_mb': peak_memory / (1 << 20),
+    }
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float) -> List[str]:
+    """
+    Returns the names of the benchmarks that are more than ``max_slowdown`` times slower than the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is not None and result['seconds'] > base['seconds'] * max_slowdown:
+            regressions.append(name)
+    return regressions
+
+
+def _format_row(name: str, result: dict, base: Optional[dict]) -> str:
+    row = '{:<36} {:>9.3f}s {:>12.0f} {:>10.1f} {:>10.1f}'.format(
+        name, result['seconds'], result['snapshots_per_second'], result['mb_per_second'], result['peak_memory_mb'])
+    if base is not None:
+        row += ' {:>+8.1%}'.format(result['seconds'] / base['seconds'] - 1)
+    return row
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', dest='keyword', default='', help='Only run benchmarks whose name contains KEYWORD.')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Scale the number and size of the snapshots (default: 1.0).')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per benchmark (default: 3).')
+    parser.add_argument('--save', metavar='PATH', help='Save the results as json, to be used as a baseline.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare the results against a baseline saved by --save.')
+    parser.add_argument('--max-slowdown', type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help='With --compare, fail if a benchmark is this many times slower than the baseline '
+                             '(default: {}).'.format(DEFAULT_MAX_SLOWDOWN))
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        baseline = saved['results']
+        if saved['scale'] != args.scale:
+            print('warning: the baseline was recorded with --scale {}'.format(saved['scale']), file=sys.stderr)
+
+    print('{:<36} {:>10} {:>12} {:>10} {:>10}{}'.format(
+        'benchmark', 'time', 'snapshots/s', 'MB/s', 'peak MB', '   change' if baseline else ''))
+    results = {}
+    for name in BENCHMARKS:
+        if args.keyword not in name:
+            continue
+        results[name] = run_benchmark(name, args.scale, args.repeat)
+        print(_format_row(name, results[name], baseline.get(name)), flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'scale': args.scale, 'results': results}, f, indent=2)
+
+    regressions = compare(results, baseline, args.max_slowdown)
+    if regressions:
+        print('{} benchmarks are more than {}x slower than the baseline: {}'.format(
+            len(regressions), args.max_slowdown, ', '.join(regressions)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Synthetic workloads for the snapshot plugin's hot paths.
+
+Every scenario prepares its snapshots and values in a temporary directory, and returns a ``Workload``
+whose ``run`` function is the part that is timed. Snapshot scenarios are run both comparing against existing
+snapshots and creating them with --snapshot-update.
+"""
+import functools
+import os
+import textwrap
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from pytest_snapshot.plugin import Snapshot, _file_decode, _file_encode
+from pytest_snapshot._utils import flatten_filesystem_dict
+
+
+class Workload:
+    """
+    The timed part of a scenario, along with the number of snapshots and bytes it handles.
+    """
+    def __init__(self, run: Callable[[], None], snapshots: int, size: int):
+        self.run = run
+        self.snapshots = snapshots
+        self.size = size
+
+
+def _scaled(count: int, scale: float) -> int:
+    return max(1, int(count * scale))
+
+
+def _assert_snapshots(snapshot_dir: Path, update: bool, assertions: Callable[[Snapshot], None]) -> None:
+    try:
+        with Snapshot(update, False, snapshot_dir) as snapshot:
+            assertions(snapshot)
+    except pytest.fail.Exception:
+        # Updating snapshots fails the test to report the modified snapshots.
+        if not update:
+            raise
+
+
+def _prepare(snapshot_dir: Path, update: bool, assertions: Callable[[Snapshot], None]) -> None:
+    """
+    Creates the snapshots when comparing, so that the timed run compares against existing snapshots.
+    When updating, the timed run creates the snapshots.
+    """
+    if not update:
+        _assert_snapshots(snapshot_dir, True, assertions)
+
+
+def many_small_snapshots(tmp_dir: Path, scale: float, update: bool) -> Workload:
+    count = _scaled(5000, scale)
+    values = ['line {}\n'.format(i) * 40 for i in range(count)]
+    snapshot_dir = tmp_dir.joinpath('snapshots', 'small')
+
+    def assertions(snapshot):
+        for i, value in enumerate(values):
+            snapshot.assert_match(value, 'snapshot_{}.txt'.format(i))
+
+    _prepare(snapshot_dir, update, assertions)
+    return Workload(lambda: _assert_snapshots(snapshot_dir, update, assertions),
+                    count, sum(len(v) for v in values))
+
+
+def few_huge_snapshots(tmp_dir: Path, scale: float, update: bool) -> Workload:
+    count = 4
+    size = _scaled(32 << 20, scale)
+    values = [bytes([i]) * size for i in range(count)]
+    snapshot_dir = tmp_dir.joinpath('snapshots', 'huge')
+
+    def assertions(snapshot):
+        for i, value in enumerate(values):
+            snapshot.assert_match(value, 'snapshot_{}.bin'.format(i))
+
+    _prepare(snapshot_dir, update, assertions)
+    return Workload(lambda: _assert_snapshots(snapshot_dir, update, assertions), count, count * size)
+
+
+def _tree(depth: int, width: int, prefix: str = '') -> dict:
+    if depth == 0:
+        return {'file_{}{}.txt'.format(prefix, i): 'value {}{}\n'.format(prefix, i) for i in range(width)}
+    return {'dir_{}'.format(i): _tree(depth - 1, width, '{}{}_'.format(prefix, i)) for i in range(width)}
+
+
+def deep_directory_tree(tmp_dir: Path, scale: float, update: bool) -> Workload:
+    tree = _tree(_scaled(6, scale), 3)
+    snapshot_dir = tmp_dir.joinpath('snapshots', 'tree')
+    files = flatten_filesystem_dict(tree)
+
+    def assertions(snapshot):
+        snapshot.assert_match_dir(tree, 'tree')
+
+    _prepare(snapshot_dir, update, assertions)
+    return Workload(lambda: _assert_snapshots(snapshot_dir, update, assertions),
+                    len(files), sum(len(v) for v in files.values()))
+
+
+PARAMETRIZED_TEST_MODULE = """
+import pytest
+
+@pytest.mark.parametrize('case', range({cases}))
+def test_case(snapshot, case):
+    snapshot.assert_match('case {{}}\\n'.format(case), 'case.txt')
+"""
+
+
+def parametrized_tests(tmp_dir: Path, scale: float, update: bool) -> Workload:
+    cases = _scaled(5000, scale)
+    test_dir = tmp_dir.joinpath('tests')
+    test_dir.mkdir()
+    # A unique module name keeps pytest from finding the module of an earlier benchmark in sys.modules.
+    module_name = 'test_parametrized_{}.py'.format(uuid.uuid4().hex)
+    test_dir.joinpath(module_name).write_text(textwrap.dedent(PARAMETRIZED_TEST_MODULE.format(cases=cases)))
+    args = [str(test_dir), '-p', 'no:cacheprovider', '-p', 'no:terminal', '--rootdir', str(test_dir)]
+
+    def run(update):
+        exit_code = pytest.main(args + (['--snapshot-update'] if update else []))
+        # Updating snapshots fails the test to report the modified snapshots.
+        if exit_code != (1 if update else 0):
+            raise RuntimeError('pytest exited with {}'.format(exit_code))
+
+    if not update:
+        run(True)
+    return Workload(lambda: run(update), cases, sum(len('case {}\n'.format(i)) for i in range(cases)))
+
+
+def flatten_large_dict(tmp_dir: Path, scale: float) -> Workload:
+    tree = _tree(_scaled(8, scale), 3)
+    count = len(flatten_filesystem_dict(tree))
+    return Workload(lambda: flatten_filesystem_dict(tree), count, 0)
+
+
+def _large_text(scale: float) -> str:
+    return 'snapshot line with some text\n' * _scaled(1 << 19, scale)
+
+
+def encode_text(tmp_dir: Path, scale: float) -> Workload:
+    text = _large_text(scale)
+    return Workload(lambda: _file_encode(text), 1, len(text))
+
+
+def decode_text(tmp_dir: Path, scale: float) -> Workload:
+    encoded = _file_encode(_large_text(scale))
+    return Workload(lambda: _file_decode(encoded), 1, len(encoded))
+
+
+SNAPSHOT_SCENARIOS = {
+    'many_small_snapshots': many_small_snapshots,
+    'few_huge_snapshots': few_huge_snapshots,
+    'deep_directory_tree': deep_directory_tree,
+    'parametrized_tests': parametrized_tests,
+}
+
+# Maps the name of every benchmark to a function taking a temporary directory and a scale factor.
+BENCHMARKS = {}  # type: Dict[str, Callable[[Path, float], Workload]]
+for _name, _scenario in SNAPSHOT_SCENARIOS.items():
+    BENCHMARKS['{}[compare]'.format(_name)] = functools.partial(_scenario, update=False)
+    BENCHMARKS['{}[update]'.format(_name)] = functools.partial(_scenario, update=True)
+BENCHMARKS['flatten_filesystem_dict'] = flatten_large_dict
+BENCHMARKS['file_encode'] = encode_text
+BENCHMARKS['file_decode'] = decode_text
+
+
+def prepare(name: str, tmp_dir: Path, scale: float = 1.0) -> Workload:
+    """
+    Prepares the benchmark ``name`` in ``tmp_dir``, scaling the number or size of its snapshots by ``scale``.
+    """
+    os.makedirs(str(tmp_dir), exist_ok=True)
+    return BENCHMARKS[name](tmp_dir, scale=scale)
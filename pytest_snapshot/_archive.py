@@ -0,0 +1,175 @@
+"""
+Archives of snapshot changes, recorded by --snapshot-update-output and applied by --snapshot-apply.
+
+An archive is a zip file containing a json manifest that lists the written and deleted snapshots,
+and the new contents of every written snapshot. Snapshots are named by their posix paths relative to the pytest
+rootdir, so archives recorded in different checkouts, for example by the shards of a CI job,
+can be applied to a single working tree.
+"""
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from pytest_snapshot._utils import might_be_valid_filename, temp_path_for
+
+ARCHIVE_VERSION = 1
+_MANIFEST_NAME = 'snapshot-archive.json'
+_FILES_PREFIX = 'files/'
+
+
+def to_archive_name(path: str, root: str) -> str:
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def is_valid_archive_name(name: str) -> bool:
+    """
+    Returns false if ``name`` is not a relative posix path of valid filenames, for example an absolute path
+    or a path containing "..", which would escape the directory the archive is applied to.
+    """
+    return isinstance(name, str) and all(might_be_valid_filename(part) for part in name.split('/'))
+
+
+def from_archive_name(name: str, root: str) -> str:
+    if not is_valid_archive_name(name):
+        raise ValueError('invalid snapshot name {!r}'.format(name))
+    return os.path.join(root, *name.split('/'))
+
+
+def write_archive(path: str, written: Mapping[str, bytes], deleted: Iterable[str]) -> None:
+    """
+    Writes an archive of the ``written`` snapshots, mapping archive names to contents,
+    and the archive names of the ``deleted`` snapshots.
+    The contents are looked up one snapshot at a time, so ``written`` may read them on demand.
+
+    The archive is written to a temporary file that is renamed over ``path``.
+    """
+    temp_path = temp_path_for(Path(path))
+    try:
+        with zipfile.ZipFile(str(temp_path), 'x', compression=zipfile.ZIP_DEFLATED) as archive:
+            manifest = {'version': ARCHIVE_VERSION, 'written': sorted(written), 'deleted': sorted(deleted)}
+            archive.writestr(_MANIFEST_NAME, json.dumps(manifest, indent=1))
+            for name in sorted(written):
+                archive.writestr(_FILES_PREFIX + name, written[name])
+        os.replace(str(temp_path), path)
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+
+class SnapshotArchive:
+    """
+    An archive opened for reading. The contents of written snapshots are only read when they are needed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            self._zip = zipfile.ZipFile(path)
+        except zipfile.BadZipFile:
+            raise ValueError('{} is not a snapshot archive'.format(path)) from None
+        try:
+            manifest = json.loads(self._zip.read(_MANIFEST_NAME).decode())
+        except KeyError:
+            self._zip.close()
+            raise ValueError('{} is not a snapshot archive'.format(path)) from None
+        if manifest.get('version') != ARCHIVE_VERSION:
+            self._zip.close()
+            raise ValueError('{} has unsupported snapshot archive version {!r}'.format(path, manifest.get('version')))
+        self.written = manifest['written']  # type: List[str]
+        self.deleted = manifest['deleted']  # type: List[str]
+        for name in self.written + self.deleted:
+            if not is_valid_archive_name(name):
+                self._zip.close()
+                raise ValueError('{} contains the invalid snapshot name {!r}'.format(path, name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def read(self, name: str) -> bytes:
+        return self._zip.read(_FILES_PREFIX + name)
+
+    def same_contents(self, name: str, other: 'SnapshotArchive') -> bool:
+        """
+        Returns true if the snapshot ``name`` was written with the same contents to this archive and ``other``.
+        """
+        info = self._zip.getinfo(_FILES_PREFIX + name)
+        other_info = other._zip.getinfo(_FILES_PREFIX + name)
+        if (info.CRC, info.file_size) != (other_info.CRC, other_info.file_size):
+            return False
+        return self.read(name) == other.read(name)
+
+
+def merge_archives(archives: Iterable[SnapshotArchive]) -> Tuple[Dict[str, Tuple[SnapshotArchive, bool]], List[str]]:
+    """
+    Returns the change of every snapshot in ``archives`` and a description of every conflict.
+
+    A change is a 2-tuple of the first archive containing it and whether the snapshot is written (or deleted).
+    Archives conflict on a snapshot unless they all delete it or all write the same contents to it.
+    """
+    changes = {}  # type: Dict[str, Tuple[SnapshotArchive, bool]]
+    conflicts = []  # type: List[str]
+    for archive in archives:
+        for names, written in ((archive.written, True), (archive.deleted, False)):
+            for name in names:
+                if name not in changes:
+                    changes[name] = (archive, written)
+                    continue
+                other, other_written = changes[name]
+                if written and other_written and not archive.same_contents(name, other):
+                    conflicts.append('{}: written with different contents by {} and {}'.format(
+                        name, other.path, archive.path))
+                elif written != other_written:
+                    conflicts.append('{}: {} by {} but {} by {}'.format(
+                        name, 'written' if other_written else 'deleted', other.path,
+                        'written' if written else 'deleted', archive.path))
+    return changes, sorted(conflicts)
+
+
+def combine_archives(paths: List[str], output_path: str) -> List[str]:
+    """
+    Merges the archives ``paths`` into a single archive at ``output_path``, which may be one of ``paths``.
+
+    Returns a description of every conflict. Conflicting snapshots keep the change of the first archive.
+    """
+    archives = []  # type: List[SnapshotArchive]
+    try:
+        for path in paths:
+            archives.append(SnapshotArchive(path))
+        changes, conflicts = merge_archives(archives)
+        written = {name: archive.read(name) for name, (archive, is_written) in changes.items() if is_written}
+        deleted = [name for name, (_, is_written) in changes.items() if not is_written]
+    finally:
+        for archive in archives:
+            archive.close()
+    write_archive(output_path, written, deleted)
+    return conflicts
+
+
+def apply_changes(changes: Dict[str, Tuple[SnapshotArchive, bool]], root: str, storage) -> Tuple[int, int]:
+    """
+    Writes and deletes the snapshots below ``root`` according to ``changes``, as returned by ``merge_archives``.
+
+    Returns the number of written and deleted snapshots.
+    """
+    written_count = 0
+    deleted_count = 0
+    for name in sorted(changes):
+        archive, written = changes[name]
+        path = from_archive_name(name, root)
+        storage.open_dir(os.path.dirname(path))
+        if written:
+            storage.write(path, archive.read(name))
+            written_count += 1
+        elif storage.is_file(path):
+            storage.delete(path)
+            deleted_count += 1
+    storage.commit()
+    return written_count, deleted_count
@@ -0,0 +1,83 @@
+"""
+Tolerance-aware comparison of NumPy arrays, used by ``assert_match_array``.
+
+Mismatches are summarized without converting whole arrays to strings, so huge arrays produce short messages.
+"""
+from typing import Any, List, Optional
+
+# Mismatching elements are listed up to this many per mismatch.
+MAX_REPORTED_INDICES = 10
+# The mask of mismatching elements is searched for the first mismatches this many elements at a time.
+_SEARCH_CHUNK_SIZE = 1 << 20
+
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('assert_match_array requires numpy to be installed') from None
+    return numpy
+
+
+def _first_indices(mask, count: int) -> List[int]:
+    """
+    Returns the flat indices of the first ``count`` true elements of the boolean array ``mask``.
+    """
+    numpy = import_numpy()
+    flat_mask = mask.reshape(-1)
+    indices = []  # type: List[int]
+    for start in range(0, flat_mask.size, _SEARCH_CHUNK_SIZE):
+        found = numpy.flatnonzero(flat_mask[start:start + _SEARCH_CHUNK_SIZE])[:count - len(indices)]
+        indices.extend(start + int(i) for i in found)
+        if len(indices) >= count:
+            break
+    return indices
+
+
+def _max_ignoring_nan(errors) -> float:
+    numpy = import_numpy()
+    errors = errors[~numpy.isnan(errors)]
+    return float(errors.max()) if errors.size else float('nan')
+
+
+def compare_arrays(value: Any, expected: Any, rtol: float, atol: float) -> Optional[str]:
+    """
+    Compares the array ``value`` to the array ``expected`` like ``numpy.isclose``, treating NaNs as equal.
+
+    Arrays of non-numeric dtypes are compared exactly.
+    Returns None if they match, otherwise returns a summary of the mismatching elements.
+    """
+    numpy = import_numpy()
+    if value.shape != expected.shape:
+        return 'shape {} != {}'.format(value.shape, expected.shape)
+    if value.dtype != expected.dtype:
+        return 'dtype {} != {}'.format(value.dtype, expected.dtype)
+
+    numeric = value.dtype.kind in 'iufc'
+    if numeric:
+        mismatch = ~numpy.isclose(value, expected, rtol=rtol, atol=atol, equal_nan=True)
+    else:
+        mismatch = value != expected
+    mismatch_count = int(numpy.count_nonzero(mismatch))
+    if mismatch_count == 0:
+        return None
+
+    lines = ['{} of {} elements differ'.format(mismatch_count, value.size)]
+    if numeric:
+        lines[0] += ' (rtol={}, atol={})'.format(rtol, atol)
+        error_type = numpy.result_type(value.dtype, numpy.float64)
+        mismatching_value = value[mismatch].astype(error_type)
+        mismatching_expected = expected[mismatch].astype(error_type)
+        absolute_errors = numpy.abs(mismatching_value - mismatching_expected)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            relative_errors = absolute_errors / numpy.abs(mismatching_expected)
+        lines.append('max absolute error: {:g}'.format(_max_ignoring_nan(absolute_errors)))
+        lines.append('max relative error: {:g}'.format(_max_ignoring_nan(relative_errors)))
+
+    lines.append('first differing elements:' if mismatch_count > 1 else 'differing element:')
+    for flat_index in _first_indices(mismatch, MAX_REPORTED_INDICES):
+        index = tuple(int(i) for i in numpy.unravel_index(flat_index, value.shape))
+        lines.append('  {}: {!r} != {!r}'.format(list(index), value[index].item(), expected[index].item()))
+    if mismatch_count > MAX_REPORTED_INDICES:
+        lines.append('  ... and {} more'.format(mismatch_count - MAX_REPORTED_INDICES))
+    return '\n'.join(lines)
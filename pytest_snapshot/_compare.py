@@ -0,0 +1,140 @@
+import mmap
+from contextlib import contextmanager
+from typing import AnyStr, Iterable, Optional
+
+COMPARE_CHUNK_SIZE = 1 << 20
+HEXDUMP_CONTEXT = 32
+HEXDUMP_WIDTH = 16
+TEXT_CONTEXT = 40
+
+
+def hexdump(data: bytes, start_offset: int) -> str:
+    """
+    Returns a classic hexdump of ``data``, labelling the first byte with ``start_offset``.
+    """
+    lines = []
+    for i in range(0, len(data), HEXDUMP_WIDTH):
+        row = data[i:i + HEXDUMP_WIDTH]
+        hex_part = ' '.join('{:02x}'.format(b) for b in row)
+        text_part = ''.join(chr(b) if 0x20 <= b < 0x7f else '.' for b in row)
+        lines.append('{:08x}  {:<{}}  |{}|'.format(start_offset + i, hex_part, HEXDUMP_WIDTH * 3 - 1, text_part))
+    return '\n'.join(lines)
+
+
+def _first_difference(a, b) -> int:
+    """
+    Returns the index of the first byte that differs between the bytes-like objects ``a`` and ``b``.
+    """
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return i
+    return min(len(a), len(b))
+
+
+def compare_bytes_to_file(value: bytes, path: str, size: int, chunk_size: int = COMPARE_CHUNK_SIZE) -> Optional[str]:
+    """
+    Compares ``value`` to the contents of the file ``path`` of the given ``size`` without reading the whole file.
+
+    Returns None if they are equal, otherwise returns a message describing the first difference.
+    """
+    with map_file(path, size) as mapped:
+        return compare_bytes(value, mapped, chunk_size)
+
+
+@contextmanager
+def map_file(path: str, size: int):
+    """
+    Yields a read-only memory map of the file ``path`` of the given ``size``.
+
+    The map is a bytes-like object that can be compared one chunk at a time without reading the whole file.
+    """
+    if size == 0:
+        # Empty files can't be memory-mapped.
+        yield b''
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+def compare_bytes(value: bytes, expected, chunk_size: int = COMPARE_CHUNK_SIZE) -> Optional[str]:
+    """
+    Compares ``value`` to the bytes-like object ``expected``, for example a memory map, one chunk at a time.
+
+    Returns None if they are equal, otherwise returns a message describing the first difference.
+    """
+    value_view = memoryview(value)
+    expected_view = memoryview(expected)
+    try:
+        size = expected_view.nbytes
+        common_length = min(len(value), size)
+        for start in range(0, common_length, chunk_size):
+            end = min(start + chunk_size, common_length)
+            if value_view[start:end] != expected_view[start:end]:
+                offset = start + _first_difference(value_view[start:end], expected_view[start:end])
+                return _mismatch_message(value, expected_view, offset, size)
+        if len(value) != size:
+            return _mismatch_message(value, expected_view, common_length, size)
+        return None
+    finally:
+        expected_view.release()
+        value_view.release()
+
+
+def _mismatch_message(value: bytes, expected, offset: int, size: int) -> str:
+    window_start = max(offset - HEXDUMP_CONTEXT, 0) // HEXDUMP_WIDTH * HEXDUMP_WIDTH
+    window_end = offset + HEXDUMP_CONTEXT
+    return '\n'.join([
+        'bytes differ at offset {} (value has {} bytes, snapshot has {} bytes)'.format(offset, len(value), size),
+        'value:',
+        hexdump(value[window_start:window_end], window_start) or '(no bytes)',
+        'snapshot:',
+        hexdump(bytes(expected[window_start:window_end]), window_start) or '(no bytes)',
+    ])
+
+
+def compare_stream_to_file(chunks: Iterable[AnyStr], path: str, binary: bool) -> Optional[str]:
+    """
+    Compares the concatenation of ``chunks`` to the contents of the file ``path``, one chunk at a time.
+
+    Text chunks are compared to the file decoded as UTF-8 with universal newlines.
+    Returns None if they are equal, otherwise returns a message describing the first difference.
+    """
+    offset = 0
+    line = 1
+    with open(path, 'rb') if binary else open(path, 'r', encoding='utf-8', newline=None) as f:
+        for chunk in chunks:
+            expected = f.read(len(chunk))
+            if expected != chunk:
+                index = _first_difference(chunk, expected)
+                if binary:
+                    return _stream_bytes_mismatch_message(chunk, expected, offset, index)
+                return _stream_text_mismatch_message(chunk, expected, offset, index, line + chunk.count('\n', 0, index))
+            offset += len(chunk)
+            if not binary:
+                line += chunk.count('\n')
+        if f.read(1):
+            return 'value ends at offset {} but the snapshot continues'.format(offset)
+    return None
+
+
+def _stream_bytes_mismatch_message(chunk: bytes, expected: bytes, chunk_offset: int, index: int) -> str:
+    window_start = max(index - HEXDUMP_CONTEXT, 0)
+    window_end = index + HEXDUMP_CONTEXT
+    start_offset = chunk_offset + window_start
+    return '\n'.join([
+        'bytes differ at offset {}'.format(chunk_offset + index),
+        'value:',
+        hexdump(chunk[window_start:window_end], start_offset) or '(no bytes)',
+        'snapshot:',
+        hexdump(expected[window_start:window_end], start_offset) or '(no bytes)',
+    ])
+
+
+def _stream_text_mismatch_message(chunk: str, expected: str, chunk_offset: int, index: int, line: int) -> str:
+    window_start = max(index - TEXT_CONTEXT, 0)
+    window_end = index + TEXT_CONTEXT
+    return '\n'.join([
+        'text differs at character offset {} (line {})'.format(chunk_offset + index, line),
+        'value:    {!r}'.format(chunk[window_start:window_end]),
+        'snapshot: {!r}'.format(expected[window_start:window_end]),
+    ])
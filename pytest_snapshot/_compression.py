@@ -0,0 +1,107 @@
+import gzip
+import io
+import lzma
+from typing import Callable, Optional
+
+try:
+    # Python >=3.14.
+    from compression import zstd as _zstd
+except ImportError:
+    _zstd = None
+if _zstd is None:
+    try:
+        import zstandard as _zstandard
+    except ImportError:
+        _zstandard = None
+
+DEFAULT_COMPRESSION_THRESHOLD = 64 << 10
+# Compressed snapshots are stored with this and the suffix of their codec appended to their names, so that files
+# such as "data.gz" that were snapshotted as they are can't be mistaken for compressed snapshots.
+COMPRESSED_MARKER = '.compressed'
+
+
+class Codec:
+    """
+    A compression format. Compressed snapshots are stored with ``stored_suffix`` appended to their names,
+    for example "data.json.compressed.gz".
+    """
+    def __init__(self, name: str, suffix: str, compress: Optional[Callable[[bytes], bytes]],
+                 decompress: Optional[Callable[[bytes], bytes]], requirement: str = ''):
+        self.name = name
+        self.suffix = suffix
+        self._compress = compress
+        self._decompress = decompress
+        self._requirement = requirement
+
+    @property
+    def stored_suffix(self) -> str:
+        return COMPRESSED_MARKER + self.suffix
+
+    @property
+    def available(self) -> bool:
+        return self._compress is not None
+
+    def _check_available(self) -> None:
+        if not self.available:
+            raise RuntimeError('{} compression requires {}'.format(self.name, self._requirement))
+
+    def compress(self, data: bytes) -> bytes:
+        self._check_available()
+        return self._compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        self._check_available()
+        return self._decompress(data)
+
+
+def _gzip_compress(data: bytes) -> bytes:
+    # gzip.compress only accepts mtime since Python 3.8. A fixed mtime keeps compressed snapshots reproducible.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def _zstd_codec() -> Codec:
+    if _zstd is not None:
+        return Codec('zstd', '.zst', _zstd.compress, _zstd.decompress)
+    if _zstandard is not None:
+        return Codec('zstd', '.zst',
+                     lambda data: _zstandard.ZstdCompressor().compress(data),
+                     lambda data: _zstandard.ZstdDecompressor().decompress(data))
+    return Codec('zstd', '.zst', None, None, requirement='Python >=3.14 or the zstandard package')
+
+
+CODECS = {codec.name: codec for codec in [
+    _zstd_codec(),
+    Codec('gzip', '.gz', _gzip_compress, gzip.decompress),
+    Codec('lzma', '.xz', lzma.compress, lzma.decompress),
+]}
+CODECS_BY_SUFFIX = {codec.stored_suffix: codec for codec in CODECS.values()}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Returns the codec with the given name. "auto" is zstd if it is available, otherwise gzip.
+
+    Raises ``ValueError`` if there is no such codec or it is not available.
+    """
+    if name == 'auto':
+        return CODECS['zstd'] if CODECS['zstd'].available else CODECS['gzip']
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError('unknown compression {!r}, expected one of: auto, {}'.format(name, ', '.join(CODECS)))
+    if not codec.available:
+        raise ValueError('{} compression requires {}'.format(codec.name, codec._requirement))
+    return codec
+
+
+def split_suffix(name: str):
+    """
+    Returns a 2-tuple of ``name`` without its stored compression suffix, for example ".compressed.gz",
+    and the codec of that suffix, or of ``name`` and None if it doesn't end with a stored compression suffix.
+    """
+    for suffix, codec in CODECS_BY_SUFFIX.items():
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)], codec
+    return name, None
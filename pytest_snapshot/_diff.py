@@ -0,0 +1,212 @@
+import difflib
+from bisect import bisect_left
+from itertools import chain
+from typing import Iterator, List, Sequence, Tuple
+
+DEFAULT_CONTEXT = 3
+DEFAULT_MAX_HUNKS = 20
+DEFAULT_DIFF_LIMIT = 10000
+# Regions without unique lines that are smaller than this (in compared line pairs) are diffed using difflib.
+DIFFLIB_MAX_REGION = 1 << 20
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _line_ids(a: List[str], b: List[str]) -> Tuple[List[int], List[int]]:
+    """
+    Returns ``a`` and ``b`` with every line replaced by an integer that is equal for equal lines.
+    """
+    ids = {}  # type: Dict[str, int]
+    return [ids.setdefault(line, len(ids)) for line in a], [ids.setdefault(line, len(ids)) for line in b]
+
+
+def _unique_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """
+    Returns the longest increasing sequence of index pairs of lines that appear exactly once in both ranges.
+    """
+    a_counts = {}  # type: Dict[int, int]
+    for i in range(alo, ahi):
+        a_counts[a[i]] = a_counts.get(a[i], 0) + 1
+    b_positions = {}  # type: Dict[int, int]
+    for j in range(blo, bhi):
+        line = b[j]
+        if a_counts.get(line) == 1:
+            b_positions[line] = -1 if line in b_positions else j
+    pairs = [(i, b_positions[a[i]]) for i in range(alo, ahi)
+             if a_counts[a[i]] == 1 and b_positions.get(a[i], -1) != -1]
+
+    # Patience sorting to find the longest subsequence of pairs that is increasing in b.
+    tails = []  # type: List[int]
+    tail_indices = []  # type: List[int]
+    predecessors = []  # type: List[int]
+    for index, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        predecessors.append(tail_indices[k - 1] if k > 0 else -1)
+        if k == len(tails):
+            tails.append(j)
+            tail_indices.append(index)
+        else:
+            tails[k] = j
+            tail_indices[k] = index
+    result = []
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        result.append(pairs[index])
+        index = predecessors[index]
+    result.reverse()
+    return result
+
+
+def _matching_lines(a: List[int], b: List[int]) -> List[Tuple[int, int]]:
+    """
+    Returns the sorted index pairs of matching lines in a patience diff of ``a`` and ``b``.
+    """
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            matches.extend(anchors)
+            starts = [(alo, blo)] + [(i + 1, j + 1) for i, j in anchors]
+            ends = [(i, j) for i, j in anchors] + [(ahi, bhi)]
+            stack.extend((i1, i2, j1, j2) for (i1, j1), (i2, j2) in zip(starts, ends))
+        elif (ahi - alo) * (bhi - blo) <= DIFFLIB_MAX_REGION:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                matches.extend((alo + i + k, blo + j + k) for k in range(size))
+    matches.sort()
+    return matches
+
+
+def diff_opcodes(a: List[str], b: List[str]) -> List[Opcode]:
+    """
+    Returns difflib-style opcodes describing how to turn the lines ``a`` into the lines ``b``.
+
+    Lines are replaced by integer ids and aligned using a patience diff,
+    so the running time is close to linear for large inputs that are mostly equal.
+    """
+    a_ids, b_ids = _line_ids(a, b)
+    opcodes = []
+    i = j = 0
+    for mi, mj in _matching_lines(a_ids, b_ids) + [(len(a), len(b))]:
+        if i < mi and j < mj:
+            opcodes.append(('replace', i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(('delete', i, mi, j, mj))
+        elif j < mj:
+            opcodes.append(('insert', i, mi, j, mj))
+        if mi < len(a) or mj < len(b):
+            if opcodes and opcodes[-1][0] == 'equal':
+                tag, i1, _, j1, _ = opcodes.pop()
+                opcodes.append(('equal', i1, mi + 1, j1, mj + 1))
+            else:
+                opcodes.append(('equal', mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return opcodes
+
+
+def group_opcodes(opcodes: Sequence[Opcode], context: int) -> Iterator[List[Opcode]]:
+    """
+    Yields hunks of opcodes with up to ``context`` lines of equal context around each change.
+    This is the grouping used by ``difflib.SequenceMatcher.get_grouped_opcodes``.
+    """
+    codes = list(opcodes)
+    if not codes:
+        return
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+
+    group = []  # type: List[Opcode]
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == 'equal' and i2 - i1 > 2 * context:
+            group.append((tag, i1, i1 + context, j1, j1 + context))
+            yield group
+            group = []
+            i1, j1 = i2 - context, j2 - context
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+
+def _split_lines(text: str) -> List[str]:
+    """
+    Returns the lines of ``text`` including their newlines. Unlike ``str.splitlines``, only "\\n" ends a line.
+    """
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _hunk_lines(a: List[str], b: List[str], hunk: List[Opcode]) -> Iterator[str]:
+    i1, i2, j1, j2 = hunk[0][1], hunk[-1][2], hunk[0][3], hunk[-1][4]
+    yield '@@ -{} +{} @@'.format(_format_range(i1, i2), _format_range(j1, j2))
+    for tag, i1, i2, j1, j2 in hunk:
+        if tag == 'equal':
+            for line in a[i1:i2]:
+                yield _format_line(' ', line)
+            continue
+        for line in a[i1:i2]:
+            yield _format_line('-', line)
+        for line in b[j1:j2]:
+            yield _format_line('+', line)
+
+
+def _format_range(start: int, stop: int) -> str:
+    # Same format as difflib.unified_diff.
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    if length == 0:
+        return '{},0'.format(start)
+    return '{},{}'.format(start + 1, length)
+
+
+def _format_line(prefix: str, line: str) -> str:
+    if line.endswith('\n'):
+        return prefix + line[:-1]
+    return prefix + line + '\n\\ No newline at end of file'
+
+
+def unified_diff(expected: str, value: str, context: int = DEFAULT_CONTEXT, max_hunks: int = DEFAULT_MAX_HUNKS,
+                 limit: int = DEFAULT_DIFF_LIMIT) -> str:
+    """
+    Returns a unified diff from the snapshot text ``expected`` to the tested text ``value``.
+
+    Every hunk shows ``context`` lines of unchanged text around the changes.
+    At most ``max_hunks`` hunks and ``limit`` characters of diff lines are rendered.
+    """
+    a = _split_lines(expected)
+    b = _split_lines(value)
+    hunks = list(group_opcodes(diff_opcodes(a, b), context))
+    lines = ['--- snapshot', '+++ value']
+    size = 0
+    truncated_option = '--snapshot-diff-hunks' if len(hunks) > max_hunks else None
+    for line in chain.from_iterable(_hunk_lines(a, b, hunk) for hunk in hunks[:max_hunks]):
+        if size + len(line) > limit:
+            lines.append(line[:limit - size] + '...')
+            truncated_option = '--snapshot-diff-limit'
+            break
+        lines.append(line)
+        size += len(line)
+    if truncated_option is not None:
+        lines.append('... diff truncated, {} hunks in total (use {} to show more)'.format(
+            len(hunks), truncated_option))
+    return '\n'.join(lines)
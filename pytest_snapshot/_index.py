@@ -0,0 +1,152 @@
+import os
+from typing import Iterator, Optional
+
+from pytest_snapshot._utils import is_temp_filename
+
+SNAPSHOTS_DIR_NAME = 'snapshots'
+
+
+class SnapshotIndex:
+    """
+    An in-memory index of the files and directories below a set of snapshot roots.
+
+    Every root is walked once using ``os.scandir``, after which existence checks and directory listings are
+    answered from memory. Snapshot directories are expected to only be modified through the index while it is in use,
+    so callers must report created and deleted files using ``add_file`` and ``remove_file``.
+    Temporary files left behind by interrupted snapshot writes are not indexed.
+    """
+    def __init__(self):
+        # Maps an absolute directory path to its entries, mapping entry name to whether the entry is a directory.
+        self._children = {}  # type: Dict[str, Dict[str, bool]]
+        self._roots = set()  # type: Set[str]
+
+    @staticmethod
+    def root_for(snapshot_dir: str) -> str:
+        """
+        Returns the directory that should be indexed in order to answer questions about ``snapshot_dir``.
+
+        This is the closest ancestor of ``snapshot_dir`` named "snapshots" if one exists, otherwise ``snapshot_dir``.
+        """
+        path = snapshot_dir
+        while True:
+            parent, name = os.path.split(path)
+            if name == SNAPSHOTS_DIR_NAME:
+                return path
+            if not name or parent == path:
+                return snapshot_dir
+            path = parent
+
+    def _covering_root(self, path: str) -> Optional[str]:
+        while True:
+            if path in self._roots:
+                return path
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    def add_root(self, root: str) -> None:
+        """
+        Indexes all files and directories below ``root`` unless it is already covered by an indexed root.
+        """
+        if self._covering_root(root) is not None:
+            return
+
+        # Roots below the new root are re-indexed by the walk below.
+        self._roots = {r for r in self._roots if not r.startswith(root + os.sep)}
+        self._roots.add(root)
+        if os.path.isdir(root):
+            self._walk(root)
+
+    def _walk(self, top: str) -> None:
+        stack = [top]
+        while stack:
+            dir_path = stack.pop()
+            entries = {}
+            try:
+                for entry in os.scandir(dir_path):
+                    # Like Path.rglob, symbolic links to directories aren't followed, which could recurse forever.
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if is_dir:
+                        stack.append(entry.path)
+                    elif not entry.is_file() or is_temp_filename(entry.name):
+                        continue
+                    entries[entry.name] = is_dir
+            except OSError:
+                pass
+            self._children[dir_path] = entries
+
+    def _entry(self, path: str) -> Optional[bool]:
+        """
+        Returns True if ``path`` is a directory, False if it is a file, and None if it doesn't exist.
+        """
+        root = self._covering_root(path)
+        assert root is not None, 'path {} is not in an indexed root'.format(path)
+        if path == root:
+            return True if path in self._children else None
+        parent, name = os.path.split(path)
+        children = self._children.get(parent)
+        if children is None:
+            return None
+        return children.get(name)
+
+    def is_file(self, path: str) -> bool:
+        return self._entry(path) is False
+
+    def is_dir(self, path: str) -> bool:
+        return self._entry(path) is True
+
+    def exists(self, path: str) -> bool:
+        return self._entry(path) is not None
+
+    def iter_files(self, dir_path: str) -> Iterator[str]:
+        """
+        Yields the posix paths, relative to ``dir_path``, of all files below ``dir_path``.
+        """
+        stack = [(dir_path, '')]
+        while stack:
+            path, prefix = stack.pop()
+            for name, is_dir in self._children.get(path, {}).items():
+                if is_dir:
+                    stack.append((os.path.join(path, name), prefix + name + '/'))
+                else:
+                    yield prefix + name
+
+    def add_file(self, path: str) -> None:
+        """
+        Records that the file ``path`` was created, along with any missing parent directories.
+        """
+        self._add(path, False)
+
+    def add_dir(self, path: str) -> None:
+        """
+        Records that the directory ``path`` was created, along with any missing parent directories.
+        """
+        self._children.setdefault(path, {})
+        self._add(path, True)
+
+    def _add(self, path: str, is_dir: bool) -> None:
+        root = self._covering_root(path)
+        assert root is not None, 'path {} is not in an indexed root'.format(path)
+        if path == root:
+            return
+        while True:
+            parent, name = os.path.split(path)
+            children = self._children.get(parent)
+            if children is not None:
+                children[name] = is_dir
+                return
+            self._children[parent] = {name: is_dir}
+            if parent == root:
+                return
+            path = parent
+            is_dir = True
+
+    def remove_file(self, path: str) -> None:
+        """
+        Records that the file ``path`` was deleted.
+        """
+        parent, name = os.path.split(path)
+        children = self._children.get(parent)
+        if children is not None:
+            children.pop(name, None)
@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from pytest_snapshot._manifest import hash_chunks
+
+INPUTS_CACHE_KEY = 'snapshot/inputs'
+_READ_CHUNK_SIZE = 1 << 20
+
+
+def _iter_file(path: str) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _iter_input(value: Any) -> Iterator[bytes]:
+    """
+    Yields the bytes that identify a key input: the contents of the files below a path, or the repr of other values.
+    """
+    if not isinstance(value, Path):
+        yield repr(value).encode('utf-8', 'backslashreplace')
+        return
+    yield str(value).encode('utf-8', 'surrogateescape')
+    if value.is_dir():
+        for dir_path, dir_names, file_names in os.walk(str(value)):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                path = os.path.join(dir_path, file_name)
+                yield os.path.relpath(path, str(value)).encode('utf-8', 'surrogateescape')
+                yield b'\0'
+                for chunk in _iter_file(path):
+                    yield chunk
+    elif value.exists():
+        for chunk in _iter_file(str(value)):
+            yield chunk
+
+
+def digest_inputs(key_inputs: Iterable[Any]) -> str:
+    """
+    Returns a digest of ``key_inputs``. Paths are identified by the contents of the files they point to.
+    """
+    def chunks():
+        # Hash every input separately so that different inputs can't produce the same stream of bytes.
+        for value in key_inputs:
+            yield '{}:{}\n'.format(*hash_chunks(_iter_input(value))).encode()
+    return hash_chunks(chunks())[1]
+
+
+class InputsCache:
+    """
+    Records, for every test that passed after calling ``snapshot.cached``, the digest of its key inputs
+    and a list of ``[snapshot_dir, snapshot_path, digest]`` entries of the snapshots it asserted.
+
+    The entries are persisted in the pytest cache. They are only loaded when first used,
+    and only the entries that changed during the session are written back.
+    """
+    def __init__(self, cache=None):
+        self._cache = cache
+        self._entries = None  # type: Optional[dict]
+        # Maps a node id to its new entry, or to None if the entry was discarded.
+        self._changes = {}  # type: dict
+
+    def _load(self) -> dict:
+        if self._entries is None:
+            entries = self._cache.get(INPUTS_CACHE_KEY, None) if self._cache is not None else None
+            self._entries = entries if isinstance(entries, dict) else {}
+        return self._entries
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache is not None
+
+    def get(self, nodeid: str) -> Optional[dict]:
+        if nodeid in self._changes:
+            return self._changes[nodeid]
+        return self._load().get(nodeid)
+
+    def record(self, nodeid: str, key: str, snapshots: list) -> None:
+        self._changes[nodeid] = {'key': key, 'snapshots': snapshots}
+
+    def discard(self, nodeid: str) -> None:
+        if self.get(nodeid) is not None:
+            self._changes[nodeid] = None
+
+    def changes(self) -> dict:
+        return dict(self._changes)
+
+    def merge(self, changes: Optional[dict]) -> None:
+        """
+        Adds the changes of another session, for example one sent by a pytest-xdist worker.
+        """
+        if changes:
+            self._changes.update(changes)
+
+    def save(self) -> None:
+        if self._cache is None or not self._changes:
+            return
+        entries = self._load()
+        for nodeid, entry in self._changes.items():
+            if entry is None:
+                entries.pop(nodeid, None)
+            else:
+                entries[nodeid] = entry
+        self._cache.set(INPUTS_CACHE_KEY, entries)
+        self._changes = {}
@@ -0,0 +1,89 @@
+import hashlib
+import os
+from typing import Iterable, Optional
+
+MANIFEST_CACHE_KEY = 'snapshot/manifest'
+
+
+def _new_hash():
+    # blake2b does not exist in Python 3.5.
+    if hasattr(hashlib, 'blake2b'):
+        return hashlib.blake2b(digest_size=20)
+    return hashlib.sha1()
+
+
+def hash_chunks(chunks: Iterable[bytes]):
+    """
+    Returns a 2-tuple of the total length and the hex digest of the given chunks.
+    """
+    h = _new_hash()
+    length = 0
+    for chunk in chunks:
+        h.update(chunk)
+        length += len(chunk)
+    return length, h.hexdigest()
+
+
+class SnapshotManifest:
+    """
+    Records the hash of the contents of snapshot files that are known to be valid.
+
+    An entry is only trusted while the size and modification time of its snapshot file are unchanged,
+    so a snapshot file edited outside of pytest is always read again. The contents of a snapshot file may differ
+    from the bytes stored in it, for example if it is compressed, so the stored size isn't compared to the contents.
+    The manifest is persisted in the pytest cache between sessions.
+    """
+    def __init__(self, entries: Optional[dict] = None):
+        self._entries = entries if entries is not None else {}
+        self.modified = False
+
+    @classmethod
+    def load(cls, cache) -> 'SnapshotManifest':
+        entries = cache.get(MANIFEST_CACHE_KEY, None) if cache is not None else None
+        return cls(entries if isinstance(entries, dict) else None)
+
+    def save(self, cache) -> None:
+        if cache is not None and self.modified:
+            cache.set(MANIFEST_CACHE_KEY, self._entries)
+            self.modified = False
+
+    def to_dict(self) -> dict:
+        return dict(self._entries)
+
+    def merge(self, entries: dict) -> None:
+        """
+        Adds the entries of another manifest, for example one sent by a pytest-xdist worker.
+        """
+        if entries:
+            self._entries.update(entries)
+            self.modified = True
+
+    def matches(self, path: str, chunks: Iterable[bytes]) -> bool:
+        """
+        Returns true if the snapshot file ``path`` is known to contain exactly the bytes in ``chunks``.
+
+        Returns false if the file must be read to find out.
+        """
+        entry = self._entries.get(path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        size, mtime_ns, digest = entry
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return False
+        return hash_chunks(chunks)[1] == digest
+
+    def record(self, path: str, data: bytes) -> None:
+        """
+        Records that the snapshot file ``path`` currently contains ``data``.
+        """
+        stat = os.stat(path)
+        self._entries[path] = [stat.st_size, stat.st_mtime_ns, hash_chunks([data])[1]]
+        self.modified = True
+
+    def discard(self, path: str) -> None:
+        if self._entries.pop(path, None) is not None:
+            self.modified = True
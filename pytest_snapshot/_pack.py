@@ -0,0 +1,305 @@
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from pytest_snapshot._compare import compare_bytes
+from pytest_snapshot._index import SNAPSHOTS_DIR_NAME, SnapshotIndex
+from pytest_snapshot._utils import atomic_write_bytes, file_lock, temp_path_for
+
+PACK_SUFFIX = '.snappack'
+# The pack containing the snapshot files directly inside a snapshots directory.
+ROOT_PACK_NAME = PACK_SUFFIX
+PACK_MAGIC = b'PYSNAPPK'
+PACK_VERSION = 1
+# Magic, format version and the length of the index that follows the header.
+_PACK_HEADER = struct.Struct('<8sII')
+
+
+class SnapshotPack:
+    """
+    A file containing many snapshots.
+
+    The file starts with a header and an index, a json list of ``[name, offset, length]`` entries sorted by name,
+    followed by the data of all snapshots. Offsets are relative to the end of the index.
+    The index is read the first time the pack is used, and the data is memory-mapped rather than read.
+    Changes are kept in memory until ``flush`` rewrites the whole pack.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        # Maps a snapshot name to the absolute offset and length of its data, or None if not loaded yet.
+        self._entries = None  # type: Optional[Dict[str, Tuple[int, int]]]
+        self._mapped = None  # type: Optional[mmap.mmap]
+        # Maps a snapshot name to its new data, or to None if it was deleted.
+        self._changes = {}  # type: Dict[str, Optional[bytes]]
+
+    def _load(self) -> None:
+        if self._entries is not None:
+            return
+        self._entries = {}
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            header = f.read(_PACK_HEADER.size)
+            if len(header) != _PACK_HEADER.size:
+                raise ValueError('{} is not a snapshot pack'.format(self.path))
+            magic, version, index_length = _PACK_HEADER.unpack(header)
+            if magic != PACK_MAGIC or version != PACK_VERSION:
+                raise ValueError('{} is not a snapshot pack'.format(self.path))
+            index = json.loads(f.read(index_length).decode())
+            data_start = _PACK_HEADER.size + index_length
+            if any(length for _, _, length in index):
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        for name, offset, length in index:
+            self._entries[name] = (data_start + offset, length)
+
+    def close(self) -> None:
+        """
+        Unmaps the pack. It is loaded again the next time it is used.
+        """
+        if self._mapped is not None:
+            try:
+                self._mapped.close()
+            except BufferError:
+                # A view of the data is still in use, the map is closed once it is garbage collected.
+                pass
+        self._mapped = None
+        self._entries = None
+
+    def names(self) -> List[str]:
+        self._load()
+        names = set(self._entries)
+        for name, data in self._changes.items():
+            if data is None:
+                names.discard(name)
+            else:
+                names.add(name)
+        return sorted(names)
+
+    def _stored(self, name: str):
+        """
+        Returns a bytes-like object with the data of the snapshot ``name``, or None if it doesn't exist.
+        """
+        if name in self._changes:
+            return self._changes[name]
+        self._load()
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        offset, length = entry
+        if length == 0:
+            return b''
+        return memoryview(self._mapped)[offset:offset + length]
+
+    def size(self, name: str) -> int:
+        return len(self._stored(name))
+
+    def read(self, name: str) -> bytes:
+        return bytes(self._stored(name))
+
+    def compare(self, name: str, value: bytes) -> Optional[str]:
+        """
+        Compares ``value`` to the snapshot ``name`` without copying it out of the memory map.
+
+        Returns None if they are equal, otherwise returns a message describing the first difference.
+        """
+        return compare_bytes(value, self._stored(name))
+
+    def write(self, name: str, data: bytes) -> None:
+        self._changes[name] = bytes(data)
+
+    def delete(self, name: str) -> None:
+        self._changes[name] = None
+
+    def flush(self) -> bool:
+        """
+        Writes the changes to the pack file, deleting the file if the pack became empty.
+
+        The pack is read again first so that changes written by other processes, for example other pytest-xdist
+        workers, are kept. The pack is locked while it is read and replaced, so concurrent flushes don't overwrite
+        each other's changes. Returns true if the pack file was modified.
+        """
+        if not self._changes:
+            return False
+        with file_lock(self.path):
+            return self._flush_locked()
+
+    def _flush_locked(self) -> bool:
+        self.close()
+        self._load()
+        names = self.names()
+        if not names:
+            self.close()
+            self._changes = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+                return True
+            return False
+
+        index = []
+        offset = 0
+        for name in names:
+            length = self.size(name)
+            index.append([name, offset, length])
+            offset += length
+        encoded_index = json.dumps(index, separators=(',', ':')).encode()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = temp_path_for(Path(self.path))
+        try:
+            with temp_path.open('xb') as f:
+                f.write(_PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(encoded_index)))
+                f.write(encoded_index)
+                for name in names:
+                    f.write(self._stored(name))
+                # Packs are only written when the session ends, so they are made durable before they replace
+                # the old pack.
+                f.flush()
+                os.fsync(f.fileno())
+            # The old pack is unmapped before it is replaced, which is required on Windows.
+            self.close()
+            os.replace(str(temp_path), self.path)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        self._changes = {}
+        return True
+
+
+class SnapshotPacks(SnapshotIndex):
+    """
+    An index of snapshots that are stored in pack files rather than in one file per snapshot.
+
+    The snapshots below a directory named "snapshots" are stored in one pack per subdirectory, named after the
+    subdirectory, which for the default snapshot directories is one pack per test module.
+    The snapshots directly inside the "snapshots" directory are stored in a pack named ``.snappack``.
+    The paths of packed snapshots are the same as if they were stored in separate files.
+    """
+    def __init__(self):
+        super().__init__()
+        self._packs = {}  # type: Dict[str, SnapshotPack]
+
+    def add_root(self, root: str) -> None:
+        if os.path.basename(root) != SNAPSHOTS_DIR_NAME:
+            raise ValueError('packed snapshots must be stored below a directory named "{}", got {}'.format(
+                SNAPSHOTS_DIR_NAME, root))
+        super().add_root(root)
+
+    def _walk(self, top: str) -> None:
+        self._children.setdefault(top, {})
+        for dir_path, _, file_names in os.walk(top):
+            if os.path.basename(dir_path) != SNAPSHOTS_DIR_NAME:
+                continue
+            for file_name in file_names:
+                if not file_name.endswith(PACK_SUFFIX):
+                    continue
+                if file_name == ROOT_PACK_NAME:
+                    prefix = dir_path
+                else:
+                    prefix = os.path.join(dir_path, file_name[:-len(PACK_SUFFIX)])
+                for name in self._pack(os.path.join(dir_path, file_name)).names():
+                    self._add(os.path.join(prefix, *name.split('/')), False)
+
+    def _pack(self, pack_path: str) -> SnapshotPack:
+        pack = self._packs.get(pack_path)
+        if pack is None:
+            pack = self._packs[pack_path] = SnapshotPack(pack_path)
+        return pack
+
+    def _locate(self, path: str) -> Tuple[SnapshotPack, str]:
+        """
+        Returns the pack containing the snapshot ``path`` and the name of the snapshot in the pack.
+        """
+        root = SnapshotIndex.root_for(os.path.dirname(path))
+        parts = os.path.relpath(path, root).split(os.sep)
+        if len(parts) == 1:
+            return self._pack(os.path.join(root, ROOT_PACK_NAME)), parts[0]
+        return self._pack(os.path.join(root, parts[0] + PACK_SUFFIX)), '/'.join(parts[1:])
+
+    def size(self, path: str) -> int:
+        pack, name = self._locate(path)
+        return pack.size(name)
+
+    def read(self, path: str) -> bytes:
+        pack, name = self._locate(path)
+        return pack.read(name)
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        pack, name = self._locate(path)
+        return pack.compare(name, value)
+
+    def write(self, path: str, data: bytes) -> None:
+        pack, name = self._locate(path)
+        pack.write(name, data)
+        self.add_file(path)
+
+    def delete(self, path: str) -> None:
+        pack, name = self._locate(path)
+        pack.delete(name)
+        self.remove_file(path)
+
+    def flush(self) -> List[str]:
+        """
+        Writes all changes to the pack files. Returns the directories containing modified pack files.
+        """
+        return sorted({os.path.dirname(pack.path) for pack in self._packs.values() if pack.flush()})
+
+    def close(self) -> None:
+        for pack in self._packs.values():
+            pack.close()
+
+
+def _snapshot_file_paths(snapshots_dir: str) -> Iterator[str]:
+    index = SnapshotIndex()
+    index.add_root(snapshots_dir)
+    for name in index.iter_files(snapshots_dir):
+        if not name.endswith(PACK_SUFFIX):
+            yield os.path.join(snapshots_dir, *name.split('/'))
+
+
+def pack_snapshots(snapshots_dir: str) -> int:
+    """
+    Moves the snapshot files below the directory ``snapshots_dir``, which must be named "snapshots", into packs.
+
+    Returns the number of packed snapshots.
+    """
+    packs = SnapshotPacks()
+    packs.add_root(snapshots_dir)
+    paths = sorted(_snapshot_file_paths(snapshots_dir))
+    for path in paths:
+        with open(path, 'rb') as f:
+            packs.write(path, f.read())
+    packs.flush()
+    packs.close()
+    for path in paths:
+        os.remove(path)
+    _remove_empty_dirs(snapshots_dir)
+    return len(paths)
+
+
+def unpack_snapshots(snapshots_dir: str) -> int:
+    """
+    Moves the snapshots in the packs below the directory ``snapshots_dir`` into one file per snapshot.
+
+    Returns the number of unpacked snapshots.
+    """
+    packs = SnapshotPacks()
+    packs.add_root(snapshots_dir)
+    paths = [os.path.join(snapshots_dir, *name.split('/')) for name in sorted(packs.iter_files(snapshots_dir))]
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_bytes(Path(path), packs.read(path))
+        packs.delete(path)
+    packs.flush()
+    packs.close()
+    return len(paths)
+
+
+def _remove_empty_dirs(top: str) -> None:
+    for dir_path, _, _ in os.walk(top, topdown=False):
+        if dir_path != top and not os.listdir(dir_path):
+            os.rmdir(dir_path)
@@ -0,0 +1,176 @@
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+
+from pytest_snapshot._compression import get_codec
+from pytest_snapshot._diff import DEFAULT_CONTEXT, DEFAULT_DIFF_LIMIT, DEFAULT_MAX_HUNKS
+from pytest_snapshot._inputs import InputsCache
+from pytest_snapshot._manifest import SnapshotManifest
+from pytest_snapshot._timing import SnapshotDurations
+from pytest_snapshot._unused import SnapshotUsage
+from pytest_snapshot._utils import shorten_path
+from pytest_snapshot.serializers import SerializerRegistry, registry as default_serializers
+from pytest_snapshot.storage import CachingStorage, CompressedStorage, DeduplicatingStorage, FileSystemStorage, \
+    MemoryStorage, PackedStorage, RecordingStorage, SnapshotStorage
+
+
+class SnapshotSummary:
+    """
+    The snapshot modifications made during a pytest session.
+
+    Summaries only contain json-serializable values so that pytest-xdist workers can send them to the controller.
+    """
+    _FIELDS = ('created', 'updated', 'deleted', 'to_delete')
+    _LABELS = ('created', 'updated', 'deleted', 'should be deleted')
+
+    def __init__(self):
+        self.created = []  # type: List[str]
+        self.updated = []  # type: List[str]
+        self.deleted = []  # type: List[str]
+        self.to_delete = []  # type: List[str]
+        self.duration = 0.0
+
+    def __bool__(self):
+        return any(getattr(self, field) for field in self._FIELDS)
+
+    def record(self, created: List[Path], updated: List[Path], deleted: List[Path], to_delete: List[Path]) -> None:
+        self.created.extend(str(path) for path in created)
+        self.updated.extend(str(path) for path in updated)
+        self.deleted.extend(str(path) for path in deleted)
+        self.to_delete.extend(str(path) for path in to_delete)
+
+    def to_dict(self) -> dict:
+        result = {field: list(getattr(self, field)) for field in self._FIELDS}
+        result['duration'] = self.duration
+        return result
+
+    def merge(self, data: dict) -> None:
+        for field in self._FIELDS:
+            getattr(self, field).extend(data[field])
+        self.duration += data['duration']
+
+    def terminal_lines(self, verbose: bool) -> List[str]:
+        counts = ', '.join('{} {}'.format(len(getattr(self, field)), label)
+                           for field, label in zip(self._FIELDS, self._LABELS))
+        lines = ['snapshots: {} ({:.2f}s in snapshot assertions)'.format(counts, self.duration)]
+        if verbose:
+            for field, label in zip(self._FIELDS, self._LABELS):
+                lines.extend('  {}: {}'.format(label, shorten_path(Path(path)))
+                             for path in sorted(getattr(self, field)))
+        return lines
+
+
+class SnapshotSession:
+    """
+    State shared by all ``Snapshot`` objects of a pytest session.
+    """
+    def __init__(self, storage: Optional[SnapshotStorage] = None, manifest: Optional[SnapshotManifest] = None,
+                 diff_limit: int = DEFAULT_DIFF_LIMIT, workers: int = 1,
+                 durations: Optional[SnapshotDurations] = None, inputs_cache: Optional[InputsCache] = None,
+                 usage: Optional[SnapshotUsage] = None, serializers: Optional[SerializerRegistry] = None,
+                 diff_context: int = DEFAULT_CONTEXT, diff_hunks: int = DEFAULT_MAX_HUNKS):
+        self.storage = storage if storage is not None else FileSystemStorage(manifest=manifest)
+        self.manifest = manifest
+        # Deletes the blobs that lost their last reference at the end of the session, see snapshot_dedup.
+        self.deduplicating_storage = find_storage(self.storage, DeduplicatingStorage)
+        self.diff_limit = diff_limit
+        self.diff_context = diff_context
+        self.diff_hunks = diff_hunks
+        self.workers = workers
+        # Timings of all assertions, collected for --snapshot-durations and the pytest_snapshot_durations hook.
+        self.durations = durations
+        # Digests of the key inputs given to snapshot.cached, see InputsCache.
+        self.inputs_cache = inputs_cache if inputs_cache is not None else InputsCache()
+        self.summary = SnapshotSummary()
+        # The modification reports of module_snapshot and session_snapshot, shown at the end of the session.
+        self.shared_reports = []  # type: List[str]
+        self.serializers = serializers if serializers is not None else default_serializers
+        # The snapshots used by the tests of the session, only recorded for --snapshot-detect-unused.
+        self.usage = usage
+        self.unused = None  # type: Optional[List[str]]
+        # The partial archives of pytest-xdist workers, merged into the --snapshot-update-output archive.
+        self.archive_parts = []  # type: List[str]
+        self.archive_conflicts = []  # type: List[str]
+        # The outcome of --snapshot-apply, reported in the terminal summary.
+        self.apply_lines = None  # type: Optional[List[str]]
+        self.apply_failed = False
+
+    def sync(self) -> None:
+        """
+        Makes all snapshot writes and deletions of the session durable.
+        """
+        self.storage.commit()
+
+    @classmethod
+    def from_config(cls, config) -> 'SnapshotSession':
+        option = config.option
+        storage, manifest = cls.storage_from_config(config)
+        if option.snapshot_update_output is not None:
+            archive_path = os.path.abspath(option.snapshot_update_output)
+            workerinput = getattr(config, 'workerinput', None)
+            if workerinput is not None:
+                # Every pytest-xdist worker records a partial archive, which the controller merges.
+                archive_path = '{}.{}.part'.format(archive_path, workerinput['workerid'])
+            storage = RecordingStorage(storage, archive_path, rootdir(config))
+
+        if option.snapshot_durations is not None or config.pluginmanager.hook.pytest_snapshot_durations.get_hookimpls():
+            durations = SnapshotDurations()
+        else:
+            durations = None
+        return cls(storage, manifest, option.snapshot_diff_limit, option.snapshot_workers, durations,
+                   InputsCache(getattr(config, 'cache', None)),
+                   SnapshotUsage() if option.snapshot_detect_unused else None,
+                   diff_context=option.snapshot_diff_context, diff_hunks=option.snapshot_diff_hunks)
+
+    @staticmethod
+    def storage_from_config(config) -> Tuple[SnapshotStorage, Optional[SnapshotManifest]]:
+        """
+        Returns the storage backend selected by the options of ``config`` and the manifest it uses, if any.
+        """
+        option = config.option
+        name = config.getini('snapshot_storage')
+        manifest = None
+        if name == 'files':
+            if option.snapshot_manifest:
+                manifest = SnapshotManifest.load(getattr(config, 'cache', None))
+            storage = FileSystemStorage(manifest=manifest)
+        elif name == 'packed':
+            storage = PackedStorage()
+        elif name == 'memory':
+            storage = MemoryStorage()
+        else:
+            storage = config.hook.pytest_snapshot_storage(config=config, name=name)
+            if storage is None:
+                raise pytest.UsageError(
+                    'snapshot_storage must be "files", "packed", "memory" or a storage added by a plugin, '
+                    'got {!r}'.format(name))
+        compression = config.getini('snapshot_compression')
+        if compression != 'none':
+            try:
+                codec = get_codec(compression)
+                threshold = int(config.getini('snapshot_compression_threshold'))
+            except ValueError as e:
+                raise pytest.UsageError('invalid snapshot compression settings: {}'.format(e))
+            storage = CompressedStorage(storage, codec, threshold, config.getini('snapshot_compression_extensions'))
+        if config.getini('snapshot_dedup'):
+            storage = DeduplicatingStorage(storage)
+        if config.getini('snapshot_storage_cache'):
+            storage = CachingStorage(storage)
+        return storage, manifest
+
+
+def find_storage(storage: SnapshotStorage, storage_type: type) -> Optional[SnapshotStorage]:
+    """
+    Returns the first backend of type ``storage_type`` among ``storage`` and the backends it wraps, or None.
+    """
+    while storage is not None and not isinstance(storage, storage_type):
+        storage = getattr(storage, 'storage', None)
+    return storage
+
+
+def rootdir(config) -> str:
+    # Config.rootpath was added in pytest 6.1.
+    rootpath = getattr(config, 'rootpath', None)
+    return str(rootpath if rootpath is not None else config.rootdir)
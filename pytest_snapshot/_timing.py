@@ -0,0 +1,122 @@
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from pytest_snapshot._utils import shorten_path
+
+PHASES = ('path', 'read', 'codec', 'compare', 'diff', 'write')
+
+
+class _Phase:
+    """
+    Context manager adding the time spent in its body to a phase of a ``SnapshotTiming``.
+
+    This is a class rather than a ``contextlib.contextmanager`` so that it doesn't add frames to tracebacks.
+    """
+    __slots__ = ('_timing', '_name', '_start')
+
+    def __init__(self, timing: 'SnapshotTiming', name: str):
+        self._timing = timing
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._timing.phases[self._name] += time.perf_counter() - self._start
+
+
+class SnapshotTiming:
+    """
+    The time spent in each phase of a single snapshot assertion, and the number of snapshot bytes it read and wrote.
+    """
+    def __init__(self, kind: str, nodeid: str = ''):
+        self.kind = kind
+        self.nodeid = nodeid
+        self.snapshot = ''
+        self.duration = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._start = time.perf_counter()
+
+    def phase(self, name: str) -> _Phase:
+        return _Phase(self, name)
+
+    def stop(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def add(self, other: 'SnapshotTiming') -> None:
+        """
+        Adds the phases and byte counts of a nested assertion, for example a file of ``assert_match_dir``.
+        """
+        for name in PHASES:
+            self.phases[name] += other.phases[name]
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+
+    def to_dict(self) -> dict:
+        return {
+            'kind': self.kind,
+            'nodeid': self.nodeid,
+            'snapshot': self.snapshot,
+            'duration': self.duration,
+            'phases': dict(self.phases),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+        }
+
+
+class SnapshotDurations:
+    """
+    The timings of all snapshot assertions of a pytest session, as json-serializable dicts.
+    """
+    def __init__(self):
+        self.assertions = []  # type: List[dict]
+
+    def add(self, timing: SnapshotTiming) -> None:
+        self.assertions.append(timing.to_dict())
+
+    def merge(self, assertions: List[dict]) -> None:
+        self.assertions.extend(assertions)
+
+    def report(self) -> dict:
+        """
+        Returns the json-serializable report passed to the ``pytest_snapshot_durations`` hook.
+        """
+        totals = {
+            'duration': sum(a['duration'] for a in self.assertions),
+            'phases': {name: sum(a['phases'][name] for a in self.assertions) for name in PHASES},
+            'bytes_read': sum(a['bytes_read'] for a in self.assertions),
+            'bytes_written': sum(a['bytes_written'] for a in self.assertions),
+        }
+        return {'assertions': self.assertions, 'totals': totals}
+
+    def terminal_lines(self, count: Optional[int]) -> List[str]:
+        """
+        Returns the lines describing the ``count`` slowest assertions (all of them if ``count`` is 0)
+        followed by the totals of every phase.
+        """
+        slowest = sorted(self.assertions, key=lambda a: a['duration'], reverse=True)
+        if count:
+            slowest = slowest[:count]
+        lines = []
+        for a in slowest:
+            phases = ', '.join('{} {:.3f}s'.format(name, a['phases'][name]) for name in PHASES if a['phases'][name])
+            lines.append('{:.3f}s {} {} {} ({})'.format(
+                a['duration'], a['kind'], a['nodeid'], shorten_path(Path(a['snapshot'])), phases))
+        totals = self.report()['totals']
+        lines.append('totals: {} ({}), {} read, {} written'.format(
+            '{:.3f}s in {} assertions'.format(totals['duration'], len(self.assertions)),
+            ', '.join('{} {:.3f}s'.format(name, totals['phases'][name]) for name in PHASES),
+            _format_size(totals['bytes_read']),
+            _format_size(totals['bytes_written'])))
+        return lines
+
+
+def _format_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return '{:.0f} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+        size /= 1024
+    return '{:.1f} GiB'.format(size)
@@ -0,0 +1,105 @@
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from pytest_snapshot._utils import shorten_path
+
+
+class SnapshotUsage:
+    """
+    Records which snapshots were used during a pytest session, in order to find the snapshots that no test uses.
+
+    Every collected test owns its default snapshot directory, the snapshot directory of its module (which contains
+    the module_snapshot directory) and the "snapshots" directories that are scanned for unused snapshots: the one next
+    to its module and the session_snapshot directory of the rootdir. A snapshot that wasn't used belongs to the deepest
+    of these directories containing it, and is only reported if every test owning that directory was collected and
+    passed. Tests deselected using ``-k`` or ``-m`` are collected but never pass, so their snapshots, and the snapshots
+    of their module and snapshot roots, aren't reported.
+
+    Usages only contain json-serializable values so that pytest-xdist workers can send them to the controller.
+    """
+    def __init__(self):
+        self.used = set()  # type: Set[str]
+        # Maps every directory owned by collected tests to the number of tests owning it.
+        self.collected = {}  # type: Dict[str, int]
+        # Maps every directory owned by passed tests to the number of passed tests owning it.
+        self.passed = {}  # type: Dict[str, int]
+        # The "snapshots" directories that are scanned for unused snapshots.
+        self.roots = set()  # type: Set[str]
+        # Owned directories of which some tests weren't collected, for example because a single test of their module
+        # was selected on the command line, or because the directory containing the root wasn't collected in full.
+        self.incomplete = set()  # type: Set[str]
+
+    def add_collected(self, owned_dirs: Iterable[str]) -> None:
+        for owned_dir in owned_dirs:
+            self.collected[owned_dir] = self.collected.get(owned_dir, 0) + 1
+
+    def add_passed(self, owned_dirs: Iterable[str]) -> None:
+        for owned_dir in owned_dirs:
+            self.passed[owned_dir] = self.passed.get(owned_dir, 0) + 1
+
+    def add_root(self, root: str, complete: bool) -> None:
+        self.roots.add(root)
+        if not complete:
+            self.incomplete.add(root)
+
+    def to_dict(self) -> dict:
+        return {
+            'used': sorted(self.used),
+            'collected': dict(self.collected),
+            'passed': dict(self.passed),
+            'roots': sorted(self.roots),
+            'incomplete': sorted(self.incomplete),
+        }
+
+    def merge(self, data: Optional[dict]) -> None:
+        """
+        Adds the usage of a pytest-xdist worker. Every worker collects the same tests, but runs only some of them.
+        """
+        if not data:
+            return
+        self.used.update(data['used'])
+        for owned_dir, count in data['collected'].items():
+            self.collected[owned_dir] = max(self.collected.get(owned_dir, 0), count)
+        for owned_dir, count in data['passed'].items():
+            self.passed[owned_dir] = self.passed.get(owned_dir, 0) + count
+        self.roots.update(data['roots'])
+        self.incomplete.update(data['incomplete'])
+
+    def _owner(self, path: str, root: str) -> Optional[str]:
+        """
+        Returns the deepest directory owned by collected tests that contains ``path``, up to ``root``.
+        """
+        while True:
+            path = os.path.dirname(path)
+            if path in self.collected:
+                return path
+            if len(path) <= len(root):
+                return None
+
+    def find_unused(self, storage) -> List[str]:
+        """
+        Returns the sorted paths of the snapshots that were not used by the tests that should have used them.
+        """
+        unused = set()
+        for root in self.roots:
+            storage.open_dir(root)
+            for name in storage.list_dir(root):
+                path = os.path.join(root, *name.split('/'))
+                if path in self.used:
+                    continue
+                owner = self._owner(path, root)
+                if (owner is not None and owner not in self.incomplete
+                        and self.passed.get(owner, 0) >= self.collected[owner]):
+                    unused.add(path)
+        return sorted(unused)
+
+
+def unused_terminal_lines(unused: Iterable[str], deleted: bool) -> List[str]:
+    unused = list(unused)
+    if deleted:
+        lines = ['Deleted {} unused snapshots:'.format(len(unused))]
+    else:
+        lines = ['{} unused snapshots (run pytest with --allow-snapshot-deletion to delete them):'.format(len(unused))]
+    lines.extend('  {}'.format(shorten_path(Path(path))) for path in unused)
+    return lines
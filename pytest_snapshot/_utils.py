@@ -1,11 +1,26 @@
+import hashlib
 import os
 import re
-from pathlib import Path
+import tempfile
+import uuid
+from collections.abc import Mapping
+from contextlib import contextmanager
+from pathlib import Path, PurePath
+from typing import Any, Iterable, Iterator, List, Tuple, Union
 
 import pytest
 
+try:
+    import fcntl
+except ImportError:
+    # Windows.
+    fcntl = None
+    import msvcrt
+
 SIMPLE_VERSION_REGEX = re.compile(r'([0-9]+)\.([0-9]+)\.([0-9]+)')
 ILLEGAL_FILENAME_CHARS = r'\/:*?"<>|'
+INVALID_FILENAME_CHARS_REGEX = re.compile(r'(?u)[^-\w.]')
+TEMP_FILENAME_REGEX = re.compile(r'^\..+\.[0-9a-f]{32}\.tmp$')
 
 
 def shorten_path(path: Path) -> Path:
@@ -18,13 +33,125 @@ def shorten_path(path: Path) -> Path:
         return path
 
 
+def temp_path_for(path: Path) -> Path:
+    """
+    Returns a unique path for a hidden temporary file in the same directory as ``path``.
+    """
+    return path.with_name('.{}.{}.tmp'.format(path.name, uuid.uuid4().hex))
+
+
+def is_temp_filename(name: str) -> bool:
+    """
+    Returns true if ``name`` is the name of a temporary file returned by ``temp_path_for``.
+
+    These are left behind by processes that were killed while writing a snapshot.
+    """
+    return TEMP_FILENAME_REGEX.match(name) is not None
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Writes ``data`` to ``path`` by writing a temporary file in the same directory and renaming it over ``path``.
+
+    An interrupted write leaves either the old or the new file at ``path``, never a truncated one.
+    The data is not fsynced, so this only holds if the process is killed. To survive a power loss,
+    use ``fsync_files`` on ``path`` and then ``fsync_dirs`` on its parent directory.
+    """
+    temp_path = temp_path_for(path)
+    try:
+        with temp_path.open('xb') as f:
+            f.write(data)
+        os.replace(str(temp_path), str(path))
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+
+def lock_path_for(path: str) -> str:
+    """
+    Returns the path of the lock file used by ``file_lock`` to guard ``path``.
+
+    Lock files are kept in the temporary directory rather than next to ``path``,
+    so they never end up in snapshot directories.
+    """
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(path)).encode()).hexdigest()
+    return os.path.join(tempfile.gettempdir(), 'pytest-snapshot-{}.lock'.format(digest))
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Holds an exclusive lock guarding the file ``path`` across processes, waiting until it is available.
+
+    Used to serialize read-modify-write cycles of files shared by processes, such as pytest-xdist workers.
+    """
+    fd = os.open(lock_path_for(path), os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after retrying for 10 seconds.
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def fsync_files(paths: Iterable[str]) -> None:
+    """
+    Flushes the contents of the given files to disk. Files that no longer exist are skipped.
+    """
+    for path in paths:
+        try:
+            # Windows can only fsync files opened for writing.
+            fd = os.open(path, os.O_RDWR)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def fsync_dirs(paths: Iterable[str]) -> None:
+    """
+    Flushes the entries of the given directories to disk, making previous renames and deletions in them durable.
+
+    Directories can't be fsynced on some platforms (for example Windows), in which case this does nothing.
+    """
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
 def get_valid_filename(s: str) -> str:
     """
     Return the given string converted to a string that can be used for a clean filename.
     Taken from https://github.com/django/django/blob/master/django/utils/text.py
     """
     s = str(s).strip().replace(' ', '_')
-    s = re.sub(r'(?u)[^-\w.]', '', s)
+    s = INVALID_FILENAME_CHARS_REGEX.sub('', s)
     s = {'': 'empty', '.': 'dot', '..': 'dotdot'}.get(s, s)
     return s
 
@@ -122,12 +249,67 @@ def flatten_filesystem_dict(d):
         ... })
         {'file1.txt': '111', 'dir1/file2.txt': '222'}
     """
-    result = {}
-    for key_list, obj in flatten_dict(d):
-        for i, key in enumerate(key_list):
-            if not might_be_valid_filename(key):
-                key_list_str = ''.join('[{!r}]'.format(k) for k in key_list[:i])
-                raise ValueError('Key {!r} in d{} must be a valid file name.'.format(key, key_list_str))
-        result['/'.join(key_list)] = obj
+    return dict(iter_filesystem_dict(d))
 
-    return result
+
+def _is_directory(obj) -> bool:
+    # Mappings other than dicts can't be snapshotted as values, so they are directories too.
+    return type(obj) is dict or (isinstance(obj, Mapping) and not isinstance(obj, dict))
+
+
+def iter_filesystem_dict(d: Mapping) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields the posix path and value of every file in a nested mapping describing a filesystem.
+
+    Values are only accessed when their file is reached, so mappings that compute their values on access
+    are evaluated one file at a time. Raises ``ValueError`` when an invalid filename is reached.
+    """
+    return _iter_filesystem_dict(d, [])
+
+
+def _iter_filesystem_dict(d: Mapping, prefix: List[str]) -> Iterator[Tuple[str, Any]]:
+    for key in d:
+        if not might_be_valid_filename(key):
+            key_list_str = ''.join('[{!r}]'.format(k) for k in prefix)
+            raise ValueError('Key {!r} in d{} must be a valid file name.'.format(key, key_list_str))
+        value = d[key]
+        prefix.append(key)
+        if _is_directory(value):
+            yield from _iter_filesystem_dict(value, prefix)
+        else:
+            yield '/'.join(prefix), value
+        prefix.pop()
+
+
+def iter_filesystem_pairs(pairs: Iterable[Tuple[Union[str, PurePath], Any]]) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields the posix path and value of every ``(relative_path, value)`` pair, one pair at a time.
+
+    Paths may be strings using "/" as the separator or ``PurePath`` objects.
+    Raises ``ValueError`` when a path that isn't a relative path of valid filenames is reached.
+    """
+    for path, value in pairs:
+        posix_path = path.as_posix() if isinstance(path, PurePath) else path
+        if not isinstance(posix_path, str) or not all(might_be_valid_filename(p) for p in posix_path.split('/')):
+            raise ValueError('Path {!r} must be a relative path of valid file names.'.format(path))
+        yield posix_path, value
+
+
+def iter_tree(root: str) -> Iterator[Tuple[str, 'os.DirEntry']]:
+    """
+    Yields the posix path relative to ``root`` and the ``os.DirEntry`` of every file below the directory ``root``.
+
+    Files are yielded in sorted order, one directory listing at a time.
+    Symbolic links to files are followed, symbolic links to directories are skipped so that link cycles can't recurse
+    forever.
+    """
+    return _iter_tree(root, '')
+
+
+def _iter_tree(path: str, prefix: str) -> Iterator[Tuple[str, 'os.DirEntry']]:
+    entries = sorted(os.scandir(path), key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _iter_tree(entry.path, prefix + entry.name + '/')
+        elif entry.is_file():
+            yield prefix + entry.name, entry
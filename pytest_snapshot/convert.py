@@ -0,0 +1,54 @@
+"""
+Converts snapshots between the "files" and "packed" values of the ``snapshot_storage`` ini option.
+
+Usage::
+
+    python -m pytest_snapshot.convert {pack,unpack} PATH [PATH ...]
+
+Every directory named "snapshots" in the given paths is converted.
+"""
+import argparse
+import os
+import sys
+from typing import Iterator, List, Optional
+
+from pytest_snapshot._index import SNAPSHOTS_DIR_NAME
+from pytest_snapshot._pack import pack_snapshots, unpack_snapshots
+
+
+def _find_snapshots_dirs(path: str) -> Iterator[str]:
+    """
+    Yields ``path`` if it is named "snapshots", otherwise yields the outermost directories named "snapshots" in it.
+    """
+    path = os.path.abspath(path)
+    if os.path.basename(path) == SNAPSHOTS_DIR_NAME:
+        yield path
+        return
+    for dir_path, dir_names, _ in os.walk(path):
+        if SNAPSHOTS_DIR_NAME in dir_names:
+            dir_names.remove(SNAPSHOTS_DIR_NAME)
+            yield os.path.join(dir_path, SNAPSHOTS_DIR_NAME)
+        dir_names[:] = [name for name in dir_names if not name.startswith('.')]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m pytest_snapshot.convert',
+        description='Move snapshot files into pack files (pack) or pack files back into snapshot files (unpack).')
+    parser.add_argument('command', choices=['pack', 'unpack'])
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='A snapshots directory, or a directory to search for snapshots directories.')
+    args = parser.parse_args(argv)
+
+    convert = pack_snapshots if args.command == 'pack' else unpack_snapshots
+    for path in args.paths:
+        if not os.path.isdir(path):
+            parser.error('not a directory: {}'.format(path))
+        for snapshots_dir in _find_snapshots_dirs(path):
+            count = convert(snapshots_dir)
+            print('{}ed {} snapshots in {}'.format(args.command, count, snapshots_dir))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
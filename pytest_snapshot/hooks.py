@@ -0,0 +1,38 @@
+"""
+Hook specifications added by pytest-snapshot. Implement them in a ``conftest.py`` file or a plugin.
+"""
+import pytest
+
+
+def pytest_snapshot_durations(config, report):
+    """
+    Called at the end of the session with the timings of all snapshot assertions.
+
+    Snapshot assertions are only timed when this hook is implemented or pytest was run with --snapshot-durations.
+
+    :param _pytest.config.Config config: The pytest config object.
+    :param dict report: A json-serializable dict with the keys
+
+        * ``assertions``: a list containing a dict for every ``assert_match`` and ``assert_match_dir`` call, with the
+          keys ``kind``, ``nodeid``, ``snapshot``, ``duration``, ``phases`` (a dict from phase name to seconds),
+          ``bytes_read`` and ``bytes_written``.
+        * ``totals``: a dict with the sums of ``duration``, ``phases``, ``bytes_read`` and ``bytes_written``.
+
+        The phases are ``path`` (resolving and indexing snapshot paths), ``read``, ``codec`` (encoding and decoding),
+        ``compare``, ``diff`` (rendering the description of a mismatch) and ``write``.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_snapshot_storage(config, name):
+    """
+    Returns the storage backend for the ``snapshot_storage`` ini option value ``name``,
+    or None if ``name`` is not handled by this implementation.
+
+    Only called for names other than the built-in "files", "packed" and "memory".
+    Stops at the first non-None result.
+
+    :param _pytest.config.Config config: The pytest config object.
+    :param str name: The value of the ``snapshot_storage`` ini option.
+    :rtype: pytest_snapshot.storage.SnapshotStorage
+    """
@@ -1,15 +1,49 @@
+import collections.abc
 import operator
 import os
 import re
-from pathlib import Path
-from typing import Union
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePath
+from typing import IO, Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
 import pytest
+import _pytest.nodes
 import _pytest.python
 
-from pytest_snapshot._utils import shorten_path, get_valid_filename, _pytest_expected_on_right, flatten_filesystem_dict
+from pytest_snapshot import hooks
+from pytest_snapshot._archive import SnapshotArchive, apply_changes, combine_archives, merge_archives
+from pytest_snapshot._array import compare_arrays, import_numpy
+from pytest_snapshot._compare import map_file
+from pytest_snapshot._compression import DEFAULT_COMPRESSION_THRESHOLD
+from pytest_snapshot._diff import DEFAULT_CONTEXT, DEFAULT_DIFF_LIMIT, DEFAULT_MAX_HUNKS, unified_diff
+from pytest_snapshot._inputs import digest_inputs
+from pytest_snapshot._manifest import hash_chunks
+from pytest_snapshot._session import SnapshotSession, find_storage, rootdir
+from pytest_snapshot._timing import SnapshotTiming
+from pytest_snapshot._unused import unused_terminal_lines
+from pytest_snapshot._utils import shorten_path, get_valid_filename, _pytest_expected_on_right, \
+    iter_filesystem_dict, iter_filesystem_pairs, iter_tree
+from pytest_snapshot.serializers import NpySerializer
+from pytest_snapshot.storage import DeduplicatingStorage, RecordingStorage
 
 PARAMETRIZED_TEST_REGEX = re.compile(r'^.*?\[(.*)]$')
+ENCODE_CHUNK_SIZE = 1 << 20
+# Snapshots at least this large are compared without loading them into memory.
+LARGE_SNAPSHOT_SIZE = 1 << 20
+# Text values or snapshots at least this long are diffed by the bounded snapshot diff instead of by pytest.
+LARGE_TEXT_SIZE = 1 << 16
+# Text snapshots need no newline translation on platforms using "\n" as the line separator.
+_LINESEP_IS_LF = os.linesep == '\n'
+# Matches the newlines that universal newlines mode translates to "\n".
+_NEWLINES_REGEX = re.compile('\r\n?')
+# Maps the path of a test module to the directory containing the default snapshot directories of its tests.
+_module_snapshot_dirs = {}  # type: Dict[Any, Path]
+_NPY_SERIALIZER = NpySerializer()
+# The directory of module_snapshot inside the module's snapshot directory. Test names are identifiers and never
+# contain "-", so it can't collide with the default snapshot directory of a test.
+MODULE_SNAPSHOTS_DIR_NAME = 'module-snapshots'
 
 
 def pytest_addoption(parser):
@@ -24,15 +58,378 @@ def pytest_addoption(parser):
         action='store_true',
         help='Allow snapshot deletion when updating snapshots.',
     )
+    group.addoption(
+        '--snapshot-update-output',
+        metavar='ARCHIVE',
+        help='Update snapshots like --snapshot-update, but record the changes in ARCHIVE instead of applying them.',
+    )
+    group.addoption(
+        '--snapshot-apply',
+        action='append',
+        metavar='ARCHIVE',
+        help='Apply the snapshot changes recorded by --snapshot-update-output in ARCHIVE instead of running tests. '
+             'Can be given several times to apply several archives, nothing is applied if they conflict.',
+    )
+    group.addoption(
+        '--snapshot-detect-unused',
+        action='store_true',
+        help='Report snapshots that are not used by any test, and delete them if --allow-snapshot-deletion is given.',
+    )
+    group.addoption(
+        '--snapshot-manifest',
+        action='store_true',
+        help='Skip reading snapshots whose length and hash match a manifest stored in the pytest cache.',
+    )
+    group.addoption(
+        '--snapshot-diff-limit',
+        type=int,
+        default=DEFAULT_DIFF_LIMIT,
+        metavar='N',
+        help='Maximum number of characters shown when diffing large text snapshots (default: %(default)s).',
+    )
+    group.addoption(
+        '--snapshot-diff-context',
+        type=int,
+        default=DEFAULT_CONTEXT,
+        metavar='N',
+        help='Number of unchanged lines shown around changes when diffing large text snapshots '
+             '(default: %(default)s).',
+    )
+    group.addoption(
+        '--snapshot-diff-hunks',
+        type=int,
+        default=DEFAULT_MAX_HUNKS,
+        metavar='N',
+        help='Maximum number of hunks shown when diffing large text snapshots (default: %(default)s).',
+    )
+    group.addoption(
+        '--snapshot-workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Number of threads used by assert_match_dir to read, compare and write snapshot files (default: 1).',
+    )
+    group.addoption(
+        '--snapshot-durations',
+        type=int,
+        default=None,
+        metavar='N',
+        help='Show the N slowest snapshot assertions and the time spent in each phase (N=0 for all).',
+    )
+    parser.addini(
+        'snapshot_storage',
+        default='files',
+        help='How snapshots are stored: "files" (one file per snapshot, the default), '
+             '"packed" (one indexed pack file per test module), "memory" (not persisted), '
+             'or the name of a storage added by a plugin.',
+    )
+    parser.addini(
+        'snapshot_storage_cache',
+        type='bool',
+        default=False,
+        help='Keep recently read snapshots in memory.',
+    )
+    parser.addini(
+        'snapshot_dedup',
+        type='bool',
+        default=False,
+        help='Store snapshot contents once in a blob store named by their hash, '
+             'and make snapshot files references to their blobs.',
+    )
+    parser.addini(
+        'snapshot_compression',
+        default='none',
+        help='Compress large snapshots using "zstd", "gzip", "lzma", or "auto" (zstd if available, otherwise gzip). '
+             'Default: none.',
+    )
+    parser.addini(
+        'snapshot_compression_threshold',
+        default=str(DEFAULT_COMPRESSION_THRESHOLD),
+        help='Snapshots of at least this many bytes are compressed (default: 65536).',
+    )
+    parser.addini(
+        'snapshot_compression_extensions',
+        type='args',
+        default=[],
+        help='File extensions of snapshots that are compressed regardless of their size, for example: .bin .json',
+    )
+
+
+def pytest_addhooks(pluginmanager):
+    pluginmanager.add_hookspecs(hooks)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection(session):
+    """
+    Applies the archives given to --snapshot-apply instead of collecting and running tests.
+    """
+    if not session.config.option.snapshot_apply:
+        return None
+    _apply_snapshot_archives(session)
+    session.items = []
+    return True
+
+
+def _apply_snapshot_archives(session) -> None:
+    """
+    Applies the archives given to --snapshot-apply to the working tree, or records their conflicts.
+
+    The outcome is reported in the terminal summary.
+    """
+    config = session.config
+    snapshot_session = config._snapshot_session
+    archives = []
+    try:
+        for path in config.option.snapshot_apply:
+            try:
+                archives.append(SnapshotArchive(path))
+            except (OSError, ValueError) as e:
+                raise pytest.UsageError('cannot read snapshot archive: {}'.format(e))
+        changes, conflicts = merge_archives(archives)
+        if conflicts:
+            snapshot_session.apply_failed = True
+            snapshot_session.apply_lines = ['{} conflicting snapshot changes, nothing was applied:'.format(
+                len(conflicts))]
+            snapshot_session.apply_lines.extend('  ' + conflict for conflict in conflicts)
+            return
+        storage, _ = SnapshotSession.storage_from_config(config)
+        written, deleted = apply_changes(changes, rootdir(config), storage)
+        deduplicating_storage = find_storage(storage, DeduplicatingStorage)
+        if deduplicating_storage is not None:
+            deduplicating_storage.delete_unreferenced_blobs()
+        snapshot_session.apply_lines = ['applied {} snapshot archives: {} snapshots written, {} deleted'.format(
+            len(archives), written, deleted)]
+    finally:
+        for archive in archives:
+            archive.close()
+
+
+def pytest_sessionstart(session):
+    session.config._snapshot_session = SnapshotSession.from_config(session.config)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    snapshot_session = config._snapshot_session
+    workeroutput = getattr(config, 'workeroutput', None)
+    if workeroutput is None and snapshot_session.usage is not None:
+        _detect_unused_snapshots(session)
+    snapshot_session.sync()
+    if snapshot_session.apply_lines is not None:
+        # No tests ran, which pytest reports as a failure of its own.
+        session.exitstatus = 1 if snapshot_session.apply_failed else 0
+    if workeroutput is not None:
+        if isinstance(snapshot_session.storage, RecordingStorage):
+            workeroutput['snapshot_archive'] = snapshot_session.storage.archive_path
+        # This is a pytest-xdist worker, the controller merges the results of all workers.
+        workeroutput['snapshot_summary'] = snapshot_session.summary.to_dict()
+        workeroutput['snapshot_shared_reports'] = snapshot_session.shared_reports
+        if snapshot_session.deduplicating_storage is not None:
+            workeroutput['snapshot_dropped_references'] = sorted(
+                snapshot_session.deduplicating_storage.dropped_references)
+        if snapshot_session.usage is not None:
+            workeroutput['snapshot_usage'] = snapshot_session.usage.to_dict()
+        if snapshot_session.manifest is not None:
+            workeroutput['snapshot_manifest'] = snapshot_session.manifest.to_dict()
+        workeroutput['snapshot_inputs'] = snapshot_session.inputs_cache.changes()
+        if snapshot_session.durations is not None:
+            workeroutput['snapshot_durations'] = snapshot_session.durations.assertions
+        return
+
+    if snapshot_session.shared_reports and session.exitstatus == 0:
+        session.exitstatus = 1
+    if snapshot_session.deduplicating_storage is not None:
+        snapshot_session.deduplicating_storage.delete_unreferenced_blobs()
+    if snapshot_session.archive_parts:
+        _combine_archive_parts(session)
+    if snapshot_session.manifest is not None:
+        snapshot_session.manifest.save(getattr(config, 'cache', None))
+    snapshot_session.inputs_cache.save()
+    if snapshot_session.durations is not None:
+        config.hook.pytest_snapshot_durations(config=config, report=snapshot_session.durations.report())
+
+
+def _detect_unused_snapshots(session) -> None:
+    """
+    Finds the snapshots that were not used during the session, deletes them if allowed, and fails the session.
+    """
+    snapshot_session = session.config._snapshot_session
+    unused = snapshot_session.usage.find_unused(snapshot_session.storage)
+    if session.config.option.allow_snapshot_deletion:
+        for path in unused:
+            snapshot_session.storage.delete(path)
+    snapshot_session.unused = unused
+    if unused and session.exitstatus == 0:
+        session.exitstatus = 1
+
+
+def _combine_archive_parts(session) -> None:
+    """
+    Merges the partial archives recorded by pytest-xdist workers into the --snapshot-update-output archive.
+    """
+    snapshot_session = session.config._snapshot_session
+    archive_path = snapshot_session.storage.archive_path
+    parts = sorted(snapshot_session.archive_parts)
+    snapshot_session.archive_conflicts = combine_archives([archive_path] + parts, archive_path)
+    for part in parts:
+        os.remove(part)
+    if snapshot_session.archive_conflicts and session.exitstatus == 0:
+        session.exitstatus = 1
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """
+    Merges the snapshot results of a finished pytest-xdist worker into the controller's session.
+    """
+    snapshot_session = node.config._snapshot_session
+    workeroutput = getattr(node, 'workeroutput', {})
+    if 'snapshot_summary' in workeroutput:
+        snapshot_session.summary.merge(workeroutput['snapshot_summary'])
+    snapshot_session.shared_reports.extend(workeroutput.get('snapshot_shared_reports', []))
+    if snapshot_session.deduplicating_storage is not None:
+        snapshot_session.deduplicating_storage.dropped_references.update(
+            workeroutput.get('snapshot_dropped_references', []))
+    if 'snapshot_archive' in workeroutput:
+        snapshot_session.archive_parts.append(workeroutput['snapshot_archive'])
+    if snapshot_session.manifest is not None:
+        snapshot_session.manifest.merge(workeroutput.get('snapshot_manifest'))
+    snapshot_session.inputs_cache.merge(workeroutput.get('snapshot_inputs'))
+    if snapshot_session.usage is not None:
+        snapshot_session.usage.merge(workeroutput.get('snapshot_usage'))
+    if snapshot_session.durations is not None:
+        snapshot_session.durations.merge(workeroutput.get('snapshot_durations', []))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(session, config, items):
+    """
+    Records the snapshot directories of all collected tests for --snapshot-detect-unused, before any are deselected.
+    """
+    usage = config._snapshot_session.usage
+    if usage is None:
+        return
+    # Test modules of which only some tests were selected on the command line, for example test_a.py::test_b.
+    partial_modules = {os.path.abspath(arg.split('::')[0]) for arg in config.args if '::' in arg}
+    dir_args = [os.path.abspath(arg) for arg in config.args if '::' not in arg and os.path.isdir(arg)]
+
+    def add_root(root: Path) -> None:
+        # The tests next to a root may only all be collected if a directory containing them was collected in full.
+        parent = str(root.parent)
+        usage.add_root(str(root), not partial_modules and any(
+            parent == arg or parent.startswith(arg + os.sep) for arg in dir_args))
+
+    add_root(_get_session_snapshot_dir(config))
+    for item in items:
+        if isinstance(item, _pytest.python.Function):
+            owned_dirs = _get_owned_snapshot_dirs(item)
+            usage.add_collected(owned_dirs)
+            module_snapshot_dir = _get_module_snapshot_dir(item)
+            add_root(module_snapshot_dir.parent)
+            if str(item.fspath) in partial_modules:
+                usage.incomplete.add(str(module_snapshot_dir))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    Records whether a test passed, for ``snapshot.cached`` and --snapshot-detect-unused.
+    """
+    outcome = yield
+    report = outcome.get_result()
+    if report.when == 'call':
+        snapshot = getattr(item, 'funcargs', {}).get('snapshot')
+        if isinstance(snapshot, Snapshot):
+            snapshot._record_inputs(report.passed)
+        usage = item.config._snapshot_session.usage
+        if usage is not None and report.passed and isinstance(item, _pytest.python.Function):
+            usage.add_passed(_get_owned_snapshot_dirs(item))
+
+
+def pytest_terminal_summary(terminalreporter):
+    snapshot_session = getattr(terminalreporter.config, '_snapshot_session', None)
+    if snapshot_session is None:
+        return
+    if snapshot_session.apply_lines is not None:
+        terminalreporter.write_sep('=', 'snapshot archives')
+        for line in snapshot_session.apply_lines:
+            terminalreporter.write_line(line)
+
+    if snapshot_session.shared_reports:
+        terminalreporter.write_sep('=', 'modified shared snapshots')
+        for report in snapshot_session.shared_reports:
+            terminalreporter.write_line(report)
+
+    if snapshot_session.summary:
+        terminalreporter.write_sep('=', 'snapshot summary')
+        for line in snapshot_session.summary.terminal_lines(terminalreporter.config.option.verbose > 0):
+            terminalreporter.write_line(line)
+
+    if snapshot_session.unused:
+        terminalreporter.write_sep('=', 'unused snapshots')
+        deleted = terminalreporter.config.option.allow_snapshot_deletion
+        for line in unused_terminal_lines(snapshot_session.unused, deleted):
+            terminalreporter.write_line(line)
+
+    if isinstance(snapshot_session.storage, RecordingStorage):
+        terminalreporter.write_sep('=', 'snapshot archive')
+        archive_path = shorten_path(Path(snapshot_session.storage.archive_path))
+        terminalreporter.write_line('Snapshot changes were recorded in {} instead of being applied '
+                                    '(run pytest --snapshot-apply {} to apply them)'.format(archive_path, archive_path))
+        if snapshot_session.archive_conflicts:
+            terminalreporter.write_line('{} snapshots were changed differently by pytest-xdist workers:'.format(
+                len(snapshot_session.archive_conflicts)))
+            for conflict in snapshot_session.archive_conflicts:
+                terminalreporter.write_line('  ' + conflict)
+
+    count = terminalreporter.config.option.snapshot_durations
+    if count is not None and snapshot_session.durations is not None and snapshot_session.durations.assertions:
+        terminalreporter.write_sep('=', 'slowest {}snapshot assertions'.format('{} '.format(count) if count else ''))
+        for line in snapshot_session.durations.terminal_lines(count):
+            terminalreporter.write_line(line)
+
+
+def _new_snapshot(request, default_snapshot_dir: Path, shared: bool = False) -> 'Snapshot':
+    option = request.config.option
+    return Snapshot(option.snapshot_update or option.snapshot_update_output is not None,
+                    option.allow_snapshot_deletion,
+                    default_snapshot_dir,
+                    getattr(request.config, '_snapshot_session', None),
+                    request.node.nodeid,
+                    shared)
 
 
 @pytest.fixture
 def snapshot(request):
-    default_snapshot_dir = _get_default_snapshot_dir(request.node)
+    with _new_snapshot(request, _get_default_snapshot_dir(request.node)) as snapshot:
+        yield snapshot
 
-    with Snapshot(request.config.option.snapshot_update,
-                  request.config.option.allow_snapshot_deletion,
-                  default_snapshot_dir) as snapshot:
+
+@pytest.fixture(scope='module')
+def module_snapshot(request):
+    """
+    Like ``snapshot``, but shared by all tests of a module, for snapshotting the results of module scoped fixtures.
+
+    Snapshots are stored in the "module-snapshots" directory next to the default snapshot directories of the module's
+    tests. Modified snapshots are reported at the end of the session. They are owned by all tests of the module,
+    so --snapshot-detect-unused only reports them if every test of the module ran and passed.
+    """
+    module_snapshot_dir = _get_module_snapshot_dir(request.node).joinpath(MODULE_SNAPSHOTS_DIR_NAME)
+    with _new_snapshot(request, module_snapshot_dir, shared=True) as snapshot:
+        yield snapshot
+
+
+@pytest.fixture(scope='session')
+def session_snapshot(request):
+    """
+    Like ``snapshot``, but shared by all tests of the session, for snapshotting the results of session scoped fixtures.
+
+    Snapshots are stored in the "snapshots" directory of the pytest rootdir.
+    Modified snapshots are reported at the end of the session. They are owned by all tests of the session,
+    so --snapshot-detect-unused only reports them if every test ran and passed.
+    """
+    with _new_snapshot(request, _get_session_snapshot_dir(request.config), shared=True) as snapshot:
         yield snapshot
 
 
@@ -56,15 +453,113 @@ Warning: git may decide to modify the newlines in the snapshot file.
 To avoid this read \
 https://docs.github.com/en/get-started/getting-started-with-git/configuring-git-to-handle-line-endings''')
 
+    if _LINESEP_IS_LF:
+        return string.encode()
     return string.replace('\n', os.linesep).encode()
 
 
+def _iter_file_encode(string: str, chunk_size: int = ENCODE_CHUNK_SIZE):
+    """
+    Yields the bytes returned by ``_file_encode(string)`` in chunks, without building the whole encoded value.
+    """
+    for i in range(0, len(string), chunk_size):
+        yield _file_encode(string[i:i + chunk_size])
+
+
 def _file_decode(data: bytes) -> str:
     """
     Returns the string that would be read from a file using ``path.read_text(string)``.
     See universal newlines documentation.
     """
-    return data.decode().replace('\r\n', '\n').replace('\r', '\n')
+    if b'\r' not in data:
+        return data.decode()
+    return _NEWLINES_REGEX.sub('\n', data.decode())
+
+
+def _text_equals_encoded(value: str, data: bytes) -> bool:
+    """
+    Returns True if ``_file_decode(data) == value``, by comparing ``data`` to the encoded value without decoding it.
+
+    A False result is inconclusive, the data should then be decoded and compared to ``value`` as usual.
+    """
+    if '\r' in value:
+        return False
+    try:
+        return _file_encode(value) == data
+    except UnicodeEncodeError:
+        return False
+
+
+def _is_stream(value) -> bool:
+    """
+    Returns true if ``value`` should be snapshotted as a stream of chunks rather than as a single value.
+
+    Only file objects and iterators, such as generators, are streams. Other iterables, for example lists, tuples or
+    data frames whose iteration yields column names, are values and need a serializer.
+    """
+    return hasattr(value, 'read') or isinstance(value, collections.abc.Iterator)
+
+
+def _iter_stream(value) -> Iterator[Any]:
+    if hasattr(value, 'read'):
+        while True:
+            chunk = value.read(ENCODE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for chunk in value:
+            yield chunk
+
+
+def _stream_chunks(value) -> Tuple[bool, Iterator[Union[str, bytes]]]:
+    """
+    Returns a 2-tuple of whether the file object or iterator ``value`` is binary and an iterator over its chunks.
+
+    Raises ``TypeError`` if the chunks are not all str or all bytes.
+    """
+    chunks = _iter_stream(value)
+    first_chunk = next(chunks, b'')
+    if not isinstance(first_chunk, (str, bytes)):
+        raise TypeError('stream chunks must be str or bytes')
+    chunk_type = type(first_chunk)
+
+    def checked_chunks():
+        yield first_chunk
+        for chunk in chunks:
+            if type(chunk) is not chunk_type:
+                raise TypeError('stream chunks must all be str or all be bytes')
+            yield chunk
+
+    return chunk_type is bytes, checked_chunks()
+
+
+class _LargeTextMismatch(AssertionError):
+    """
+    Raised when large texts differ. The diff is only rendered when the error is converted to a string.
+    """
+    def __init__(self, snapshot: str, value: str, context: int, max_hunks: int, limit: int):
+        super().__init__()
+        self._args = (snapshot, value, context, max_hunks, limit)
+        self._message = None  # type: Optional[str]
+
+    def __str__(self):
+        if self._message is None:
+            self._message = unified_diff(*self._args)
+        return self._message
+
+
+def _counted_chunks(chunks: Iterable[bytes], timing: SnapshotTiming) -> Iterator[bytes]:
+    for chunk in chunks:
+        timing.bytes_written += len(chunk)
+        yield chunk
+
+
+def _raise_snapshot_mismatch(snapshot_path: Path, snapshot_diff_msg: str) -> None:
+    __tracebackhide__ = True
+    raise AssertionError('value does not match the expected value in snapshot {}\n'
+                         '  (run pytest with --snapshot-update to update snapshots)\n{}'.format(
+                             shorten_path(snapshot_path), snapshot_diff_msg))
 
 
 class Snapshot:
@@ -74,20 +569,40 @@ class Snapshot:
     _updated_snapshots = None  # type: List[Path]
     _snapshots_to_delete = None  # type: List[Path]
     _snapshot_dir = None  # type: Path
+    _session = None  # type: SnapshotSession
+    _storage = None  # type: SnapshotStorage
+    _nodeid = None  # type: str
+    _asserted_snapshots = None  # type: Set[Tuple[Path, Path]]
+    _inputs_digest = None  # type: Optional[str]
+    _inputs_cached = False
+    _shared = False
 
-    def __init__(self, snapshot_update: bool, allow_snapshot_deletion: bool, snapshot_dir: Path):
+    def __init__(self, snapshot_update: bool, allow_snapshot_deletion: bool, snapshot_dir: Path,
+                 session: Optional[SnapshotSession] = None, nodeid: str = '', shared: bool = False):
         self._snapshot_update = snapshot_update
+        # Shared snapshots belong to module or session scoped fixtures. Their modifications are reported at the end
+        # of the session instead of failing the test that tears them down.
+        self._shared = shared
+        self._session = session if session is not None else SnapshotSession()
+        self._storage = self._session.storage
+        self._nodeid = nodeid
         self._allow_snapshot_deletion = allow_snapshot_deletion
         self.snapshot_dir = snapshot_dir
         self._created_snapshots = []
         self._updated_snapshots = []
         self._snapshots_to_delete = []
+        self._asserted_snapshots = set()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._session.usage is not None:
+            self._session.usage.used.update(str(path) for _, path in self._asserted_snapshots)
         if self._created_snapshots or self._updated_snapshots or self._snapshots_to_delete:
+            deleted = self._snapshots_to_delete if self._allow_snapshot_deletion else []
+            to_delete = [] if self._allow_snapshot_deletion else self._snapshots_to_delete
+            self._session.summary.record(self._created_snapshots, self._updated_snapshots, deleted, to_delete)
             message_lines = ['Snapshot directory was modified: {}'.format(shorten_path(self.snapshot_dir)),
                              '  (verify that the changes are expected before committing them to version control)']
             if self._created_snapshots:
@@ -101,7 +616,7 @@ class Snapshot:
             if self._snapshots_to_delete:
                 if self._allow_snapshot_deletion:
                     for path in self._snapshots_to_delete:
-                        path.unlink()
+                        self._storage.delete(str(path))
                     message_lines.append('  Deleted snapshots:')
                 else:
                     message_lines.append('  Snapshots that should be deleted: '
@@ -109,7 +624,10 @@ class Snapshot:
 
                 message_lines.extend('    ' + str(s.relative_to(self.snapshot_dir)) for s in self._snapshots_to_delete)
 
-            pytest.fail('\n'.join(message_lines), pytrace=False)
+            if self._shared:
+                self._session.shared_reports.append('\n'.join(message_lines))
+            else:
+                pytest.fail('\n'.join(message_lines), pytrace=False)
 
     @property
     def snapshot_dir(self):
@@ -117,7 +635,9 @@ class Snapshot:
 
     @snapshot_dir.setter
     def snapshot_dir(self, value):
-        self._snapshot_dir = Path(value).absolute()
+        if not (isinstance(value, Path) and value.is_absolute()):
+            value = Path(value).absolute()
+        self._snapshot_dir = value
 
     def _snapshot_path(self, snapshot_name: Union[str, Path]) -> Path:
         """
@@ -133,9 +653,21 @@ class Snapshot:
             raise ValueError('Snapshot path {} is not in {}'.format(
                 shorten_path(snapshot_path), shorten_path(self.snapshot_dir)))
 
+        self._storage.open_dir(str(self.snapshot_dir))
         return snapshot_path
 
-    def _get_compare_encode_decode(self, value: Union[str, bytes]):
+    def _assert_text_equal(self, value: str, snapshot: str) -> None:
+        """
+        Like ``_assert_equal``, but large texts are diffed with a bounded line diff instead of pytest's diff.
+        """
+        __tracebackhide__ = True
+        if len(value) < LARGE_TEXT_SIZE and len(snapshot) < LARGE_TEXT_SIZE:
+            _assert_equal(value, snapshot)
+        elif value != snapshot:
+            raise _LargeTextMismatch(snapshot, value, self._session.diff_context, self._session.diff_hunks,
+                                     self._session.diff_limit)
+
+    def _get_compare_encode_decode(self, value: Any):
         """
         Returns a 3-tuple of a compare function, an encoding function, and a decoding function.
 
@@ -145,112 +677,593 @@ class Snapshot:
         * The decoding function should decode bytes from a snapshot file into a object.
         """
         if isinstance(value, str):
-            return _assert_equal, _file_encode, _file_decode
+            return self._assert_text_equal, _file_encode, _file_decode
         elif isinstance(value, bytes):
             return _assert_equal, lambda x: x, lambda x: x
+        serializer = self._session.serializers.get(type(value))
+        if serializer is None:
+            raise TypeError('value must be str, bytes, a file object, an iterator of str or bytes chunks, '
+                            'or a value of a type with a registered serializer')
+        # Every assertion needs the encoded value, so it is encoded once up front.
+        encoded_value = serializer.encode(value)
+        return serializer.compare, lambda x: encoded_value, serializer.decode
+
+    def _known_to_match(self, value: Any, snapshot_path: Path, encode) -> bool:
+        """
+        Returns true if the storage knows, without reading it, that the snapshot already contains the encoded ``value``.
+        """
+        if isinstance(value, bytes):
+            chunks = [value]
+        elif not isinstance(value, str):
+            chunks = [encode(value)]
+        elif '\r' in value:
+            return False
+        else:
+            chunks = _iter_file_encode(value)
+        try:
+            return self._storage.known_to_contain(str(snapshot_path), chunks)
+        except UnicodeEncodeError:
+            return False
+
+    def _assert_large_bytes_match(self, value: bytes, snapshot_path: Path, snapshot_size: Optional[int],
+                                  timing: SnapshotTiming) -> None:
+        """
+        Compares ``value`` to a large snapshot in chunks, for example using a memory map of the snapshot file.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        with timing.phase('compare'):
+            snapshot_diff_msg = self._storage.compare(str(snapshot_path), value)
+            timing.bytes_read += snapshot_size if snapshot_size is not None else len(value)
+        if snapshot_diff_msg is not None:
+            _raise_snapshot_mismatch(snapshot_path, snapshot_diff_msg)
+        self._storage.record_verified(str(snapshot_path), value)
+
+    def _assert_stream_match(self, value: Union[IO, Iterator[Union[str, bytes]]], snapshot_path: Path,
+                             timing: SnapshotTiming) -> None:
+        """
+        Like ``assert_match``, but consumes the file object or iterator of chunks ``value`` incrementally.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        binary, chunks = _stream_chunks(value)
+        if self._storage.is_file(str(snapshot_path)):
+            snapshot_exists = True
+        elif self._storage.exists(str(snapshot_path)):
+            raise AssertionError('snapshot exists but is not a file: {}'.format(shorten_path(snapshot_path)))
+        else:
+            snapshot_exists = False
+
+        if self._snapshot_update:
+            with timing.phase('write'):
+                modified = self._storage.write_stream(str(snapshot_path), _counted_chunks(
+                    chunks if binary else (_file_encode(chunk) for chunk in chunks), timing))
+            if modified:
+                if snapshot_exists:
+                    self._updated_snapshots.append(snapshot_path)
+                else:
+                    self._created_snapshots.append(snapshot_path)
+        elif snapshot_exists:
+            with timing.phase('compare'):
+                snapshot_diff_msg = self._storage.compare_stream(str(snapshot_path), chunks, binary)
+                timing.bytes_read += self._storage.size(str(snapshot_path)) or 0
+            if snapshot_diff_msg is not None:
+                _raise_snapshot_mismatch(snapshot_path, snapshot_diff_msg)
         else:
-            raise TypeError('value must be str or bytes')
+            raise AssertionError(
+                "snapshot {} doesn't exist. (run pytest with --snapshot-update to create it)".format(
+                    shorten_path(snapshot_path)))
 
-    def assert_match(self, value: Union[str, bytes], snapshot_name: Union[str, Path]):
+    def cached(self, key_inputs: Iterable[Any]) -> bool:
+        """
+        Returns True if the test passed in an earlier run with the same ``key_inputs``,
+        and the snapshots it asserted in that run are unchanged.
+        The test can then return without generating and asserting its values.
+
+        ``key_inputs`` are the inputs that the snapshotted values are generated from.
+        ``pathlib.Path`` inputs are identified by the contents of the file or directory they point to,
+        other inputs by their ``repr``.
+
+        The digests are recorded in the pytest cache whenever the test passes.
+        Always returns False if pytest was run with the --snapshot-update flag.
+        Only supported by the ``snapshot`` fixture, since the inputs are recorded when a single test passes.
+        """
+        if self._shared:
+            raise RuntimeError('cached() is only supported by the snapshot fixture, '
+                               'not by module_snapshot or session_snapshot')
+        inputs_cache = self._session.inputs_cache
+        if self._snapshot_update or not inputs_cache.enabled:
+            return False
+        self._inputs_digest = digest_inputs(key_inputs)
+        entry = inputs_cache.get(self._nodeid)
+        self._inputs_cached = (
+            entry is not None and entry['key'] == self._inputs_digest and
+            all(self._snapshot_digest(snapshot_dir, path) == digest
+                for snapshot_dir, path, digest in entry['snapshots']))
+        if self._inputs_cached:
+            self._asserted_snapshots.update((Path(snapshot_dir), Path(path))
+                                            for snapshot_dir, path, _ in entry['snapshots'])
+        return self._inputs_cached
+
+    def _snapshot_digest(self, snapshot_dir: str, snapshot_path: str) -> Optional[str]:
+        self._storage.open_dir(snapshot_dir)
+        if not self._storage.is_file(snapshot_path):
+            return None
+        return hash_chunks([self._storage.read(snapshot_path)])[1]
+
+    def _record_inputs(self, passed: bool) -> None:
+        """
+        Records the key inputs given to ``cached`` once the test has finished.
+        """
+        if self._inputs_digest is None or self._inputs_cached:
+            return
+        inputs_cache = self._session.inputs_cache
+        if not passed:
+            inputs_cache.discard(self._nodeid)
+            return
+        snapshots = [[str(snapshot_dir), str(path), self._snapshot_digest(str(snapshot_dir), str(path))]
+                     for snapshot_dir, path in sorted(self._asserted_snapshots)]
+        inputs_cache.record(self._nodeid, self._inputs_digest, snapshots)
+
+    def assert_match(self, value: Any, snapshot_name: Union[str, Path]):
         """
         Asserts that ``value`` equals the current value of the snapshot with the given ``snapshot_name``.
 
+        ``value`` may also be a binary or text file object, or an iterator of str or bytes chunks such as a generator.
+        These are consumed one chunk at a time, so the whole value is never held in memory.
+        Other values are stored using the serializer registered for their type, see ``pytest_snapshot.serializers``.
+        By default, dicts, lists, tuples, numbers, None and dataclasses are stored as JSON,
+        and NumPy arrays as ``.npy`` files.
+
         If pytest was run with the --snapshot-update flag, the snapshot will instead be updated to ``value``.
         The test will fail if there were any changes to the snapshot.
         """
         __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
-        compare, encode, decode = self._get_compare_encode_decode(value)
-        snapshot_path = self._snapshot_path(snapshot_name)
+        timing = SnapshotTiming('assert_match', self._nodeid)
+        try:
+            self._assert_match(value, snapshot_name, timing)
+        finally:
+            self._finish_timing(timing)
 
-        if snapshot_path.is_file():
-            encoded_expected_value = snapshot_path.read_bytes()
-        elif snapshot_path.exists():
-            raise AssertionError('snapshot exists but is not a file: {}'.format(shorten_path(snapshot_path)))
-        else:
-            encoded_expected_value = None
+    def _finish_timing(self, timing: SnapshotTiming) -> None:
+        timing.stop()
+        self._session.summary.duration += timing.duration
+        if self._session.durations is not None:
+            self._session.durations.add(timing)
 
-        if self._snapshot_update:
+    def _update_snapshot(self, value: Any, snapshot_path: Path, snapshot_exists: bool,
+                         compare, encode, decode, timing: SnapshotTiming) -> None:
+        """
+        Writes the encoded ``value`` to the snapshot file unless the file already contains it.
+
+        The existing snapshot is only read if its size equals the size of the encoded value, or is unknown.
+        """
+        with timing.phase('codec'):
             encoded_value = encode(value)
-            if encoded_expected_value is None or encoded_value != encoded_expected_value:
-                decoded_encoded_value = decode(encoded_value)
-                if decoded_encoded_value != value:
-                    raise ValueError("value is not supported by pytest-snapshot's serializer.")
-
-                snapshot_path.parent.mkdir(parents=True, exist_ok=True)
-                snapshot_path.write_bytes(encoded_value)
-                if encoded_expected_value is None:
-                    self._created_snapshots.append(snapshot_path)
+        if snapshot_exists:
+            snapshot_size = self._storage.size(str(snapshot_path))
+            if snapshot_size is None or snapshot_size == len(encoded_value):
+                if snapshot_size is None or snapshot_size < LARGE_SNAPSHOT_SIZE:
+                    with timing.phase('read'):
+                        encoded_snapshot = self._storage.read(str(snapshot_path))
+                        timing.bytes_read += len(encoded_snapshot)
+                    with timing.phase('compare'):
+                        unchanged = encoded_snapshot == encoded_value
                 else:
-                    self._updated_snapshots.append(snapshot_path)
+                    with timing.phase('compare'):
+                        unchanged = self._storage.compare(str(snapshot_path), encoded_value) is None
+                        timing.bytes_read += snapshot_size
+                if unchanged:
+                    self._storage.record_verified(str(snapshot_path), encoded_value)
+                    return
+
+        # Check that the snapshot will decode back into value. This is only done before writing, and bytes always
+        # survive the roundtrip.
+        if not isinstance(value, bytes):
+            with timing.phase('codec'):
+                try:
+                    compare(value, decode(encoded_value))
+                except AssertionError:
+                    supported = False
+                else:
+                    supported = True
+            if not supported:
+                raise ValueError("value is not supported by pytest-snapshot's serializer.")
+
+        with timing.phase('write'):
+            self._storage.write(str(snapshot_path), encoded_value)
+            timing.bytes_written += len(encoded_value)
+        if snapshot_exists:
+            self._updated_snapshots.append(snapshot_path)
         else:
-            if encoded_expected_value is not None:
-                expected_value = decode(encoded_expected_value)
+            self._created_snapshots.append(snapshot_path)
+        self._storage.record_verified(str(snapshot_path), encoded_value)
+
+    def _assert_match(self, value: Any, snapshot_name: Union[str, Path], timing: SnapshotTiming) -> None:
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        stream = _is_stream(value) and self._session.serializers.get(type(value)) is None
+        if stream and not self._storage.supports_streams:
+            binary, chunks = _stream_chunks(value)
+            value = (b'' if binary else '').join(chunks)
+            stream = False
+        if stream:
+            with timing.phase('path'):
+                snapshot_path = self._snapshot_path(snapshot_name)
+            timing.snapshot = str(snapshot_path)
+            self._asserted_snapshots.add((self.snapshot_dir, snapshot_path))
+            self._assert_stream_match(value, snapshot_path, timing)
+            return
+
+        with timing.phase('codec'):
+            compare, encode, decode = self._get_compare_encode_decode(value)
+        with timing.phase('path'):
+            snapshot_path = self._snapshot_path(snapshot_name)
+        timing.snapshot = str(snapshot_path)
+        self._asserted_snapshots.add((self.snapshot_dir, snapshot_path))
+
+        with timing.phase('compare'):
+            if self._known_to_match(value, snapshot_path, encode):
+                return
+
+        snapshot_exists = self._storage.is_file(str(snapshot_path))
+        if not snapshot_exists and self._storage.exists(str(snapshot_path)):
+            raise AssertionError('snapshot exists but is not a file: {}'.format(shorten_path(snapshot_path)))
+
+        if self._snapshot_update:
+            self._update_snapshot(value, snapshot_path, snapshot_exists, compare, encode, decode, timing)
+        else:
+            if snapshot_exists:
+                if isinstance(value, bytes):
+                    snapshot_size = self._storage.size(str(snapshot_path))
+                    if max(len(value), snapshot_size or 0) >= LARGE_SNAPSHOT_SIZE:
+                        self._assert_large_bytes_match(value, snapshot_path, snapshot_size, timing)
+                        return
+                with timing.phase('read'):
+                    encoded_expected_value = self._storage.read(str(snapshot_path))
+                    timing.bytes_read += len(encoded_expected_value)
+                if not isinstance(value, bytes):
+                    # Equal values are found by comparing bytes, which avoids decoding the snapshot.
+                    with timing.phase('compare'):
+                        if isinstance(value, str):
+                            matches = _text_equals_encoded(value, encoded_expected_value)
+                        else:
+                            matches = encode(value) == encoded_expected_value
+                        if matches:
+                            self._storage.record_verified(str(snapshot_path), encoded_expected_value)
+                            return
+                with timing.phase('codec'):
+                    expected_value = decode(encoded_expected_value)
                 try:
-                    compare(value, expected_value)
+                    with timing.phase('compare'):
+                        compare(value, expected_value)
                 except AssertionError as e:
-                    snapshot_diff_msg = str(e)
+                    with timing.phase('diff'):
+                        snapshot_diff_msg = str(e)
                 else:
                     snapshot_diff_msg = None
+                    self._storage.record_verified(str(snapshot_path), encoded_expected_value)
 
                 if snapshot_diff_msg is not None:
-                    snapshot_diff_msg = 'value does not match the expected value in snapshot {}\n' \
-                                        '  (run pytest with --snapshot-update to update snapshots)\n{}'.format(
-                                            shorten_path(snapshot_path), snapshot_diff_msg)
-                    raise AssertionError(snapshot_diff_msg)
+                    _raise_snapshot_mismatch(snapshot_path, snapshot_diff_msg)
             else:
                 raise AssertionError(
                     "snapshot {} doesn't exist. (run pytest with --snapshot-update to create it)".format(
                         shorten_path(snapshot_path)))
 
-    def assert_match_dir(self, dir_dict: dict, snapshot_dir_name: Union[str, Path]):
+    def assert_match_array(self, value: Any, snapshot_name: Union[str, Path], rtol: float = 1e-07, atol: float = 0.0):
+        """
+        Asserts that the NumPy array ``value`` is close to the array in the snapshot with the given ``snapshot_name``.
+
+        Arrays are stored in the ``.npy`` format and must match the snapshot's shape and dtype.
+        Numeric elements are compared like ``numpy.isclose`` with the given tolerances, treating NaNs as equal,
+        and mismatches are summarized by their count, maximum errors and first indices.
+        Large snapshots are memory-mapped instead of read.
+
+        If pytest was run with the --snapshot-update flag, the snapshot will instead be updated to ``value``
+        unless it is already close to ``value``. The test will fail if there were any changes to the snapshot.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        timing = SnapshotTiming('assert_match_array', self._nodeid)
+        try:
+            self._assert_match_array(value, snapshot_name, rtol, atol, timing)
+        finally:
+            self._finish_timing(timing)
+
+    def _load_array(self, snapshot_path: Path, timing: SnapshotTiming) -> Any:
+        numpy = import_numpy()
+        snapshot_size = self._storage.size(str(snapshot_path))
+        if snapshot_size is not None and snapshot_size >= LARGE_SNAPSHOT_SIZE:
+            local_path = self._storage.local_path(str(snapshot_path))
+            if local_path is not None:
+                timing.bytes_read += snapshot_size
+                return numpy.load(local_path, mmap_mode='r', allow_pickle=False)
+        data = self._storage.read(str(snapshot_path))
+        timing.bytes_read += len(data)
+        return _NPY_SERIALIZER.decode(data)
+
+    def _assert_match_array(self, value: Any, snapshot_name: Union[str, Path], rtol: float, atol: float,
+                            timing: SnapshotTiming) -> None:
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        numpy = import_numpy()
+        value = numpy.asarray(value)
+        if value.dtype.hasobject:
+            raise TypeError('arrays of Python objects are not supported')
+
+        with timing.phase('path'):
+            snapshot_path = self._snapshot_path(snapshot_name)
+        timing.snapshot = str(snapshot_path)
+        self._asserted_snapshots.add((self.snapshot_dir, snapshot_path))
+
+        snapshot_exists = self._storage.is_file(str(snapshot_path))
+        if not snapshot_exists and self._storage.exists(str(snapshot_path)):
+            raise AssertionError('snapshot exists but is not a file: {}'.format(shorten_path(snapshot_path)))
+
+        if snapshot_exists:
+            with timing.phase('read'):
+                expected_value = self._load_array(snapshot_path, timing)
+            with timing.phase('compare'):
+                snapshot_diff_msg = compare_arrays(value, expected_value, rtol, atol)
+            # Release a memory-mapped snapshot before it is overwritten.
+            del expected_value
+            if snapshot_diff_msg is None:
+                return
+        elif not self._snapshot_update:
+            raise AssertionError(
+                "snapshot {} doesn't exist. (run pytest with --snapshot-update to create it)".format(
+                    shorten_path(snapshot_path)))
+
+        if not self._snapshot_update:
+            _raise_snapshot_mismatch(snapshot_path, snapshot_diff_msg)
+
+        with timing.phase('codec'):
+            encoded_value = _NPY_SERIALIZER.encode(value)
+        with timing.phase('write'):
+            self._storage.write(str(snapshot_path), encoded_value)
+            timing.bytes_written += len(encoded_value)
+        if snapshot_exists:
+            self._updated_snapshots.append(snapshot_path)
+        else:
+            self._created_snapshots.append(snapshot_path)
+        self._storage.record_verified(str(snapshot_path), encoded_value)
+
+    def assert_match_dir(self, dir_dict: Union[Mapping, Iterable[Tuple[Union[str, PurePath], Any]]],
+                         snapshot_dir_name: Union[str, Path]):
         """
         Asserts that the values in dir_dict equal the current values in the given snapshot directory.
 
+        ``dir_dict`` is a (possibly nested) mapping from file names to values, or an iterable of
+        ``(relative_path, value)`` pairs such as a generator. Files are checked one at a time as they are produced,
+        and values of mappings are only accessed when their file is checked, so the whole directory is never
+        held in memory.
+
         If pytest was run with the --snapshot-update flag, the snapshots will be updated.
         The test will fail if there were any changes to the snapshots.
         """
         __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
-        if not isinstance(dir_dict, dict):
-            raise TypeError('dir_dict must be a dictionary')
-
-        snapshot_dir_path = self._snapshot_path(snapshot_dir_name)
-        values_by_filename = flatten_filesystem_dict(dir_dict)
-        if snapshot_dir_path.is_dir():
-            existing_names = {p.relative_to(snapshot_dir_path).as_posix()
-                              for p in snapshot_dir_path.rglob('*') if p.is_file()}
-        elif snapshot_dir_path.exists():
+        timing = SnapshotTiming('assert_match_dir', self._nodeid)
+        try:
+            self._assert_match_dir(dir_dict, snapshot_dir_name, timing)
+        finally:
+            self._finish_timing(timing)
+
+    def _assert_match_dir(self, dir_dict: Union[Mapping, Iterable[Tuple[Union[str, PurePath], Any]]],
+                          snapshot_dir_name: Union[str, Path], timing: SnapshotTiming) -> None:
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        if isinstance(dir_dict, Mapping):
+            files = iter_filesystem_dict(dir_dict)
+        elif hasattr(dir_dict, '__iter__') and not isinstance(dir_dict, (str, bytes)):
+            files = iter_filesystem_pairs(dir_dict)
+        else:
+            raise TypeError('dir_dict must be a dictionary or an iterable of (path, value) pairs')
+        self._assert_match_files(files, snapshot_dir_name, self._assert_match, timing)
+
+    def assert_match_tree(self, path: Union[str, Path], snapshot_dir_name: Union[str, Path]):
+        """
+        Asserts that the files below the directory ``path`` equal the files in the given snapshot directory.
+
+        The directory is walked one listing at a time and every file is compared to its snapshot as bytes,
+        first by size and then chunk by chunk, without reading whole files into memory.
+
+        If pytest was run with the --snapshot-update flag, changed files will be copied to the snapshot directory
+        and snapshots without files will be deleted. The test will fail if there were any changes to the snapshots.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        timing = SnapshotTiming('assert_match_tree', self._nodeid)
+        try:
+            path = str(path)
+            if not os.path.isdir(path):
+                raise ValueError('{} is not a directory'.format(path))
+            files = iter_filesystem_pairs(iter_tree(path))
+            self._assert_match_files(files, snapshot_dir_name, self._assert_file_match, timing)
+        finally:
+            self._finish_timing(timing)
+
+    def _assert_file_match(self, entry: 'os.DirEntry', snapshot_path: Path, timing: SnapshotTiming) -> None:
+        """
+        Like ``_assert_match`` for the file of ``entry``, comparing and copying it without loading it into memory.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        timing.snapshot = str(snapshot_path)
+        self._asserted_snapshots.add((self.snapshot_dir, snapshot_path))
+        snapshot_exists = self._storage.is_file(str(snapshot_path))
+        if not snapshot_exists and self._storage.exists(str(snapshot_path)):
+            raise AssertionError('snapshot exists but is not a file: {}'.format(shorten_path(snapshot_path)))
+
+        if snapshot_exists:
+            value_size = entry.stat().st_size
+            snapshot_size = self._storage.size(str(snapshot_path))
+            if snapshot_size is not None and value_size != snapshot_size:
+                snapshot_diff_msg = 'file sizes differ (value has {} bytes, snapshot has {} bytes)'.format(
+                    value_size, snapshot_size)
+            else:
+                with timing.phase('compare'):
+                    if self._storage.supports_streams:
+                        with open(entry.path, 'rb') as f:
+                            snapshot_diff_msg = self._storage.compare_stream(str(snapshot_path), _iter_stream(f), True)
+                    else:
+                        # The storage compares the memory-mapped file one chunk at a time.
+                        with map_file(entry.path, value_size) as mapped:
+                            snapshot_diff_msg = self._storage.compare(str(snapshot_path), mapped)
+                    timing.bytes_read += value_size
+            if snapshot_diff_msg is None:
+                return
+            if not self._snapshot_update:
+                _raise_snapshot_mismatch(snapshot_path, snapshot_diff_msg)
+        elif not self._snapshot_update:
+            raise AssertionError(
+                "snapshot {} doesn't exist. (run pytest with --snapshot-update to create it)".format(
+                    shorten_path(snapshot_path)))
+
+        with timing.phase('write'):
+            self._storage.write_file(str(snapshot_path), entry.path)
+            timing.bytes_written += entry.stat().st_size
+        if snapshot_exists:
+            self._updated_snapshots.append(snapshot_path)
+        else:
+            self._created_snapshots.append(snapshot_path)
+
+    def _assert_match_files(self, files: Iterable[Tuple[str, Any]], snapshot_dir_name: Union[str, Path],
+                            assert_file: Callable[[Any, Path, SnapshotTiming], None], timing: SnapshotTiming) -> None:
+        """
+        Calls ``assert_file`` for every ``(name, value)`` pair in ``files`` and checks the snapshot directory
+        contains exactly the files in ``files``.
+
+        In update mode, snapshots without values are queued for deletion.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        with timing.phase('path'):
+            snapshot_dir_path = self._snapshot_path(snapshot_dir_name)
+        timing.snapshot = str(snapshot_dir_path)
+        if self._storage.is_dir(str(snapshot_dir_path)):
+            existing_names = set(self._storage.list_dir(str(snapshot_dir_path)))
+        elif self._storage.exists(str(snapshot_dir_path)):
             raise AssertionError('snapshot exists but is not a directory: {}'.format(shorten_path(snapshot_dir_path)))
         else:
             existing_names = set()
 
-        names = set(values_by_filename)
-        added_names = names - existing_names
+        names = set()  # type: Set[str]
+        added_names = []  # type: List[str]
+
+        def files_to_check() -> Iterator[Tuple[Path, Any]]:
+            for name, value in files:
+                if name in names:
+                    raise ValueError('Path {!r} appears more than once in dir_dict.'.format(name))
+                names.add(name)
+                if self._snapshot_update or name in existing_names:
+                    yield snapshot_dir_path.joinpath(name), value
+                else:
+                    added_names.append(name)
+
+        # Call assert_match to add, update, or assert equality for all snapshot files in the directory.
+        checked_files = files_to_check()
+        try:
+            if self._session.workers > 1 and self._storage.thread_safe:
+                self._assert_match_files_parallel(checked_files, assert_file, timing)
+            else:
+                snapshot = timing.snapshot
+                for path, value in checked_files:
+                    assert_file(value, path, timing)
+                timing.snapshot = snapshot
+            mismatch = None
+        except AssertionError as e:
+            if self._snapshot_update:
+                raise
+            # Missing or extra files are reported instead of the first mismatching file, so all names are needed.
+            mismatch = e
+            for _ in checked_files:
+                pass
+
         removed_names = existing_names - names
         if self._snapshot_update:
             self._snapshots_to_delete.extend(snapshot_dir_path.joinpath(name) for name in sorted(removed_names))
-        else:
-            if added_names or removed_names:
-                message_lines = ['Values do not match snapshots in {}'.format(shorten_path(snapshot_dir_path)),
-                                 '  (run pytest with --snapshot-update to update the snapshot directory)']
-                if added_names:
-                    message_lines.append("  Values without snapshots:")
-                    message_lines.extend('    ' + s for s in added_names)
-                if removed_names:
-                    message_lines.append("  Snapshots without values:")
-                    message_lines.extend('    ' + s for s in removed_names)
-                raise AssertionError('\n'.join(message_lines))
+        elif added_names or removed_names:
+            message_lines = ['Values do not match snapshots in {}'.format(shorten_path(snapshot_dir_path)),
+                             '  (run pytest with --snapshot-update to update the snapshot directory)']
+            if added_names:
+                message_lines.append("  Values without snapshots:")
+                message_lines.extend('    ' + s for s in sorted(added_names))
+            if removed_names:
+                message_lines.append("  Snapshots without values:")
+                message_lines.extend('    ' + s for s in sorted(removed_names))
+            raise AssertionError('\n'.join(message_lines))
+        if mismatch is not None:
+            raise mismatch
 
-        # Call assert_match to add, update, or assert equality for all snapshot files in the directory.
-        for name, value in values_by_filename.items():
-            self.assert_match(value, snapshot_dir_path.joinpath(name))
+    def _assert_match_files_parallel(self, files: Iterable[Tuple[Path, Any]],
+                                     assert_file: Callable[[Any, Path, SnapshotTiming], None],
+                                     timing: SnapshotTiming) -> None:
+        """
+        Calls ``assert_file`` for every ``(path, value)`` pair in ``files`` using a thread pool.
+
+        Only a few files per worker are in flight at a time, so ``files`` is consumed lazily.
+        The created and updated snapshots are reported in the order of ``files``,
+        and the error of the first failing file in that order is raised, as if the files were checked serially.
+        Every file is timed separately and the timings are added to ``timing`` once the file is done.
+        """
+        __tracebackhide__ = operator.methodcaller("errisinstance", AssertionError)
+        created_count = len(self._created_snapshots)
+        updated_count = len(self._updated_snapshots)
+        order = {}  # type: Dict[Path, int]
+        pending = deque()  # type: Deque[Tuple[Future, SnapshotTiming]]
+        errors = []  # type: List[BaseException]
+
+        def finish_oldest():
+            future, file_timing = pending.popleft()
+            if future.exception() is not None:
+                errors.append(future.exception())
+            timing.add(file_timing)
+
+        with ThreadPoolExecutor(max_workers=self._session.workers) as executor:
+            for path, value in files:
+                order[path] = len(order)
+                file_timing = SnapshotTiming(timing.kind)
+                pending.append((executor.submit(assert_file, value, path, file_timing), file_timing))
+                if len(pending) >= 2 * self._session.workers:
+                    finish_oldest()
+            while pending:
+                finish_oldest()
+
+        self._created_snapshots[created_count:] = sorted(self._created_snapshots[created_count:], key=order.get)
+        self._updated_snapshots[updated_count:] = sorted(self._updated_snapshots[updated_count:], key=order.get)
+        if errors:
+            raise errors[0]
+
+
+def _get_module_snapshot_dir(node: _pytest.nodes.Node) -> Path:
+    """
+    Returns the directory containing the default snapshot directories of the tests in the module of the pytest node,
+    which is a test or a module.
+    """
+    # node.path (pytest >=7) is cheaper than node.fspath, which creates a new py.path object on every access.
+    module_path = getattr(node, 'path', None)
+    if module_path is None:
+        module_path = node.fspath
+    module_snapshot_dir = _module_snapshot_dirs.get(module_path)
+    if module_snapshot_dir is None:
+        module_file = Path(str(module_path))
+        module_snapshot_dir = module_file.parent.joinpath('snapshots', module_file.stem)
+        _module_snapshot_dirs[module_path] = module_snapshot_dir
+    return module_snapshot_dir
+
+
+def _get_session_snapshot_dir(config) -> Path:
+    return Path(rootdir(config), 'snapshots')
+
+
+def _get_owned_snapshot_dirs(item: _pytest.python.Function) -> List[str]:
+    """
+    Returns the snapshot directories the test owns for --snapshot-detect-unused, see ``SnapshotUsage``.
+    """
+    module_snapshot_dir = _get_module_snapshot_dir(item)
+    owned_dirs = [str(_get_default_snapshot_dir(item)), str(module_snapshot_dir), str(module_snapshot_dir.parent)]
+    session_snapshot_dir = str(_get_session_snapshot_dir(item.config))
+    if session_snapshot_dir not in owned_dirs:
+        owned_dirs.append(session_snapshot_dir)
+    return owned_dirs
 
 
 def _get_default_snapshot_dir(node: _pytest.python.Function) -> Path:
     """
     Returns the default snapshot directory for the pytest test.
     """
-    test_module_dir = node.fspath.dirpath()
-    test_module = node.fspath.purebasename
     if '[' not in node.name:
         test_name = node.name
         parametrize_name = None
@@ -260,7 +1273,6 @@ def _get_default_snapshot_dir(node: _pytest.python.Function) -> Path:
         assert parametrize_match is not None, 'Expected request.node.name to be of format TEST_FUNCTION[PARAMS]'
         parametrize_name = parametrize_match.group(1)
         parametrize_name = get_valid_filename(parametrize_name)
-    default_snapshot_dir = test_module_dir.join('snapshots', test_module, test_name)
-    if parametrize_name is not None:
-        default_snapshot_dir = default_snapshot_dir.join(parametrize_name)
-    return Path(str(default_snapshot_dir))
+    if parametrize_name is None:
+        return _get_module_snapshot_dir(node).joinpath(test_name)
+    return _get_module_snapshot_dir(node).joinpath(test_name, parametrize_name)
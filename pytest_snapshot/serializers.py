@@ -0,0 +1,261 @@
+"""
+Serializers convert values other than str and bytes to snapshot files and back.
+
+A serializer is looked up by the type of the value passed to ``assert_match``. Plugins and ``conftest.py`` files can
+add serializers for their own types using ``register``::
+
+    from pytest_snapshot.serializers import ReprSerializer, register
+
+    register(MyValue, ReprSerializer())
+"""
+import io
+import json
+import threading
+from typing import Any, Callable, List, Optional, Union
+
+try:
+    import dataclasses
+except ImportError:
+    # Python <3.7.
+    dataclasses = None
+
+# Differences are reported up to this many per mismatch.
+MAX_REPORTED_DIFFERENCES = 20
+
+
+class Serializer:
+    """
+    Converts values to snapshot bytes and back, and compares values to the decoded snapshots.
+    """
+    def encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    def compare(self, value: Any, expected: Any) -> None:
+        """
+        Raises ``AssertionError`` if ``value`` doesn't equal ``expected``, the decoded snapshot.
+
+        Values are only compared using this method if their encoded bytes differ from the snapshot.
+        """
+        if value != expected:
+            raise AssertionError('{!r} != {!r}'.format(value, expected))
+
+
+def _raise_differences(differences: List[str]) -> None:
+    __tracebackhide__ = True
+    lines = ['values differ:']
+    lines.extend('  ' + d for d in differences[:MAX_REPORTED_DIFFERENCES])
+    if len(differences) > MAX_REPORTED_DIFFERENCES:
+        lines.append('  ... and {} more'.format(len(differences) - MAX_REPORTED_DIFFERENCES))
+    raise AssertionError('\n'.join(lines))
+
+
+def _json_differences(value: Any, expected: Any, path: str, differences: List[str]) -> None:
+    if isinstance(value, dict) and isinstance(expected, dict):
+        for key in sorted(set(value) | set(expected)):
+            key_path = '{}[{!r}]'.format(path, key)
+            if key not in expected:
+                differences.append('{}: unexpected key'.format(key_path))
+            elif key not in value:
+                differences.append('{}: missing key'.format(key_path))
+            else:
+                _json_differences(value[key], expected[key], key_path, differences)
+    elif isinstance(value, list) and isinstance(expected, list):
+        if len(value) != len(expected):
+            differences.append('{}: length {} != {}'.format(path, len(value), len(expected)))
+        for i, (item, expected_item) in enumerate(zip(value, expected)):
+            _json_differences(item, expected_item, '{}[{}]'.format(path, i), differences)
+    elif type(value) is not type(expected) or value != expected:
+        differences.append('{}: {!r} != {!r}'.format(path, value, expected))
+
+
+def _json_default(value: Any) -> Any:
+    if dataclasses is not None and dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+
+class JsonSerializer(Serializer):
+    """
+    Stores values as indented JSON with sorted keys. Dataclasses are stored as JSON objects.
+
+    Values are compared after a JSON roundtrip, so for example tuples equal lists.
+    Mismatches are reported per differing key and list item.
+    NaN and infinite floats aren't valid JSON, and NaN never equals itself after a roundtrip, so they are rejected.
+    """
+    def __init__(self, indent: int = 2):
+        # The encoder is created once, json.dumps creates a new one for every call with non-default arguments.
+        self._encoder = json.JSONEncoder(indent=indent, sort_keys=True, ensure_ascii=False, allow_nan=False,
+                                         default=_json_default)
+
+    def encode(self, value: Any) -> bytes:
+        try:
+            encoded = self._encoder.encode(value)
+        except ValueError as e:
+            # Raised for NaN and infinite floats, and for circular references.
+            raise TypeError("value can't be stored as JSON: {} (convert NaN and infinite floats, for example to "
+                            "strings, or snapshot the value with another serializer)".format(e)) from None
+        return (encoded + '\n').encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data.decode())
+
+    def compare(self, value: Any, expected: Any) -> None:
+        __tracebackhide__ = True
+        differences = []  # type: List[str]
+        _json_differences(self.decode(self.encode(value)), expected, 'value', differences)
+        if differences:
+            _raise_differences(differences)
+
+
+class ReprSerializer(Serializer):
+    """
+    Stores the ``repr`` of values. Snapshots can't be decoded into values, so they are compared as text.
+    """
+    def encode(self, value: Any) -> bytes:
+        return (repr(value) + '\n').encode()
+
+    def decode(self, data: bytes) -> Any:
+        return data.decode()
+
+    def compare(self, value: Any, expected: Any) -> None:
+        actual = self.encode(value).decode()
+        if actual != expected:
+            raise AssertionError('{} != {}'.format(actual.rstrip('\n'), expected.rstrip('\n')))
+
+
+class NpySerializer(Serializer):
+    """
+    Stores NumPy arrays in the ``.npy`` format. Mismatches are reported by ``numpy.testing.assert_array_equal``.
+    """
+    def encode(self, value: Any) -> bytes:
+        import numpy
+        buffer = io.BytesIO()
+        numpy.save(buffer, value, allow_pickle=False)
+        return buffer.getvalue()
+
+    def decode(self, data: bytes) -> Any:
+        import numpy
+        return numpy.load(io.BytesIO(data), allow_pickle=False)
+
+    def compare(self, value: Any, expected: Any) -> None:
+        __tracebackhide__ = True
+        import numpy.testing
+        if value.dtype != expected.dtype:
+            raise AssertionError('dtype {} != {}'.format(value.dtype, expected.dtype))
+        numpy.testing.assert_array_equal(value, expected, err_msg='', verbose=True)
+
+
+class ArrowSerializer(Serializer):
+    """
+    Stores Arrow tables in the Arrow IPC stream format. Mismatches are reported per differing column.
+    """
+    def encode(self, value: Any) -> bytes:
+        import pyarrow
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, value.schema) as writer:
+            writer.write_table(value)
+        return sink.getvalue().to_pybytes()
+
+    def decode(self, data: bytes) -> Any:
+        import pyarrow
+        return pyarrow.ipc.open_stream(data).read_all()
+
+    def compare(self, value: Any, expected: Any) -> None:
+        __tracebackhide__ = True
+        differences = []  # type: List[str]
+        if not value.schema.equals(expected.schema):
+            differences.append('schema {} != {}'.format(value.schema, expected.schema))
+        elif value.num_rows != expected.num_rows:
+            differences.append('{} rows != {} rows'.format(value.num_rows, expected.num_rows))
+        else:
+            for name in value.column_names:
+                if not value.column(name).equals(expected.column(name)):
+                    differences.append('column {!r} differs'.format(name))
+        if differences:
+            _raise_differences(differences)
+
+
+def _qualified_name(cls: type) -> str:
+    return '{}.{}'.format(cls.__module__, getattr(cls, '__qualname__', cls.__name__))
+
+
+class SerializerRegistry:
+    """
+    Maps types to serializers.
+
+    Serializers are registered for a type, for the qualified name of a type such as ``"numpy.ndarray"``
+    (which doesn't require importing the module of the type), or for a predicate on types.
+    The serializer of a type is the one registered for the first class in its MRO, falling back to predicates.
+    Lookups are cached per type, so dispatch costs a single dict lookup for types that were seen before.
+    """
+    def __init__(self):
+        self._by_type = {}  # type: Dict[type, Serializer]
+        self._by_name = {}  # type: Dict[str, Serializer]
+        self._predicates = []  # type: List[Tuple[Callable[[type], bool], Serializer]]
+        self._cache = {}  # type: Dict[type, Optional[Serializer]]
+        self._lock = threading.Lock()
+
+    def register(self, key: Union[type, str], serializer: Serializer) -> None:
+        with self._lock:
+            if isinstance(key, str):
+                self._by_name[key] = serializer
+            else:
+                self._by_type[key] = serializer
+            self._cache = {}
+
+    def register_predicate(self, predicate: Callable[[type], bool], serializer: Serializer) -> None:
+        with self._lock:
+            self._predicates.append((predicate, serializer))
+            self._cache = {}
+
+    def get(self, cls: type) -> Optional[Serializer]:
+        """
+        Returns the serializer for values of type ``cls``, or None if there is none.
+        """
+        try:
+            return self._cache[cls]
+        except KeyError:
+            pass
+        serializer = self._find(cls)
+        self._cache[cls] = serializer
+        return serializer
+
+    def _find(self, cls: type) -> Optional[Serializer]:
+        for base in cls.__mro__:
+            serializer = self._by_type.get(base)
+            if serializer is None and self._by_name:
+                serializer = self._by_name.get(_qualified_name(base))
+            if serializer is not None:
+                return serializer
+        for predicate, serializer in self._predicates:
+            if predicate(cls):
+                return serializer
+        return None
+
+
+def default_registry() -> SerializerRegistry:
+    """
+    Returns a new registry containing the serializers that are used by default.
+    """
+    registry = SerializerRegistry()
+    json_serializer = JsonSerializer()
+    for cls in (dict, list, tuple, int, float, bool, type(None)):
+        registry.register(cls, json_serializer)
+    if dataclasses is not None:
+        registry.register_predicate(dataclasses.is_dataclass, json_serializer)
+    registry.register('numpy.ndarray', NpySerializer())
+    registry.register('pyarrow.lib.Table', ArrowSerializer())
+    return registry
+
+
+registry = default_registry()
+
+
+def register(key: Union[type, str], serializer: Serializer) -> None:
+    """
+    Registers ``serializer`` for values of the type ``key``, or of the type with the qualified name ``key``.
+    """
+    registry.register(key, serializer)
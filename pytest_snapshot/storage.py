@@ -0,0 +1,851 @@
+"""
+Storage backends used by the ``snapshot`` fixture to read and write snapshots.
+
+The backend is selected using the ``snapshot_storage`` ini option.
+Plugins can add backends by implementing the ``pytest_snapshot_storage`` hook.
+"""
+import filecmp
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from pytest_snapshot._archive import to_archive_name, write_archive
+from pytest_snapshot._compare import compare_bytes, compare_bytes_to_file, compare_stream_to_file
+from pytest_snapshot._compression import CODECS_BY_SUFFIX, DEFAULT_COMPRESSION_THRESHOLD, Codec, split_suffix
+from pytest_snapshot._index import SNAPSHOTS_DIR_NAME, SnapshotIndex
+from pytest_snapshot._manifest import SnapshotManifest
+from pytest_snapshot._pack import SnapshotPacks
+from pytest_snapshot._utils import atomic_write_bytes, fsync_dirs, fsync_files, temp_path_for
+
+DEFAULT_CACHE_SIZE = 64 << 20
+
+
+class SnapshotStorage:
+    """
+    Base class of snapshot storage backends.
+
+    Snapshots are identified by their absolute paths, as computed by the ``snapshot`` fixture,
+    even if the backend doesn't store them in files. Directories only exist implicitly, as the parents of snapshots.
+    """
+    #: Whether ``assert_match_dir`` may use the backend from several threads at once (see --snapshot-workers).
+    thread_safe = False
+    #: Whether file objects and iterables of chunks are passed to ``compare_stream`` and ``write_stream``.
+    #: Otherwise they are joined into a single value first.
+    supports_streams = False
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        """
+        Called before the snapshots in ``snapshot_dir`` are used.
+        """
+
+    def is_file(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def is_dir(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        return self.is_file(path) or self.is_dir(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        """
+        Returns the posix paths, relative to the directory ``path``, of all snapshots below it.
+        """
+        raise NotImplementedError
+
+    def size(self, path: str) -> Optional[int]:
+        """
+        Returns the size of the snapshot ``path`` in bytes,
+        or None if it isn't known without reading the whole snapshot, for example because it is compressed.
+        Shortcuts based on the size, such as skipping the comparison of snapshots of a different size, are then skipped.
+        """
+        return len(self.read(path))
+
+    def read(self, path: str) -> bytes:
+        raise NotImplementedError
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        """
+        Compares ``value`` to the snapshot ``path``, which may be large.
+
+        Returns None if they are equal, otherwise returns a message describing the first difference.
+        """
+        return compare_bytes(value, self.read(path))
+
+    def local_path(self, path: str) -> Optional[str]:
+        """
+        Returns the path of a local file containing exactly the snapshot ``path``, or None if there is no such file.
+
+        Used to memory-map large snapshots instead of reading them.
+        """
+        return None
+
+    def write(self, path: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def write_file(self, path: str, source_path: str) -> None:
+        """
+        Writes the contents of the local file ``source_path`` to the snapshot ``path``.
+        """
+        with open(source_path, 'rb') as f:
+            self.write(path, f.read())
+
+    def delete(self, path: str) -> None:
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        """
+        Called once at the end of the session to make all writes and deletions of the session durable.
+        """
+
+    def known_to_contain(self, path: str, chunks: Iterable[bytes]) -> bool:
+        """
+        Returns true if the snapshot ``path`` is known to contain exactly the bytes in ``chunks`` without reading it.
+        """
+        return False
+
+    def record_verified(self, path: str, data: bytes) -> None:
+        """
+        Called after the snapshot ``path`` was found or written to contain ``data``.
+        """
+
+    def compare_stream(self, path: str, chunks: Iterable, binary: bool) -> Optional[str]:
+        """
+        Compares the str or bytes ``chunks`` to the snapshot ``path``. Only used if ``supports_streams`` is true.
+
+        Returns None if they are equal, otherwise returns a message describing the first difference.
+        """
+        raise NotImplementedError
+
+    def write_stream(self, path: str, chunks: Iterable[bytes]) -> bool:
+        """
+        Writes the bytes ``chunks`` to the snapshot ``path``. Only used if ``supports_streams`` is true.
+
+        Returns false if the snapshot already contained the written bytes.
+        """
+        raise NotImplementedError
+
+
+class FileSystemStorage(SnapshotStorage):
+    """
+    Stores every snapshot in its own file. This is the default backend.
+
+    Snapshot directories are indexed once and files are replaced atomically. The written files and then the modified
+    directories are fsynced in batches when the session ends, rather than once per write, so snapshots written by a
+    session that is cut short by a power loss may be empty or truncated. If a manifest is given, snapshots matching it
+    are not read.
+    """
+    thread_safe = True
+    supports_streams = True
+
+    def __init__(self, index: Optional[SnapshotIndex] = None, manifest: Optional[SnapshotManifest] = None):
+        self.index = index if index is not None else SnapshotIndex()
+        self.manifest = manifest
+        # Files and directories whose contents or entries were modified and should be fsynced at the end of the session.
+        self.dirty_files = set()  # type: Set[str]
+        self.dirty_dirs = set()  # type: Set[str]
+        # Guards the index and the dirty paths, which are modified by the threads of --snapshot-workers.
+        self._lock = threading.Lock()
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        with self._lock:
+            self.index.add_root(SnapshotIndex.root_for(snapshot_dir))
+
+    def is_file(self, path: str) -> bool:
+        return self.index.is_file(path)
+
+    def is_dir(self, path: str) -> bool:
+        return self.index.is_dir(path)
+
+    def exists(self, path: str) -> bool:
+        return self.index.exists(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        return list(self.index.iter_files(path))
+
+    def size(self, path: str) -> int:
+        return os.stat(path).st_size
+
+    def read(self, path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        return compare_bytes_to_file(value, path, self.size(path))
+
+    def local_path(self, path: str) -> Optional[str]:
+        return path if self.index.is_file(path) else None
+
+    def _make_parent_dir(self, path: str) -> None:
+        parent = os.path.dirname(path)
+        with self._lock:
+            if not self.index.is_dir(parent):
+                # Unlike Path.mkdir in Python <3.7, os.makedirs tolerates directories created concurrently,
+                # for example by other pytest-xdist workers.
+                os.makedirs(parent, exist_ok=True)
+                self.index.add_dir(parent)
+
+    def _written(self, path: str) -> None:
+        with self._lock:
+            self.dirty_files.add(path)
+            self.dirty_dirs.add(os.path.dirname(path))
+            self.index.add_file(path)
+
+    def write(self, path: str, data: bytes) -> None:
+        self._make_parent_dir(path)
+        atomic_write_bytes(Path(path), data)
+        self._written(path)
+
+    def write_file(self, path: str, source_path: str) -> None:
+        """
+        Copies the file to a temporary file next to the snapshot, then atomically renames it over the snapshot.
+
+        ``shutil.copyfile`` copies within the kernel where possible, so the contents never pass through Python.
+        The snapshot isn't hard-linked to the source file, since that would change the snapshot with its source.
+        """
+        self._make_parent_dir(path)
+        temp_path = temp_path_for(Path(path))
+        try:
+            shutil.copyfile(source_path, str(temp_path))
+            os.replace(str(temp_path), path)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        self._written(path)
+        if self.manifest is not None:
+            with self._lock:
+                self.manifest.discard(path)
+
+    def delete(self, path: str) -> None:
+        os.remove(path)
+        with self._lock:
+            self.dirty_files.discard(path)
+            self.dirty_dirs.add(os.path.dirname(path))
+            self.index.remove_file(path)
+            if self.manifest is not None:
+                self.manifest.discard(path)
+
+    def commit(self) -> None:
+        # The contents must be durable before the renames that expose them are.
+        fsync_files(sorted(self.dirty_files))
+        self.dirty_files.clear()
+        fsync_dirs(sorted(self.dirty_dirs))
+        self.dirty_dirs.clear()
+
+    def known_to_contain(self, path: str, chunks: Iterable[bytes]) -> bool:
+        return self.manifest is not None and self.index.is_file(path) and self.manifest.matches(path, chunks)
+
+    def record_verified(self, path: str, data: bytes) -> None:
+        if self.manifest is not None:
+            with self._lock:
+                self.manifest.record(path, data)
+
+    def compare_stream(self, path: str, chunks: Iterable, binary: bool) -> Optional[str]:
+        return compare_stream_to_file(chunks, path, binary)
+
+    def write_stream(self, path: str, chunks: Iterable[bytes]) -> bool:
+        """
+        Writes the chunks to a temporary file next to the snapshot, then atomically renames it over the snapshot.
+        """
+        self._make_parent_dir(path)
+        temp_path = temp_path_for(Path(path))
+        try:
+            with temp_path.open('xb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            if self.index.is_file(path) and filecmp.cmp(str(temp_path), path, shallow=False):
+                temp_path.unlink()
+                return False
+            os.replace(str(temp_path), path)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        self._written(path)
+        if self.manifest is not None:
+            with self._lock:
+                self.manifest.discard(path)
+        return True
+
+
+class PackedStorage(SnapshotStorage):
+    """
+    Stores the snapshots below a directory named "snapshots" in one memory-mapped pack file per subdirectory.
+
+    Changes are written to the packs when the session ends.
+    """
+    def __init__(self, packs: Optional[SnapshotPacks] = None):
+        self.packs = packs if packs is not None else SnapshotPacks()
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        self.packs.add_root(SnapshotIndex.root_for(snapshot_dir))
+
+    def is_file(self, path: str) -> bool:
+        return self.packs.is_file(path)
+
+    def is_dir(self, path: str) -> bool:
+        return self.packs.is_dir(path)
+
+    def exists(self, path: str) -> bool:
+        return self.packs.exists(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        return list(self.packs.iter_files(path))
+
+    def size(self, path: str) -> int:
+        return self.packs.size(path)
+
+    def read(self, path: str) -> bytes:
+        return self.packs.read(path)
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        return self.packs.compare(path, value)
+
+    def write(self, path: str, data: bytes) -> None:
+        self.packs.write(path, data)
+
+    def delete(self, path: str) -> None:
+        self.packs.delete(path)
+
+    def commit(self) -> None:
+        fsync_dirs(self.packs.flush())
+
+
+class MemoryStorage(SnapshotStorage):
+    """
+    Keeps snapshots in memory, for example to test code that uses the ``snapshot`` fixture without touching the disk.
+    """
+    thread_safe = True
+
+    def __init__(self, files: Optional[dict] = None):
+        # Maps the absolute path of a snapshot to its contents.
+        self.files = dict(files) if files is not None else {}  # type: Dict[str, bytes]
+
+    def is_file(self, path: str) -> bool:
+        return path in self.files
+
+    def is_dir(self, path: str) -> bool:
+        prefix = path.rstrip(os.sep) + os.sep
+        return any(p.startswith(prefix) for p in self.files)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        prefix = path.rstrip(os.sep) + os.sep
+        return [p[len(prefix):].replace(os.sep, '/') for p in self.files if p.startswith(prefix)]
+
+    def read(self, path: str) -> bytes:
+        return self.files[path]
+
+    def write(self, path: str, data: bytes) -> None:
+        self.files[path] = bytes(data)
+
+    def delete(self, path: str) -> None:
+        del self.files[path]
+
+
+class CachingStorage(SnapshotStorage):
+    """
+    Wraps another backend, keeping up to ``max_size`` bytes of recently read snapshots in memory.
+    """
+    def __init__(self, storage: SnapshotStorage, max_size: int = DEFAULT_CACHE_SIZE):
+        self.storage = storage
+        self.max_size = max_size
+        self.thread_safe = storage.thread_safe
+        self.supports_streams = storage.supports_streams
+        self._cache = OrderedDict()  # type: OrderedDict[str, bytes]
+        self._cache_size = 0
+        self._lock = threading.Lock()
+
+    def _cached(self, path: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._cache.get(path)
+            if data is not None:
+                self._cache.move_to_end(path)
+            return data
+
+    def _add(self, path: str, data: bytes) -> None:
+        if len(data) > self.max_size:
+            return
+        with self._lock:
+            self._discard(path)
+            self._cache[path] = data
+            self._cache_size += len(data)
+            while self._cache_size > self.max_size:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+    def _discard(self, path: str) -> None:
+        data = self._cache.pop(path, None)
+        if data is not None:
+            self._cache_size -= len(data)
+
+    def _invalidate(self, path: str) -> None:
+        with self._lock:
+            self._discard(path)
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        self.storage.open_dir(snapshot_dir)
+
+    def is_file(self, path: str) -> bool:
+        return self.storage.is_file(path)
+
+    def is_dir(self, path: str) -> bool:
+        return self.storage.is_dir(path)
+
+    def exists(self, path: str) -> bool:
+        return self.storage.exists(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        return self.storage.list_dir(path)
+
+    def size(self, path: str) -> int:
+        data = self._cached(path)
+        return len(data) if data is not None else self.storage.size(path)
+
+    def read(self, path: str) -> bytes:
+        data = self._cached(path)
+        if data is None:
+            data = self.storage.read(path)
+            self._add(path, data)
+        return data
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        data = self._cached(path)
+        if data is not None:
+            return compare_bytes(value, data)
+        return self.storage.compare(path, value)
+
+    def local_path(self, path: str) -> Optional[str]:
+        return self.storage.local_path(path)
+
+    def write(self, path: str, data: bytes) -> None:
+        self._invalidate(path)
+        self.storage.write(path, data)
+
+    def delete(self, path: str) -> None:
+        self._invalidate(path)
+        self.storage.delete(path)
+
+    def commit(self) -> None:
+        self.storage.commit()
+
+    def known_to_contain(self, path: str, chunks: Iterable[bytes]) -> bool:
+        return self.storage.known_to_contain(path, chunks)
+
+    def record_verified(self, path: str, data: bytes) -> None:
+        self.storage.record_verified(path, data)
+
+    def compare_stream(self, path: str, chunks: Iterable, binary: bool) -> Optional[str]:
+        return self.storage.compare_stream(path, chunks, binary)
+
+    def write_stream(self, path: str, chunks: Iterable[bytes]) -> bool:
+        self._invalidate(path)
+        return self.storage.write_stream(path, chunks)
+
+    def write_file(self, path: str, source_path: str) -> None:
+        self._invalidate(path)
+        self.storage.write_file(path, source_path)
+
+
+class CompressedStorage(SnapshotStorage):
+    """
+    Wraps another backend, compressing snapshots of at least ``threshold`` bytes or with one of the ``extensions``.
+
+    A compressed snapshot is stored with ".compressed" and the suffix of its codec appended to its name,
+    for example "data.json.compressed.gz", and is listed and read under its original name. Other files, such as
+    a snapshot named "data.gz", are listed as they are. Snapshots compressed with any of the known codecs are read,
+    so changing the codec doesn't require updating existing snapshots.
+    Snapshot names ending with ".compressed.gz" and the like are always compressed so that their stored names are
+    unambiguous. The size of a compressed snapshot is unknown until it is read.
+    """
+    def __init__(self, storage: SnapshotStorage, codec: Codec, threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+                 extensions: Iterable[str] = ()):
+        self.storage = storage
+        self.codec = codec
+        self.threshold = threshold
+        self.extensions = tuple(extensions) + tuple(CODECS_BY_SUFFIX)
+        self.thread_safe = storage.thread_safe
+        # The last snapshot read by each thread, since the size of a snapshot is usually needed right before reading it.
+        self._local = threading.local()
+
+    def _stored_paths(self, path: str) -> List[str]:
+        """
+        Returns the paths of the existing stored versions of the snapshot ``path``.
+        """
+        candidates = [path] + [path + suffix for suffix in CODECS_BY_SUFFIX]
+        return [candidate for candidate in candidates if self.storage.is_file(candidate)]
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        self.storage.open_dir(snapshot_dir)
+
+    def is_file(self, path: str) -> bool:
+        return bool(self._stored_paths(path))
+
+    def is_dir(self, path: str) -> bool:
+        return self.storage.is_dir(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        return sorted({split_suffix(name)[0] for name in self.storage.list_dir(path)})
+
+    def size(self, path: str) -> Optional[int]:
+        last = getattr(self._local, 'last', None)
+        if last is not None and last[0] == path:
+            return len(last[1])
+        stored_paths = self._stored_paths(path)
+        if not stored_paths:
+            raise FileNotFoundError('snapshot {} does not exist'.format(path))
+        if stored_paths[0] == path:
+            return self.storage.size(path)
+        # Decompressing the snapshot to find its size would cost as much as reading it.
+        return None
+
+    def read(self, path: str) -> bytes:
+        last = getattr(self._local, 'last', None)
+        if last is not None and last[0] == path:
+            return last[1]
+        stored_paths = self._stored_paths(path)
+        if not stored_paths:
+            raise FileNotFoundError('snapshot {} does not exist'.format(path))
+        stored_path = stored_paths[0]
+        data = self.storage.read(stored_path)
+        if stored_path != path:
+            data = CODECS_BY_SUFFIX[stored_path[len(path):]].decompress(data)
+        self._local.last = (path, data)
+        return data
+
+    def local_path(self, path: str) -> Optional[str]:
+        # Compressed snapshots have no local file containing their decompressed bytes.
+        stored_paths = self._stored_paths(path)
+        return self.storage.local_path(path) if stored_paths and stored_paths[0] == path else None
+
+    def write(self, path: str, data: bytes) -> None:
+        self._local.last = None
+        if len(data) >= self.threshold or path.endswith(self.extensions):
+            stored_path = path + self.codec.stored_suffix
+            self.storage.write(stored_path, self.codec.compress(data))
+        else:
+            stored_path = path
+            self.storage.write(stored_path, data)
+        for other_path in self._stored_paths(path):
+            if other_path != stored_path:
+                self.storage.delete(other_path)
+
+    def delete(self, path: str) -> None:
+        self._local.last = None
+        for stored_path in self._stored_paths(path):
+            self.storage.delete(stored_path)
+
+    def commit(self) -> None:
+        self.storage.commit()
+
+    def known_to_contain(self, path: str, chunks: Iterable[bytes]) -> bool:
+        # Manifests record the hash of the decompressed contents along with the size of the stored file.
+        stored_paths = self._stored_paths(path)
+        return bool(stored_paths) and self.storage.known_to_contain(stored_paths[0], chunks)
+
+    def record_verified(self, path: str, data: bytes) -> None:
+        stored_paths = self._stored_paths(path)
+        if stored_paths:
+            self.storage.record_verified(stored_paths[0], data)
+
+
+# Snapshot files of deduplicated snapshots contain this prefix, followed by the hex sha256 of the blob and a newline.
+BLOB_REFERENCE_PREFIX = b'pytest-snapshot blob sha256:'
+_BLOB_REFERENCE_LENGTH = len(BLOB_REFERENCE_PREFIX) + 64 + 1
+# The directory inside a snapshot root containing the blobs of deduplicated snapshots.
+BLOBS_DIR_NAME = '.blobs'
+
+
+class DeduplicatingStorage(SnapshotStorage):
+    """
+    Wraps another backend, storing the contents of snapshots in a blob store shared by all snapshots of a root.
+
+    Every snapshot file only contains a reference to its blob, named by the sha256 of its contents, so identical
+    snapshots, for example of parametrized tests, are stored once. The blob store is the ".blobs" directory of the
+    closest "snapshots" directory containing the snapshot, so every snapshot must be inside one.
+    Blobs are read once per session, and comparing a value to a snapshot only compares hashes unless they differ.
+    Snapshot files that aren't references are read as usual, so existing snapshots don't need to be converted.
+    A reference to a missing blob is read as a snapshot containing the reference itself, so it doesn't match any value
+    and is rewritten when snapshots are updated.
+
+    Blobs that lose a reference are only deleted by ``delete_unreferenced_blobs``, once no snapshot of their
+    "snapshots" directory refers to them anymore.
+    """
+    def __init__(self, storage: SnapshotStorage, max_cache_size: int = DEFAULT_CACHE_SIZE):
+        self.storage = storage
+        self.thread_safe = storage.thread_safe
+        self._blobs = CachingStorage(storage, max_cache_size)
+        # Maps the path of a snapshot to the digest it refers to, or to None if it isn't a reference.
+        self._references = {}  # type: Dict[str, Optional[str]]
+        # The "snapshots" directories in which a snapshot stopped referring to a blob.
+        self.dropped_references = set()  # type: Set[str]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _snapshots_dir(path: str) -> str:
+        """
+        Returns the closest "snapshots" directory containing the snapshot ``path``, which holds its blob store.
+        """
+        snapshots_dir = SnapshotIndex.root_for(os.path.dirname(path))
+        if os.path.basename(snapshots_dir) != SNAPSHOTS_DIR_NAME:
+            raise ValueError('deduplicated snapshot {} must be inside a directory named "{}", which stores its blobs'
+                             .format(path, SNAPSHOTS_DIR_NAME))
+        return snapshots_dir
+
+    def _blob_path(self, path: str, digest: str) -> str:
+        return os.path.join(self._snapshots_dir(path), BLOBS_DIR_NAME, digest[:2], digest)
+
+    def _reference(self, path: str) -> Optional[str]:
+        """
+        Returns the digest the snapshot ``path`` refers to, or None if it isn't a reference to an existing blob.
+        """
+        with self._lock:
+            if path in self._references:
+                return self._references[path]
+        digest = None
+        size = self.storage.size(path)
+        if size is None or size == _BLOB_REFERENCE_LENGTH:
+            data = self.storage.read(path)
+            if data.startswith(BLOB_REFERENCE_PREFIX) and data.endswith(b'\n'):
+                digest = data[len(BLOB_REFERENCE_PREFIX):-1].decode('ascii')
+                if not self._blobs.is_file(self._blob_path(path, digest)):
+                    digest = None
+        with self._lock:
+            self._references[path] = digest
+        return digest
+
+    def _drop_reference(self, path: str, new_digest: Optional[str]) -> None:
+        """
+        Records that the snapshot ``path`` is about to refer to ``new_digest``, or be deleted if it is None.
+        """
+        if self.storage.is_file(path):
+            digest = self._reference(path)
+            if digest is not None and digest != new_digest:
+                with self._lock:
+                    self.dropped_references.add(self._snapshots_dir(path))
+
+    def _forget(self, path: str) -> None:
+        with self._lock:
+            self._references.pop(path, None)
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        self.storage.open_dir(snapshot_dir)
+
+    def is_file(self, path: str) -> bool:
+        return self.storage.is_file(path)
+
+    def is_dir(self, path: str) -> bool:
+        return self.storage.is_dir(path)
+
+    def exists(self, path: str) -> bool:
+        return self.storage.exists(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        return [name for name in self.storage.list_dir(path) if not name.startswith(BLOBS_DIR_NAME + '/')]
+
+    def size(self, path: str) -> int:
+        digest = self._reference(path)
+        if digest is None:
+            return self.storage.size(path)
+        return self._blobs.size(self._blob_path(path, digest))
+
+    def read(self, path: str) -> bytes:
+        digest = self._reference(path)
+        if digest is None:
+            return self.storage.read(path)
+        return self._blobs.read(self._blob_path(path, digest))
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        digest = self._reference(path)
+        if digest is None:
+            return self.storage.compare(path, value)
+        if hashlib.sha256(value).hexdigest() == digest:
+            return None
+        return self._blobs.compare(self._blob_path(path, digest), value)
+
+    def local_path(self, path: str) -> Optional[str]:
+        digest = self._reference(path)
+        if digest is None:
+            return self.storage.local_path(path)
+        return self._blobs.local_path(self._blob_path(path, digest))
+
+    def write(self, path: str, data: bytes) -> None:
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(path, digest)
+        self._drop_reference(path, digest)
+        if not self._blobs.is_file(blob_path):
+            self._blobs.write(blob_path, data)
+        self.storage.write(path, BLOB_REFERENCE_PREFIX + digest.encode('ascii') + b'\n')
+        with self._lock:
+            self._references[path] = digest
+
+    def delete(self, path: str) -> None:
+        if self._reference(path) is not None:
+            with self._lock:
+                self.dropped_references.add(self._snapshots_dir(path))
+        self._forget(path)
+        self.storage.delete(path)
+
+    def commit(self) -> None:
+        self.storage.commit()
+
+    def delete_unreferenced_blobs(self) -> List[str]:
+        """
+        Deletes the blobs of the ``dropped_references`` directories that no snapshot refers to anymore.
+
+        Every snapshot of these directories is checked, so this should only run once all snapshots were written,
+        after all pytest-xdist workers finished. Returns the paths of the deleted blobs.
+        """
+        deleted = []
+        for snapshots_dir in sorted(self.dropped_references):
+            self.storage.open_dir(snapshots_dir)
+            referenced = set()
+            for name in self.list_dir(snapshots_dir):
+                digest = self._reference(os.path.join(snapshots_dir, *name.split('/')))
+                if digest is not None:
+                    referenced.add(digest)
+            blobs_dir = os.path.join(snapshots_dir, BLOBS_DIR_NAME)
+            for name in self.storage.list_dir(blobs_dir):
+                if name.split('/')[-1] not in referenced:
+                    blob_path = os.path.join(blobs_dir, *name.split('/'))
+                    self._blobs.delete(blob_path)
+                    deleted.append(blob_path)
+        self.dropped_references.clear()
+        if deleted:
+            self.commit()
+        return deleted
+
+    def known_to_contain(self, path: str, chunks: Iterable[bytes]) -> bool:
+        digest = self._reference(path) if self.storage.is_file(path) else None
+        if digest is None:
+            return self.storage.known_to_contain(path, chunks)
+        h = hashlib.sha256()
+        for chunk in chunks:
+            h.update(chunk)
+        return h.hexdigest() == digest
+
+    def record_verified(self, path: str, data: bytes) -> None:
+        self.storage.record_verified(path, data)
+
+
+class RecordingStorage(SnapshotStorage):
+    """
+    Wraps another backend, recording writes and deletions in an archive instead of applying them.
+
+    Snapshots are read from the wrapped backend, except that written and deleted snapshots are read
+    from the recorded changes. The contents of written snapshots are appended to a temporary spool file as they are
+    written, so only their names are kept in memory. The archive is written to ``archive_path`` when the session ends,
+    naming snapshots by their paths relative to ``root``. See --snapshot-update-output and --snapshot-apply.
+    """
+    def __init__(self, storage: SnapshotStorage, archive_path: str, root: str):
+        self.storage = storage
+        self.archive_path = archive_path
+        self.root = root
+        self.thread_safe = storage.thread_safe
+        # Maps the path of a written snapshot to the offset and length of its contents in the spool file,
+        # or to None if it was deleted.
+        self.changes = {}  # type: Dict[str, Optional[Tuple[int, int]]]
+        self._spool = None  # type: Optional[IO[bytes]]
+        self._lock = threading.Lock()
+
+    def _read_change(self, path: str) -> Optional[bytes]:
+        """
+        Returns the recorded contents of the snapshot ``path``, or None if it wasn't written.
+        """
+        with self._lock:
+            location = self.changes.get(path)
+            if location is None:
+                return None
+            offset, length = location
+            self._spool.seek(offset)
+            return self._spool.read(length)
+
+    def open_dir(self, snapshot_dir: str) -> None:
+        self.storage.open_dir(snapshot_dir)
+
+    def is_file(self, path: str) -> bool:
+        if path in self.changes:
+            return self.changes[path] is not None
+        return self.storage.is_file(path)
+
+    def is_dir(self, path: str) -> bool:
+        return bool(self.list_dir(path)) or self.storage.is_dir(path)
+
+    def list_dir(self, path: str) -> Iterable[str]:
+        names = set(self.storage.list_dir(path)) if self.storage.is_dir(path) else set()
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for changed_path, location in self.changes.items():
+                if changed_path.startswith(prefix):
+                    name = changed_path[len(prefix):].replace(os.sep, '/')
+                    if location is None:
+                        names.discard(name)
+                    else:
+                        names.add(name)
+        return sorted(names)
+
+    def size(self, path: str) -> int:
+        location = self.changes.get(path)
+        return location[1] if location is not None else self.storage.size(path)
+
+    def read(self, path: str) -> bytes:
+        data = self._read_change(path)
+        return data if data is not None else self.storage.read(path)
+
+    def compare(self, path: str, value: bytes) -> Optional[str]:
+        data = self._read_change(path)
+        return compare_bytes(value, data) if data is not None else self.storage.compare(path, value)
+
+    def local_path(self, path: str) -> Optional[str]:
+        return None if path in self.changes else self.storage.local_path(path)
+
+    def write(self, path: str, data: bytes) -> None:
+        with self._lock:
+            if self._spool is None:
+                self._spool = tempfile.TemporaryFile()
+            offset = self._spool.seek(0, os.SEEK_END)
+            self._spool.write(data)
+            self.changes[path] = (offset, len(data))
+
+    def delete(self, path: str) -> None:
+        with self._lock:
+            self.changes[path] = None
+
+    def commit(self) -> None:
+        written = _RecordedContents(self, {to_archive_name(path, self.root): path
+                                           for path, location in self.changes.items() if location is not None})
+        deleted = [to_archive_name(path, self.root) for path, location in self.changes.items() if location is None]
+        write_archive(self.archive_path, written, deleted)
+
+    def known_to_contain(self, path: str, chunks: Iterable[bytes]) -> bool:
+        return path not in self.changes and self.storage.known_to_contain(path, chunks)
+
+    def record_verified(self, path: str, data: bytes) -> None:
+        # The wrapped backend doesn't contain the recorded changes.
+        if path not in self.changes:
+            self.storage.record_verified(path, data)
+
+
+class _RecordedContents(Mapping):
+    """
+    Maps archive names to the contents recorded by a ``RecordingStorage``, reading them from its spool file on access.
+    """
+    def __init__(self, storage: RecordingStorage, paths: Dict[str, str]):
+        self._storage = storage
+        # Maps archive names to snapshot paths.
+        self._paths = paths
+
+    def __getitem__(self, name: str) -> bytes:
+        return self._storage._read_change(self._paths[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
@@ -0,0 +1,159 @@
+import os
+
+import pytest
+
+from pytest_snapshot._archive import SnapshotArchive, combine_archives, from_archive_name, merge_archives, \
+    write_archive
+from pytest_snapshot.storage import MemoryStorage, RecordingStorage
+
+
+def test_recording_storage(tmp_path):
+    root = str(tmp_path)
+    memory = MemoryStorage({os.path.join(root, 'a.txt'): b'a', os.path.join(root, 'dir', 'b.txt'): b'b'})
+    archive_path = str(tmp_path.joinpath('changes.zip'))
+    storage = RecordingStorage(memory, archive_path, root)
+    storage.write(os.path.join(root, 'dir', 'c.txt'), b'c')
+    storage.write(os.path.join(root, 'a.txt'), b'new a')
+    storage.delete(os.path.join(root, 'dir', 'b.txt'))
+
+    assert storage.read(os.path.join(root, 'a.txt')) == b'new a'
+    assert not storage.is_file(os.path.join(root, 'dir', 'b.txt'))
+    assert storage.list_dir(os.path.join(root, 'dir')) == ['c.txt']
+    storage.commit()
+    assert memory.files == {os.path.join(root, 'a.txt'): b'a', os.path.join(root, 'dir', 'b.txt'): b'b'}
+
+    with SnapshotArchive(archive_path) as archive:
+        assert archive.written == ['a.txt', 'dir/c.txt']
+        assert archive.deleted == ['dir/b.txt']
+        assert archive.read('dir/c.txt') == b'c'
+
+
+def test_recording_storage_spools_changes(tmp_path):
+    root = str(tmp_path)
+    archive_path = str(tmp_path.joinpath('changes.zip'))
+    storage = RecordingStorage(MemoryStorage(), archive_path, root)
+    path = os.path.join(root, 'a.txt')
+    storage.write(path, b'first')
+    storage.write(os.path.join(root, 'b.txt'), b'b')
+    storage.write(path, b'second')
+
+    # Only the location of the contents in the spool file is kept in memory.
+    assert all(type(location) is tuple for location in storage.changes.values())
+    assert storage.size(path) == 6
+    assert storage.read(path) == b'second'
+    assert storage.compare(path, b'second') is None
+    storage.commit()
+
+    with SnapshotArchive(archive_path) as archive:
+        assert archive.written == ['a.txt', 'b.txt']
+        assert archive.read('a.txt') == b'second'
+        assert archive.read('b.txt') == b'b'
+
+
+def test_merge_archives(tmp_path):
+    paths = [str(tmp_path.joinpath('{}.zip'.format(i))) for i in range(3)]
+    write_archive(paths[0], {'same.txt': b'same', 'a.txt': b'a', 'conflict.txt': b'x'}, ['deleted.txt'])
+    write_archive(paths[1], {'same.txt': b'same', 'b.txt': b'b', 'conflict.txt': b'y'}, ['deleted.txt'])
+    write_archive(paths[2], {'deleted.txt': b'recreated'}, [])
+
+    archives = [SnapshotArchive(path) for path in paths[:2]]
+    changes, conflicts = merge_archives(archives)
+    assert sorted(changes) == ['a.txt', 'b.txt', 'conflict.txt', 'deleted.txt', 'same.txt']
+    assert conflicts == ['conflict.txt: written with different contents by {} and {}'.format(*paths[:2])]
+
+    archives.append(SnapshotArchive(paths[2]))
+    _, conflicts = merge_archives(archives)
+    assert conflicts[1] == 'deleted.txt: deleted by {} but written by {}'.format(paths[0], paths[2])
+    for archive in archives:
+        archive.close()
+
+    assert len(combine_archives(paths[:2], paths[0])) == 1
+    with SnapshotArchive(paths[0]) as archive:
+        assert archive.written == ['a.txt', 'b.txt', 'conflict.txt', 'same.txt']
+        assert archive.read('conflict.txt') == b'x'
+
+
+def test_invalid_archive(tmp_path):
+    path = tmp_path.joinpath('invalid.zip')
+    path.write_bytes(b'not a zip')
+    with pytest.raises(ValueError, match='is not a snapshot archive'):
+        SnapshotArchive(str(path))
+
+
+@pytest.mark.parametrize('name', ['../escaped.txt', 'a/../../escaped.txt', '/abs/escaped.txt', 'a//b.txt'])
+def test_archive_with_invalid_name(tmp_path, name):
+    path = str(tmp_path.joinpath('invalid.zip'))
+    write_archive(path, {name: b'x'}, [])
+    with pytest.raises(ValueError, match='contains the invalid snapshot name'):
+        SnapshotArchive(path)
+    with pytest.raises(ValueError, match='invalid snapshot name'):
+        from_archive_name(name, str(tmp_path))
+
+
+SHARDED_TESTS = """
+    import os
+
+    SHARD = os.environ.get('SHARD')
+
+    def test_a(snapshot):
+        if SHARD in (None, '0'):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match_dir({'a.txt': 'new a'}, 'a')
+            snapshot.assert_match('shared', 'shared.txt')
+
+    def test_b(snapshot):
+        if SHARD in (None, '1'):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match_dir({'b.txt': os.environ.get('B', 'b')}, 'b')
+            snapshot.assert_match('shared', 'shared.txt')
+"""
+
+
+def test_sharded_update(testdir):
+    testdir.makepyfile(SHARDED_TESTS)
+    snapshots = testdir.mkdir('snapshots').mkdir('a')
+    snapshots.join('a.txt').write_binary(b'old a')
+
+    # Every shard only updates the snapshots of its own tests, recording them in an archive.
+    for shard in ('0', '1'):
+        testdir.monkeypatch.setenv('SHARD', shard)
+        result = testdir.runpytest('-v', '--snapshot-update-output', 'shard{}.zip'.format(shard))
+        result.stdout.fnmatch_lines([
+            '*snapshot archive*',
+            'Snapshot changes were recorded in shard{0}.zip instead of being applied '
+            '(run pytest --snapshot-apply shard{0}.zip to apply them)'.format(shard),
+        ])
+    assert sorted(os.listdir(str(snapshots))) == ['a.txt']
+    assert snapshots.join('a.txt').read_binary() == b'old a'
+
+    # Paths after the archives are not taken for archives, and no tests are run.
+    result = testdir.runpytest('--snapshot-apply', 'shard0.zip', '--snapshot-apply', 'shard1.zip', '.')
+    result.stdout.fnmatch_lines(['*snapshot archives*', 'applied 2 snapshot archives: 3 snapshots written, 0 deleted'])
+    assert 'passed' not in result.stdout.str()
+    assert result.ret == 0
+    assert snapshots.join('a.txt').read_binary() == b'new a'
+    assert testdir.tmpdir.join('snapshots', 'b', 'b.txt').read_binary() == b'b'
+    assert testdir.tmpdir.join('snapshots', 'shared.txt').read_binary() == b'shared'
+
+    testdir.monkeypatch.delenv('SHARD')
+    result = testdir.runpytest('-v')
+    result.assert_outcomes(passed=2)
+
+
+def test_apply_conflicting_archives(testdir):
+    testdir.makepyfile(SHARDED_TESTS)
+    testdir.monkeypatch.setenv('SHARD', '1')
+    testdir.runpytest('--snapshot-update-output', 'first.zip')
+    testdir.monkeypatch.setenv('B', 'other b')
+    testdir.runpytest('--snapshot-update-output', 'second.zip')
+
+    result = testdir.runpytest('--snapshot-apply', 'first.zip', '--snapshot-apply', 'second.zip')
+    result.stdout.fnmatch_lines([
+        '1 conflicting snapshot changes, nothing was applied:',
+        '  snapshots/b/b.txt: written with different contents by first.zip and second.zip',
+    ])
+    assert result.ret == 1
+    assert not testdir.tmpdir.join('snapshots').exists()
+
+    result = testdir.runpytest('--snapshot-apply', 'missing.zip')
+    result.stderr.fnmatch_lines(['ERROR: cannot read snapshot archive:*missing.zip*'])
@@ -0,0 +1,132 @@
+import pytest
+
+from pytest_snapshot._array import MAX_REPORTED_INDICES, compare_arrays
+from tests.utils import assert_outcomes
+
+numpy = pytest.importorskip('numpy')
+
+
+def test_compare_arrays_within_tolerance():
+    expected = numpy.array([1.0, 2.0, numpy.nan])
+    assert compare_arrays(expected + 1e-9, expected, rtol=1e-7, atol=0.0) is None
+    assert compare_arrays(expected + 0.01, expected, rtol=0.0, atol=0.1) is None
+
+
+def test_compare_arrays_shape_and_dtype():
+    value = numpy.zeros((2, 3))
+    assert compare_arrays(value, numpy.zeros(6), rtol=0.0, atol=0.0) == 'shape (2, 3) != (6,)'
+    assert compare_arrays(value, value.astype(numpy.float32), rtol=0.0, atol=0.0) == 'dtype float64 != float32'
+
+
+def test_compare_arrays_summary():
+    expected = numpy.ones((4, 5))
+    value = expected.copy()
+    value[1, 2] = 1.5
+    value[3, 0] = numpy.nan
+    assert compare_arrays(value, expected, rtol=1e-7, atol=0.0) == '\n'.join([
+        '2 of 20 elements differ (rtol=1e-07, atol=0.0)',
+        'max absolute error: 0.5',
+        'max relative error: 0.5',
+        'first differing elements:',
+        '  [1, 2]: 1.5 != 1.0',
+        '  [3, 0]: nan != 1.0',
+    ])
+
+
+def test_compare_arrays_many_mismatches():
+    expected = numpy.zeros(1000, dtype=numpy.int64)
+    message = compare_arrays(expected + 3, expected, rtol=0.0, atol=1.0)
+    lines = message.splitlines()
+    assert lines[:3] == ['1000 of 1000 elements differ (rtol=0.0, atol=1.0)',
+                         'max absolute error: 3', 'max relative error: inf']
+    assert lines[4:6] == ['  [0]: 3 != 0', '  [1]: 3 != 0']
+    assert lines[-1] == '  ... and {} more'.format(1000 - MAX_REPORTED_INDICES)
+    assert len(lines) == 5 + MAX_REPORTED_INDICES
+
+
+def test_compare_arrays_non_numeric():
+    expected = numpy.array(['a', 'b'])
+    assert compare_arrays(numpy.array(['a', 'b']), expected, rtol=1.0, atol=1.0) is None
+    assert compare_arrays(numpy.array(['a', 'c']), expected, rtol=1.0, atol=1.0) == '\n'.join([
+        '1 of 2 elements differ',
+        'differing element:',
+        "  [1]: 'c' != 'b'",
+    ])
+
+
+def test_assert_match_array(testdir):
+    case_dir = testdir.mkdir('case_dir')
+    testdir.makepyfile(r"""
+        import os
+        import numpy
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            noise = float(os.environ.get('NOISE', '0'))
+            snapshot.assert_match_array(numpy.linspace(0, 1, 11) + noise, 'values.npy', atol=1e-6)
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    numpy.testing.assert_array_equal(numpy.load(str(case_dir.join('values.npy'))), numpy.linspace(0, 1, 11))
+    mtime = case_dir.join('values.npy').mtime()
+
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=1)
+
+    # Noise within the tolerances neither fails nor updates the snapshot.
+    testdir.monkeypatch.setenv('NOISE', '1e-7')
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1)
+    assert case_dir.join('values.npy').mtime() == mtime
+
+    testdir.monkeypatch.setenv('NOISE', '0.25')
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, failed=1)
+    result.stdout.fnmatch_lines([
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?values.npy',
+        'E*   11 of 11 elements differ (rtol=1e-07, atol=1e-06)',
+        'E*   max absolute error: 0.25',
+        'E*   first differing elements:',
+        'E*     ?0?: 0.25 != 0.0',
+    ])
+
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    result.stdout.fnmatch_lines(['*Updated snapshots:', '*values.npy'])
+
+
+def test_assert_match_array_large_snapshot(testdir):
+    case_dir = testdir.mkdir('case_dir')
+    testdir.makepyfile(r"""
+        import numpy
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            value = numpy.arange(1 << 18, dtype=numpy.float64)
+            value[-1] = -1
+            snapshot.assert_match_array(value, 'values.npy')
+    """)
+    numpy.save(str(case_dir.join('values.npy')), numpy.arange(1 << 18, dtype=numpy.float64))
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, failed=1)
+    result.stdout.fnmatch_lines([
+        'E*   1 of 262144 elements differ (rtol=1e-07, atol=0.0)',
+        'E*     ?262143?: -1.0 != 262143.0',
+    ])
+
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    assert numpy.load(str(case_dir.join('values.npy')))[-1] == -1
+
+
+def test_assert_match_array_missing_snapshot(testdir):
+    testdir.makepyfile(r"""
+        import numpy
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match_array(numpy.zeros(3), 'values.npy')
+    """)
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, failed=1)
+    result.stdout.fnmatch_lines(["E* AssertionError: snapshot case_dir?values.npy doesn't exist.*"])
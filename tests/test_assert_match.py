@@ -4,7 +4,7 @@ from pathlib import Path
 import pytest
 
 from pytest_snapshot._utils import simple_version_parse
-from pytest_snapshot.plugin import _file_encode
+from pytest_snapshot.plugin import _file_decode, _file_encode, _text_equals_encoded
 from tests.utils import assert_pytest_passes, runpytest_with_assert_mode
 
 
@@ -123,16 +123,23 @@ def test_assert_match_failure_assert_plain(request, testdir, basic_case_dir):
     assert result.ret == 1
 
 
-def test_assert_match_invalid_type(testdir, basic_case_dir):
+@pytest.mark.parametrize('value', ['object()', 'Columns()', "{'a', 'b'}"])
+def test_assert_match_invalid_type(testdir, basic_case_dir, value):
     testdir.makepyfile(r"""
+        class Columns:
+            # Like a data frame, iterating yields the column names.
+            def __iter__(self):
+                return iter(['a', 'b'])
+
         def test_sth(snapshot):
             snapshot.snapshot_dir = 'case_dir'
-            snapshot.assert_match(123, 'snapshot1.txt')
-    """)
+            snapshot.assert_match({}, 'snapshot1.txt')
+    """.format(value))
     result = testdir.runpytest('-v')
     result.stdout.fnmatch_lines([
         '*::test_sth FAILED*',
-        'E* TypeError: value must be str or bytes',
+        'E* TypeError: value must be str, bytes, a file object, an iterator of str or bytes chunks, '
+        'or a value of a type with a registered serializer',
     ])
     assert result.ret == 1
 
@@ -419,3 +426,249 @@ def test_assert_match_unsupported_value_slash_r(testdir, basic_case_dir):
         'E* ValueError: Snapshot testing strings containing "\\r" is not supported.',
     ])
     assert result.ret == 1
+
+
+def _overwrite_keeping_stat(path, data):
+    stat = path.stat()
+    path.write_bytes(data)
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_assert_match_manifest_skips_reading_snapshot(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match('the valuÉ of snapshot1.txt\n', 'snapshot1.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-manifest')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+
+    # Corrupt the snapshot without changing its size or modification time.
+    snapshot_path = Path(str(basic_case_dir.join('snapshot1.txt')))
+    _overwrite_keeping_stat(snapshot_path, snapshot_path.read_bytes().upper())
+
+    result = testdir.runpytest('-v', '--snapshot-manifest')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines(['*::test_sth FAILED*'])
+
+
+def test_assert_match_manifest_ignores_modified_snapshot(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match('the valuÉ of snapshot1.txt\n', 'snapshot1.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-manifest')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+
+    snapshot_path = Path(str(basic_case_dir.join('snapshot1.txt')))
+    snapshot_path.write_bytes(snapshot_path.read_bytes().upper())
+    os.utime(str(snapshot_path), (0, 0))
+
+    result = testdir.runpytest('-v', '--snapshot-manifest')
+    result.stdout.fnmatch_lines(['*::test_sth FAILED*'])
+    assert result.ret == 1
+
+
+def test_assert_match_manifest_recorded_on_update(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(b'new value', 'snapshot2.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update', '--snapshot-manifest')
+    result.stdout.fnmatch_lines(['*::test_sth ERROR*'])
+
+    snapshot_path = Path(str(basic_case_dir.join('snapshot2.txt')))
+    _overwrite_keeping_stat(snapshot_path, b'NEW VALUE')
+
+    result = testdir.runpytest('-v', '--snapshot-manifest')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+
+
+def test_assert_match_failure_large_bytes(testdir, basic_case_dir):
+    basic_case_dir.join('large.bin').write_binary(b'\0' * (3 << 20))
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(b'\0' * (2 << 20) + b'\1' * (1 << 20), 'large.bin')
+    """)
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?large.bin',
+        'E*   (run pytest with --snapshot-update to update snapshots)',
+        'E* bytes differ at offset 2097152 (value has 3145728 bytes, snapshot has 3145728 bytes)',
+        'E* value:',
+        'E* 001fffe0  00 00 *',
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_success_stream(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        import io
+        import os
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(iter(['the valuÉ ', 'of snapshot1.txt\n']), 'snapshot1.txt')
+            snapshot.assert_match(io.StringIO('the valuÉ of snapshot1.txt\n'), 'snapshot1.txt')
+            chunks = [b'the valu\xc3\x89 of ', b'snapshot1.txt' + os.linesep.encode()]
+            snapshot.assert_match(iter(chunks), 'snapshot1.txt')
+            with open('case_dir/snapshot1.txt', 'rb') as f:
+                snapshot.assert_match(f, 'snapshot1.txt')
+    """)
+    assert_pytest_passes(testdir)
+
+
+def test_assert_match_failure_stream(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(iter(['the valuÉ of ', 'snapshot2.txt\n']), 'snapshot1.txt')
+    """)
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?snapshot1.txt',
+        'E*   (run pytest with --snapshot-update to update snapshots)',
+        'E* text differs at character offset 21 (line 1)',
+        "E* value:    'snapshot2.txt\\n'",
+        "E* snapshot: 'snapshot1.txt\\n'",
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_stream_mixed_chunks(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(iter(['the valuÉ of ', b'snapshot1.txt\n']), 'snapshot1.txt')
+    """)
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* TypeError: stream chunks must all be str or all be bytes',
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_update_stream(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(iter(['the valuÉ of snapshot1.txt\n']), 'snapshot1.txt')
+            snapshot.assert_match(iter(['new ', 'value\n']), 'snapshot2.txt')
+            snapshot.assert_match(iter([b'new ', b'bytes']), 'sub/snapshot3.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*::test_sth ERROR*',
+        '  Created snapshots:',
+        '    snapshot2.txt',
+        '    sub?snapshot3.txt',
+    ])
+    assert sorted(os.listdir(str(basic_case_dir))) == ['snapshot1.txt', 'snapshot2.txt', 'sub']
+    assert basic_case_dir.join('snapshot2.txt').read_text('utf-8') == 'new value\n'
+    assert basic_case_dir.join('sub', 'snapshot3.txt').read_binary() == b'new bytes'
+    assert_pytest_passes(testdir)
+
+
+def test_assert_match_failure_large_string(testdir, basic_case_dir):
+    basic_case_dir.join('large.txt').write_text(''.join('line {}\n'.format(i) for i in range(20000)), 'utf-8')
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            value = ''.join('line {}\n'.format(i) for i in range(20000))
+            snapshot.assert_match(value.replace('line 10000\n', 'line ten thousand\n'), 'large.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-diff-limit=80')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?large.txt',
+        'E*   (run pytest with --snapshot-update to update snapshots)',
+        'E* --- snapshot',
+        'E* +++ value',
+        'E* @@ -9998,7 +9998,7 @@',
+        'E*  line 9997',
+        'E*  line 9998',
+        'E*  line 9999',
+        'E* -line 10000',
+        'E* +line ten thousand',
+        'E* ...',
+        'E* ... diff truncated, 1 hunks in total (use --snapshot-diff-limit to show more)',
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_failure_large_string_diff_options(testdir, basic_case_dir):
+    basic_case_dir.join('large.txt').write_text(''.join('line {}\n'.format(i) for i in range(20000)), 'utf-8')
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            value = ''.join('line {}\n'.format(i) for i in range(20000))
+            value = value.replace('line 100\n', 'line one hundred\n').replace('line 200\n', 'line two hundred\n')
+            snapshot.assert_match(value, 'large.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-diff-context=1', '--snapshot-diff-hunks=1')
+    result.stdout.fnmatch_lines([
+        'E* --- snapshot',
+        'E* +++ value',
+        'E* @@ -100,3 +100,3 @@',
+        'E*  line 99',
+        'E* -line 100',
+        'E* +line one hundred',
+        'E*  line 101',
+        'E* ... diff truncated, 2 hunks in total (use --snapshot-diff-hunks to show more)',
+    ])
+    assert '+line two hundred' not in result.stdout.str()
+    assert result.ret == 1
+
+
+def test_assert_match_update_does_not_read_snapshot_of_different_size(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        from pathlib import Path
+        from unittest import mock
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            with mock.patch.object(Path, 'read_bytes', side_effect=AssertionError('snapshot was read')):
+                snapshot.assert_match('a different value\n', 'snapshot1.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*::test_sth ERROR*',
+        '  Updated snapshots:',
+        '    snapshot1.txt',
+    ])
+    assert basic_case_dir.join('snapshot1.txt').read_text('utf-8') == 'a different value\n'
+
+
+def test_assert_match_update_same_size_different_content(testdir, basic_case_dir):
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match('the valuÉ of snapshot2.txt\n', 'snapshot1.txt')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*::test_sth ERROR*',
+        '  Updated snapshots:',
+        '    snapshot1.txt',
+    ])
+    assert basic_case_dir.join('snapshot1.txt').read_text('utf-8') == 'the valuÉ of snapshot2.txt\n'
+
+
+def test_file_decode_newlines():
+    assert _file_decode(b'a\r\nb\rc\n') == 'a\nb\nc\n'
+    assert _file_decode(_file_encode('a\nb\n')) == 'a\nb\n'
+
+
+def test_text_equals_encoded():
+    assert _text_equals_encoded('a\nb\n', _file_encode('a\nb\n'))
+    assert not _text_equals_encoded('a\nb', _file_encode('a\nb\n'))
+    # A value containing "\r" never equals a decoded snapshot, even if its bytes equal the snapshot.
+    assert not _text_equals_encoded('a\r\n', b'a\r\n')
+    assert not _text_equals_encoded('\ud800', b'')
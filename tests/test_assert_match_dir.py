@@ -2,6 +2,7 @@ import sys
 
 import pytest
 
+from pytest_snapshot._utils import simple_version_parse
 from tests.utils import assert_pytest_passes, runpytest_with_assert_mode
 
 
@@ -68,7 +69,7 @@ def test_assert_match_dir_invalid_type(testdir, basic_case_dir):
     result = testdir.runpytest('-v')
     result.stdout.fnmatch_lines([
         '*::test_sth FAILED*',
-        'E* TypeError: dir_dict must be a dictionary',
+        'E* TypeError: dir_dict must be a dictionary or an iterable of (path, value) pairs',
     ])
     assert result.ret == 1
 
@@ -314,3 +315,133 @@ def test_assert_match_dir_path_traversal_name(testdir, basic_case_dir):
         "E* ValueError: Key 'subdir1/subobj1.txt' in d must be a valid file name.",
     ])
     assert result.ret == 1
+
+
+@pytest.mark.skipif(simple_version_parse(pytest.__version__) < (5, 0, 0), reason="consecutive flag not supported.")
+def test_assert_match_dir_parallel_update(testdir, basic_case_dir):
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match_dir({
+                'obj1.txt': 'the value of obj1.txt',
+                'subdir1': {
+                    'subobj1.txt': 'the value of subobj1.txt',
+                },
+                'new': {'file{:03}.txt'.format(i): 'value {}'.format(i) for i in range(100)},
+            }, 'dict_snapshot1')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update', '--snapshot-workers=8')
+    result.stdout.fnmatch_lines(['*::test_sth ERROR*'])
+    result.stdout.fnmatch_lines(
+        ['  Created snapshots:'] + ['    dict_snapshot1?new?file{:03}.txt'.format(i) for i in range(100)],
+        consecutive=True)
+    assert basic_case_dir.join('dict_snapshot1', 'new', 'file042.txt').read_text('utf-8') == 'value 42'
+    result = testdir.runpytest('-v', '--snapshot-workers=8')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+
+
+def test_assert_match_dir_parallel_failure(testdir, basic_case_dir):
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match_dir({
+                'obj1.txt': 'the INCORRECT value of obj1.txt',
+                'subdir1': {
+                    'subobj1.txt': 'the INCORRECT value of subobj1.txt',
+                },
+            }, 'dict_snapshot1')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-workers=2')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?dict_snapshot1?obj1.txt',
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_dir_generator(testdir, basic_case_dir):
+    testdir.makepyfile("""
+        import os
+
+        def generated_files():
+            yield 'obj1.txt', 'the value of obj1.txt'
+            yield 'subdir1/subobj1.txt', os.environ.get('SUBOBJ1', 'the value of subobj1.txt')
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match_dir(generated_files(), 'dict_snapshot1')
+    """)
+    assert_pytest_passes(testdir)
+
+    testdir.monkeypatch.setenv('SUBOBJ1', 'the INCORRECT value of subobj1.txt')
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* AssertionError: value does not match the expected value in snapshot '
+        'case_dir?dict_snapshot1?subdir1?subobj1.txt',
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_dir_lazy_mapping(testdir, basic_case_dir):
+    testdir.makepyfile("""
+        from collections.abc import Mapping
+
+        class Generated(Mapping):
+            def __init__(self):
+                self.computed = []
+
+            def __getitem__(self, name):
+                self.computed.append(name)
+                return 'value of {}'.format(name)
+
+            def __iter__(self):
+                return iter(['new{}.txt'.format(i) for i in range(3)])
+
+            def __len__(self):
+                return 3
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            generated = Generated()
+            snapshot.assert_match_dir({'generated': generated}, 'lazy')
+            assert generated.computed == ['new0.txt', 'new1.txt', 'new2.txt']
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines(['*::test_sth ERROR*', '  Created snapshots:', '    lazy?generated?new0.txt'])
+    assert basic_case_dir.join('lazy', 'generated', 'new2.txt').read_text('utf-8') == 'value of new2.txt'
+    assert_pytest_passes(testdir)
+
+
+def test_assert_match_dir_generator_missing_snapshots(testdir, basic_case_dir):
+    """
+    Missing and extra files are reported even if a file produced before them doesn't match its snapshot.
+    """
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match_dir(iter([
+                ('obj1.txt', 'the INCORRECT value of obj1.txt'),
+                ('new.txt', 'new'),
+            ]), 'dict_snapshot1')
+    """)
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        'E* AssertionError: Values do not match snapshots in case_dir?dict_snapshot1',
+        'E*   Values without snapshots:',
+        'E*     new.txt',
+        'E*   Snapshots without values:',
+        'E*     subdir1/subobj1.txt',
+    ])
+    assert result.ret == 1
+
+
+def test_assert_match_dir_duplicate_path(testdir, basic_case_dir):
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match_dir([('a.txt', 'a'), ('a.txt', 'b')], 'dict_snapshot1')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines(["E* ValueError: Path 'a.txt' appears more than once in dir_dict."])
+    assert result.ret == 1
@@ -0,0 +1,147 @@
+import os
+
+import pytest
+
+from pytest_snapshot._session import SnapshotSession
+from pytest_snapshot.plugin import Snapshot
+from pytest_snapshot.storage import MemoryStorage
+
+
+@pytest.fixture
+def generated_tree_case(testdir):
+    testdir.makepyfile(r"""
+        import os
+        from pathlib import Path
+
+        def generate(root):
+            root.joinpath('sub', 'deeper').mkdir(parents=True)
+            root.joinpath('a.txt').write_bytes(os.environ.get('A_CONTENT', 'a content\n').encode())
+            root.joinpath('sub', 'b.bin').write_bytes(bytes(range(256)) * 64)
+            root.joinpath('sub', 'deeper', 'c.txt').write_bytes(b'c\r\n')
+            if os.environ.get('EXTRA'):
+                root.joinpath('extra.txt').write_bytes(b'extra')
+
+        def test_sth(snapshot, tmp_path):
+            snapshot.snapshot_dir = 'case_dir'
+            generate(tmp_path.joinpath('out'))
+            snapshot.assert_match_tree(tmp_path.joinpath('out'), 'generated')
+    """)
+    return testdir.tmpdir.join('case_dir', 'generated')
+
+
+def test_assert_match_tree_create_and_compare(testdir, generated_tree_case):
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*::test_sth ERROR*',
+        '  Created snapshots:',
+        '    generated?a.txt',
+        '    generated?sub?b.bin',
+        '    generated?sub?deeper?c.txt',
+    ])
+    assert generated_tree_case.join('sub', 'deeper', 'c.txt').read_binary() == b'c\r\n'
+    assert generated_tree_case.join('sub', 'b.bin').read_binary() == bytes(range(256)) * 64
+
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+    result = testdir.runpytest('-v', '--snapshot-update', '--snapshot-workers=4')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+
+
+def test_assert_match_tree_mismatch(testdir, generated_tree_case):
+    testdir.runpytest('--snapshot-update')
+
+    testdir.monkeypatch.setenv('A_CONTENT', 'A content\n')
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        '*::test_sth FAILED*',
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?generated?a.txt',
+        'E*   bytes differ at offset 0',
+    ])
+
+    testdir.monkeypatch.setenv('A_CONTENT', 'longer content\n')
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines(['E*   file sizes differ (value has 15 bytes, snapshot has 10 bytes)'])
+
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines(['*::test_sth ERROR*', '  Updated snapshots:', '    generated?a.txt'])
+    assert generated_tree_case.join('a.txt').read_binary() == b'longer content\n'
+
+
+def test_assert_match_tree_added_and_removed_files(testdir, generated_tree_case):
+    testdir.runpytest('--snapshot-update')
+    generated_tree_case.join('stale.txt').write_binary(b'stale')
+
+    testdir.monkeypatch.setenv('EXTRA', '1')
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines([
+        'E* AssertionError: Values do not match snapshots in case_dir?generated',
+        'E*   Values without snapshots:',
+        'E*     extra.txt',
+        'E*   Snapshots without values:',
+        'E*     stale.txt',
+    ])
+
+    result = testdir.runpytest('-v', '--snapshot-update', '--allow-snapshot-deletion')
+    result.stdout.fnmatch_lines([
+        '  Created snapshots:',
+        '    generated?extra.txt',
+        '  Deleted snapshots:',
+        '    generated?stale.txt',
+    ])
+    assert not generated_tree_case.join('stale.txt').exists()
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
+
+
+def test_assert_match_tree_not_a_directory(testdir):
+    testdir.makepyfile("""
+        def test_sth(snapshot, tmp_path):
+            snapshot.assert_match_tree(tmp_path.joinpath('missing'), 'generated')
+    """)
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines(['E* ValueError: *missing is not a directory'])
+    assert result.ret == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink') or os.name == 'nt', reason='requires symbolic links')
+def test_assert_match_tree_skips_directory_symlinks(testdir):
+    testdir.makepyfile("""
+        def test_sth(snapshot, tmp_path):
+            snapshot.snapshot_dir = 'case_dir'
+            out = tmp_path.joinpath('out')
+            out.joinpath('sub').mkdir(parents=True)
+            out.joinpath('sub', 'a.txt').write_bytes(b'a')
+            # A symbolic link cycle, which would be walked forever if directory links were followed.
+            out.joinpath('sub', 'loop').symlink_to(out, target_is_directory=True)
+            out.joinpath('link.txt').symlink_to(out.joinpath('sub', 'a.txt'))
+            snapshot.assert_match_tree(out, 'generated')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*::test_sth ERROR*',
+        '  Created snapshots:',
+        '    generated?link.txt',
+        '    generated?sub?a.txt',
+    ])
+    assert not testdir.tmpdir.join('case_dir', 'generated', 'sub', 'loop').exists()
+
+
+def test_assert_match_tree_with_memory_storage(tmp_path):
+    out = tmp_path.joinpath('out')
+    out.mkdir()
+    out.joinpath('a.bin').write_bytes(bytes(range(256)) * 64)
+    out.joinpath('empty.txt').write_bytes(b'')
+    session = SnapshotSession(MemoryStorage())
+    snapshot_dir = tmp_path.joinpath('snapshots')
+    with pytest.raises(pytest.fail.Exception, match='Created snapshots:'):
+        with Snapshot(True, False, snapshot_dir, session) as snapshot:
+            snapshot.assert_match_tree(out, 'generated')
+    assert session.storage.files[str(snapshot_dir.joinpath('generated', 'empty.txt'))] == b''
+
+    with Snapshot(False, False, snapshot_dir, session) as snapshot:
+        snapshot.assert_match_tree(out, 'generated')
+
+    out.joinpath('a.bin').write_bytes(bytes(range(256)) * 63 + bytes(reversed(range(256))))
+    with Snapshot(False, False, snapshot_dir, session) as snapshot:
+        with pytest.raises(AssertionError, match='bytes differ at offset 16128 '):
+            snapshot.assert_match_tree(out, 'generated')
@@ -0,0 +1,73 @@
+import pytest
+
+from pytest_snapshot._compare import compare_bytes_to_file, compare_stream_to_file, hexdump
+
+
+@pytest.fixture
+def snapshot_file(tmp_path):
+    path = tmp_path.joinpath('snapshot.bin')
+    path.write_bytes(bytes(range(256)) * 64)
+    return path
+
+
+def test_hexdump():
+    assert hexdump(b'ab\x00' * 6, 0x20).split('\n') == [
+        '00000020  61 62 00 61 62 00 61 62 00 61 62 00 61 62 00 61  |ab.ab.ab.ab.ab.a|',
+        '00000030  62 00                                            |b.|',
+    ]
+
+
+def test_compare_bytes_to_file_equal(snapshot_file):
+    value = snapshot_file.read_bytes()
+    assert compare_bytes_to_file(value, str(snapshot_file), len(value), chunk_size=1000) is None
+
+
+@pytest.mark.parametrize('offset', [0, 999, 1000, 16383])
+def test_compare_bytes_to_file_difference(snapshot_file, offset):
+    value = bytearray(snapshot_file.read_bytes())
+    value[offset] ^= 0xff
+    message = compare_bytes_to_file(bytes(value), str(snapshot_file), len(value), chunk_size=1000)
+    assert message.startswith('bytes differ at offset {} (value has 16384 bytes, snapshot has 16384 bytes)'.format(
+        offset))
+    assert '{:08x}'.format(offset // 16 * 16) in message
+
+
+def test_compare_bytes_to_file_prefix(snapshot_file):
+    value = snapshot_file.read_bytes()[:5000]
+    message = compare_bytes_to_file(value, str(snapshot_file), 16384, chunk_size=1000)
+    assert message.startswith('bytes differ at offset 5000 (value has 5000 bytes, snapshot has 16384 bytes)')
+
+
+def test_compare_bytes_to_empty_file(tmp_path):
+    path = tmp_path.joinpath('empty.bin')
+    path.write_bytes(b'')
+    assert compare_bytes_to_file(b'', str(path), 0) is None
+    message = compare_bytes_to_file(b'x', str(path), 0)
+    assert message.split('\n')[-1] == '(no bytes)'
+
+
+@pytest.mark.parametrize('chunks, expected_message', [
+    ([b'ab', b'', b'cd'], None),
+    ([b'ab', b'cx'], 'bytes differ at offset 3'),
+    ([b'abcde'], 'bytes differ at offset 4'),
+    ([b'ab'], 'value ends at offset 2 but the snapshot continues'),
+])
+def test_compare_stream_to_file_binary(tmp_path, chunks, expected_message):
+    path = tmp_path.joinpath('snapshot.bin')
+    path.write_bytes(b'abcd')
+    message = compare_stream_to_file(chunks, str(path), binary=True)
+    if expected_message is None:
+        assert message is None
+    else:
+        assert message.split('\n')[0] == expected_message
+
+
+def test_compare_stream_to_file_text_universal_newlines(tmp_path):
+    path = tmp_path.joinpath('snapshot.txt')
+    path.write_bytes('line 1\r\nline É\r\n'.encode())
+    assert compare_stream_to_file(['line 1\nli', 'ne É\n'], str(path), binary=False) is None
+    assert compare_stream_to_file(['line 1\nli', 'ne 2\n'], str(path), binary=False).split('\n') == [
+        'text differs at character offset 12 (line 2)',
+        "value:    'ne 2\\n'",
+        "snapshot: 'ne É\\n'",
+    ]
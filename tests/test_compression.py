@@ -0,0 +1,147 @@
+import os
+
+import pytest
+
+from pytest_snapshot._compression import CODECS, get_codec, split_suffix
+from pytest_snapshot._manifest import SnapshotManifest
+from pytest_snapshot.storage import CompressedStorage, FileSystemStorage, MemoryStorage
+from tests.utils import assert_outcomes
+
+
+@pytest.mark.parametrize('name', ['gzip', 'lzma'])
+def test_codec_roundtrip(name):
+    codec = get_codec(name)
+    data = b'snapshot\n' * 1000
+    compressed = codec.compress(data)
+    assert len(compressed) < len(data)
+    assert codec.decompress(compressed) == data
+    # Compressed snapshots must not change when they are written again.
+    assert codec.compress(data) == compressed
+
+
+def test_get_codec():
+    assert get_codec('auto').name == ('zstd' if CODECS['zstd'].available else 'gzip')
+    with pytest.raises(ValueError, match="unknown compression 'bz2'"):
+        get_codec('bz2')
+
+
+def test_zstd_unavailable():
+    if CODECS['zstd'].available:
+        pytest.skip('zstd is available')
+    with pytest.raises(ValueError, match='zstd compression requires'):
+        get_codec('zstd')
+    with pytest.raises(RuntimeError, match='zstd compression requires'):
+        CODECS['zstd'].decompress(b'')
+
+
+def test_split_suffix():
+    assert split_suffix('a.txt.compressed.gz') == ('a.txt', CODECS['gzip'])
+    assert split_suffix('a.txt.gz') == ('a.txt.gz', None)
+    assert split_suffix('a.txt') == ('a.txt', None)
+    assert split_suffix('.compressed.gz') == ('.compressed.gz', None)
+
+
+def _path(*parts):
+    return os.path.join(os.path.abspath('snapshots'), *parts)
+
+
+def test_compressed_storage():
+    # A snapshot that was named like a compressed file before compression was enabled.
+    memory = MemoryStorage({_path('existing.gz'): b'raw gzip'})
+    storage = CompressedStorage(memory, get_codec('gzip'), threshold=10, extensions=['.bin'])
+    storage.write(_path('small.txt'), b'small')
+    storage.write(_path('large.txt'), b'large' * 10)
+    storage.write(_path('dir', 'data.bin'), b'b')
+    storage.write(_path('archive.compressed.gz'), b'raw')
+
+    assert sorted(memory.list_dir(_path())) == [
+        'archive.compressed.gz.compressed.gz', 'dir/data.bin.compressed.gz', 'existing.gz', 'large.txt.compressed.gz',
+        'small.txt',
+    ]
+    assert storage.list_dir(_path()) == ['archive.compressed.gz', 'dir/data.bin', 'existing.gz', 'large.txt',
+                                         'small.txt']
+    assert storage.is_file(_path('large.txt'))
+    assert not storage.is_file(_path('missing.txt'))
+    assert not storage.is_file(_path('existing'))
+    assert storage.read(_path('large.txt')) == b'large' * 10
+    assert storage.read(_path('existing.gz')) == b'raw gzip'
+    assert storage.read(_path('archive.compressed.gz')) == b'raw'
+    assert storage.compare(_path('small.txt'), b'small') is None
+
+    # The size of a compressed snapshot is only known once it was read.
+    assert storage.size(_path('small.txt')) == 5
+    assert storage.size(_path('dir', 'data.bin')) is None
+    assert storage.read(_path('dir', 'data.bin')) == b'b'
+    assert storage.size(_path('dir', 'data.bin')) == 1
+
+    # Shrinking a snapshot below the threshold replaces the compressed file.
+    storage.write(_path('large.txt'), b'tiny')
+    assert storage.read(_path('large.txt')) == b'tiny'
+    assert memory.is_file(_path('large.txt'))
+    assert not memory.is_file(_path('large.txt.compressed.gz'))
+
+    storage.delete(_path('dir', 'data.bin'))
+    assert not memory.is_dir(_path('dir'))
+
+
+def test_compressed_storage_reads_other_codecs():
+    memory = MemoryStorage({_path('a.txt.compressed.xz'): get_codec('lzma').compress(b'a')})
+    storage = CompressedStorage(memory, get_codec('gzip'))
+    assert storage.read(_path('a.txt')) == b'a'
+
+
+def test_compressed_storage_manifest(tmp_path):
+    snapshot_dir = tmp_path.joinpath('snapshots')
+    path = str(snapshot_dir.joinpath('large.txt'))
+    storage = CompressedStorage(FileSystemStorage(manifest=SnapshotManifest()), get_codec('gzip'), threshold=10)
+    storage.open_dir(str(snapshot_dir))
+    storage.write(path, b'large' * 10)
+    assert not storage.known_to_contain(path, [b'large' * 10])
+
+    storage.record_verified(path, b'large' * 10)
+    assert storage.known_to_contain(path, [b'large' * 5, b'large' * 5])
+    assert not storage.known_to_contain(path, [b'other' * 10])
+
+
+def test_compressed_snapshots(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_compression = gzip
+        snapshot_compression_threshold = 100
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match('a' * 100, 'large.txt')
+            snapshot.assert_match_dir({'small.txt': 'b', 'large.bin': b'c' * 1000}, 'dir')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    result.stdout.fnmatch_lines([
+        '  Created snapshots:',
+        '    large.txt',
+        '    dir?small.txt',
+        '    dir?large.bin',
+    ])
+    snapshots_dir = testdir.tmpdir.join('snapshots')
+    assert sorted(os.listdir(str(snapshots_dir))) == ['dir', 'large.txt.compressed.gz']
+    assert sorted(os.listdir(str(snapshots_dir.join('dir')))) == ['large.bin.compressed.gz', 'small.txt']
+
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=1)
+
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1)
+
+
+def test_invalid_compression(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_compression = bz2
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            pass
+    """)
+    result = testdir.runpytest()
+    result.stderr.fnmatch_lines(["*invalid snapshot compression settings: unknown compression 'bz2'*"])
@@ -0,0 +1,98 @@
+import difflib
+import random
+
+import pytest
+
+from pytest_snapshot._diff import diff_opcodes, unified_diff
+
+
+def _lines(*numbers):
+    return ['line {}\n'.format(n) for n in numbers]
+
+
+def _apply(opcodes, a, b):
+    result = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            result.extend(a[i1:i2])
+        else:
+            result.extend(b[j1:j2])
+    return result
+
+
+@pytest.mark.parametrize('a, b', [
+    ([], []),
+    (_lines(1, 2, 3), _lines(1, 2, 3)),
+    ([], _lines(1)),
+    (_lines(1), []),
+    (_lines(1, 2, 3), _lines(1, 3)),
+    (_lines(1, 2, 3), _lines(3, 2, 1)),
+    (['x\n'] * 5, ['x\n'] * 3 + ['y\n']),
+])
+def test_diff_opcodes(a, b):
+    assert _apply(diff_opcodes(a, b), a, b) == b
+
+
+def test_diff_opcodes_random():
+    rng = random.Random(0)
+    for _ in range(50):
+        a = [rng.choice('abc') + '\n' for _ in range(rng.randrange(30))]
+        b = [rng.choice('abc') + '\n' for _ in range(rng.randrange(30))]
+        assert _apply(diff_opcodes(a, b), a, b) == b
+
+
+def test_unified_diff_matches_difflib():
+    a = ''.join(_lines(*range(100)))
+    b = a.replace('line 5\n', 'line five\n').replace('line 50\n', '')
+    expected = list(difflib.unified_diff(a.splitlines(), b.splitlines(), 'snapshot', 'value', lineterm=''))
+    expected[0:2] = ['--- snapshot', '+++ value']
+    assert unified_diff(a, b).split('\n') == expected
+
+
+def test_unified_diff_missing_newline():
+    assert unified_diff('a\nb\n', 'a\nb').split('\n') == [
+        '--- snapshot',
+        '+++ value',
+        '@@ -1,2 +1,2 @@',
+        ' a',
+        '-b',
+        '+b',
+        '\\ No newline at end of file',
+    ]
+
+
+def test_unified_diff_hunk_limit():
+    a = ''.join(_lines(*range(1000)))
+    b = a.replace('0\n', 'X\n')
+    lines = unified_diff(a, b, max_hunks=2).split('\n')
+    assert len([line for line in lines if line.startswith('@@')]) == 2
+    assert lines[-1] == '... diff truncated, 100 hunks in total (use --snapshot-diff-hunks to show more)'
+
+
+def test_unified_diff_context():
+    a = ''.join(_lines(*range(10)))
+    b = a.replace('line 5\n', 'line X\n')
+    assert unified_diff(a, b, context=1).split('\n') == [
+        '--- snapshot', '+++ value', '@@ -5,3 +5,3 @@', ' line 4', '-line 5', '+line X', ' line 6',
+    ]
+    assert unified_diff(a, b, context=0).split('\n') == [
+        '--- snapshot', '+++ value', '@@ -6 +6 @@', '-line 5', '+line X',
+    ]
+
+
+def test_unified_diff_size_limit():
+    assert unified_diff('a' * 1000, 'b' * 1000, limit=100).split('\n') == [
+        '--- snapshot',
+        '+++ value',
+        '@@ -1 +1 @@',
+        '-' + 'a' * 88 + '...',
+        '... diff truncated, 1 hunks in total (use --snapshot-diff-limit to show more)',
+    ]
+
+
+def test_unified_diff_matches_difflib_ranges():
+    a = ''.join(_lines(1, 2, 3))
+    for b in [''.join(_lines(1, 3)), ''.join(_lines(1, 2, 9, 3)), '']:
+        expected = list(difflib.unified_diff(a.splitlines(), b.splitlines(), lineterm=''))[2:]
+        assert unified_diff(a, b).split('\n')[2:] == expected
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from pytest_snapshot._index import SnapshotIndex
+from tests.utils import assert_pytest_passes
+
+
+@pytest.fixture
+def indexed_dir(tmp_path):
+    tmp_path.joinpath('snapshots/a').mkdir(parents=True)
+    tmp_path.joinpath('snapshots/a/file1.txt').write_text('1')
+    tmp_path.joinpath('snapshots/file2.txt').write_text('2')
+    index = SnapshotIndex()
+    index.add_root(str(tmp_path.joinpath('snapshots')))
+    return tmp_path, index
+
+
+@pytest.mark.parametrize('snapshot_dir, root', [
+    (os.path.join(os.sep, 'x', 'snapshots', 'mod', 'test'), os.path.join(os.sep, 'x', 'snapshots')),
+    (os.path.join(os.sep, 'x', 'snapshots'), os.path.join(os.sep, 'x', 'snapshots')),
+    (os.path.join(os.sep, 'x', 'case_dir'), os.path.join(os.sep, 'x', 'case_dir')),
+])
+def test_root_for(snapshot_dir, root):
+    assert SnapshotIndex.root_for(snapshot_dir) == root
+
+
+def test_index_queries(indexed_dir):
+    tmp_path, index = indexed_dir
+    root = str(tmp_path.joinpath('snapshots'))
+    assert index.is_dir(root)
+    assert index.is_dir(os.path.join(root, 'a'))
+    assert index.is_file(os.path.join(root, 'a', 'file1.txt'))
+    assert not index.is_dir(os.path.join(root, 'a', 'file1.txt'))
+    assert not index.exists(os.path.join(root, 'missing'))
+    assert not index.exists(os.path.join(root, 'missing', 'file.txt'))
+    assert sorted(index.iter_files(root)) == ['a/file1.txt', 'file2.txt']
+
+
+def test_index_is_not_refreshed_from_disk(indexed_dir):
+    tmp_path, index = indexed_dir
+    tmp_path.joinpath('snapshots/file3.txt').write_text('3')
+    assert not index.exists(str(tmp_path.joinpath('snapshots/file3.txt')))
+
+
+def test_index_add_and_remove_file(indexed_dir):
+    tmp_path, index = indexed_dir
+    root = str(tmp_path.joinpath('snapshots'))
+    new_file = os.path.join(root, 'b', 'c', 'file3.txt')
+    index.add_file(new_file)
+    assert index.is_file(new_file)
+    assert index.is_dir(os.path.join(root, 'b', 'c'))
+    assert sorted(index.iter_files(os.path.join(root, 'b'))) == ['c/file3.txt']
+
+    index.remove_file(new_file)
+    assert not index.exists(new_file)
+
+
+def test_index_missing_root(tmp_path):
+    index = SnapshotIndex()
+    root = str(tmp_path.joinpath('snapshots'))
+    index.add_root(root)
+    assert not index.exists(root)
+
+    index.add_file(os.path.join(root, 'a', 'file.txt'))
+    assert index.is_dir(root)
+    assert list(index.iter_files(root)) == ['a/file.txt']
+
+
+def test_index_ignores_temp_files(testdir):
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots/shared'
+            snapshot.assert_match_dir({'a.txt': 'a'}, 'd')
+    """)
+    snapshot_dir = testdir.mkdir('snapshots').mkdir('shared').mkdir('d')
+    snapshot_dir.join('a.txt').write_binary(b'a')
+    # Left behind by a process that was killed while writing a.txt.
+    snapshot_dir.join('.a.txt.0123456789abcdef0123456789abcdef.tmp').write_binary(b'partial')
+    assert_pytest_passes(testdir)
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink') or os.name == 'nt', reason='requires symbolic links')
+def test_index_does_not_follow_directory_symlinks(indexed_dir):
+    tmp_path, _ = indexed_dir
+    root = tmp_path.joinpath('snapshots')
+    # A symbolic link cycle, which would be walked forever if directory links were followed.
+    root.joinpath('a', 'loop').symlink_to(root, target_is_directory=True)
+    index = SnapshotIndex()
+    index.add_root(str(root))
+    assert sorted(index.iter_files(str(root))) == ['a/file1.txt', 'file2.txt']
+
+
+def test_index_shared_between_tests(testdir):
+    testdir.makepyfile("""
+        def test_a(snapshot):
+            snapshot.snapshot_dir = 'snapshots/shared'
+            snapshot.assert_match('a', 'd/a.txt')
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots/shared'
+            snapshot.assert_match_dir({'a.txt': 'a'}, 'd')
+    """)
+    testdir.mkdir('snapshots').mkdir('shared')
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*::test_a ERROR*',
+        '*::test_sth PASSED*',
+    ])
+    assert_pytest_passes(testdir)
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from pytest_snapshot._inputs import InputsCache, digest_inputs
+from tests.utils import assert_outcomes
+
+
+def test_digest_inputs(tmp_path):
+    tmp_path.joinpath('input.txt').write_text('a')
+    tmp_path.joinpath('dir').mkdir()
+    tmp_path.joinpath('dir', 'b.txt').write_text('b')
+    digest = digest_inputs([tmp_path.joinpath('input.txt'), tmp_path.joinpath('dir'), {'x': 1}])
+    assert digest == digest_inputs([tmp_path.joinpath('input.txt'), tmp_path.joinpath('dir'), {'x': 1}])
+    assert digest != digest_inputs([tmp_path.joinpath('input.txt'), tmp_path.joinpath('dir'), {'x': 2}])
+
+    tmp_path.joinpath('dir', 'b.txt').write_text('c')
+    assert digest != digest_inputs([tmp_path.joinpath('input.txt'), tmp_path.joinpath('dir'), {'x': 1}])
+    assert digest_inputs(['ab', 'c']) != digest_inputs(['a', 'bc'])
+    assert digest_inputs([Path('missing')]) != digest_inputs(['missing'])
+
+
+class DictCache:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key, default):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def test_inputs_cache():
+    cache = DictCache()
+    inputs_cache = InputsCache(cache)
+    inputs_cache.record('test_a', 'key', [['snapshots', 'a.txt', 'digest']])
+    inputs_cache.record('test_b', 'key', [])
+    assert cache.values == {}
+    inputs_cache.save()
+
+    inputs_cache = InputsCache(cache)
+    assert inputs_cache.get('test_a') == {'key': 'key', 'snapshots': [['snapshots', 'a.txt', 'digest']]}
+    inputs_cache.discard('test_a')
+    worker_cache = InputsCache()
+    worker_cache.record('test_c', 'key', [])
+    inputs_cache.merge(worker_cache.changes())
+    inputs_cache.save()
+    assert sorted(cache.values['snapshot/inputs']) == ['test_b', 'test_c']
+
+
+def test_cached(testdir):
+    testdir.makepyfile("""
+        from pathlib import Path
+
+        def generate():
+            with open('calls.txt', 'a') as f:
+                f.write('x')
+            return Path('input.txt').read_text()
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots'
+            if snapshot.cached([Path('input.txt'), 'v1']):
+                return
+            snapshot.assert_match(generate(), 'a.txt')
+    """)
+    input_path = testdir.tmpdir.join('input.txt')
+    calls_path = testdir.tmpdir.join('calls.txt')
+    input_path.write('a')
+
+    result = testdir.runpytest('--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    result = testdir.runpytest()
+    assert_outcomes(result, passed=1)
+    assert calls_path.read() == 'xx'
+
+    # Nothing changed since the last green run.
+    result = testdir.runpytest()
+    assert_outcomes(result, passed=1)
+    assert calls_path.read() == 'xx'
+
+    # Changing the snapshot or the inputs generates the value again.
+    testdir.tmpdir.join('snapshots', 'a.txt').write('b')
+    result = testdir.runpytest()
+    assert_outcomes(result, failed=1)
+    assert calls_path.read() == 'xxx'
+    input_path.write('b')
+    result = testdir.runpytest()
+    assert_outcomes(result, passed=1)
+    assert calls_path.read() == 'xxxx'
+    result = testdir.runpytest()
+    assert_outcomes(result, passed=1)
+    assert calls_path.read() == 'xxxx'
+
+    result = testdir.runpytest('--cache-clear')
+    assert_outcomes(result, passed=1)
+    assert calls_path.read() == 'xxxxx'
@@ -1,14 +1,18 @@
+import os
 import sys
+from collections.abc import Mapping
 from unittest import mock
 from unittest.mock import Mock
 
 import pytest
 
 from pytest_snapshot._utils import shorten_path, might_be_valid_filename, simple_version_parse, \
-    _pytest_expected_on_right, flatten_dict, flatten_filesystem_dict
-from tests.utils import assert_pytest_passes, runpytest_with_assert_mode
+    _pytest_expected_on_right, flatten_dict, flatten_filesystem_dict, atomic_write_bytes, fsync_dirs, \
+    fsync_files, iter_filesystem_dict, iter_filesystem_pairs
+from pytest_snapshot.storage import FileSystemStorage
+from tests.utils import assert_outcomes, assert_pytest_passes, runpytest_with_assert_mode
 
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
 
 def test_help_message(testdir):
@@ -48,6 +52,62 @@ def test_default_snapshot_dir_with_parametrize(testdir):
     assert result.ret == 0
 
 
+def test_module_and_session_snapshot(testdir):
+    testdir.makepyfile("""
+        import pytest
+        from pathlib import Path
+
+        calls = []
+
+        @pytest.fixture(scope='module')
+        def artifact(module_snapshot, session_snapshot):
+            calls.append(1)
+            assert module_snapshot.snapshot_dir == \\
+                Path('snapshots/test_module_and_session_snapshot/module-snapshots').absolute()
+            assert session_snapshot.snapshot_dir == Path('snapshots').absolute()
+            module_snapshot.assert_match('expensive artifact', 'artifact.txt')
+            session_snapshot.assert_match('shared', 'shared.txt')
+
+        def test_a(artifact, snapshot):
+            snapshot.assert_match('a', 'a.txt')
+
+        def test_b(artifact):
+            assert calls == [1]
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines(['*::test_a ERROR*', '*::test_b PASSED*'])
+    # Both modification reports are shown at the end of the session and fail it.
+    result.stdout.fnmatch_lines([
+        '*modified shared snapshots*',
+        'Snapshot directory was modified: snapshots?test_module_and_session_snapshot?module-snapshots',
+        '*  Created snapshots:',
+        '*    artifact.txt',
+        'Snapshot directory was modified: snapshots',
+        '*  Created snapshots:',
+        '*    shared.txt',
+    ])
+    assert result.ret == 1
+    module_snapshots = testdir.tmpdir.join('snapshots', 'test_module_and_session_snapshot')
+    assert module_snapshots.join('module-snapshots', 'artifact.txt').read() == 'expensive artifact'
+    assert module_snapshots.join('test_a', 'a.txt').read() == 'a'
+    assert testdir.tmpdir.join('snapshots', 'shared.txt').read() == 'shared'
+
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=2)
+    assert result.ret == 0
+
+
+def test_cached_rejected_by_shared_snapshots(testdir):
+    testdir.makepyfile("""
+        import pytest
+
+        def test_sth(module_snapshot):
+            with pytest.raises(RuntimeError, match='only supported by the snapshot fixture'):
+                module_snapshot.cached(['input'])
+    """)
+    assert_pytest_passes(testdir)
+
+
 def test_shorten_path_in_cwd():
     assert shorten_path(Path('a/b').absolute()) == Path('a/b')
 
@@ -158,6 +218,41 @@ def test_flatten_filesystem_dict_illegal_filename(illegal_filename):
         })
 
 
+class LazyMapping(Mapping):
+    def __init__(self, keys, accessed):
+        self._keys = keys
+        self._accessed = accessed
+
+    def __getitem__(self, key):
+        self._accessed.append(key)
+        return 'value of {}'.format(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def test_iter_filesystem_dict_lazy():
+    accessed = []
+    files = iter_filesystem_dict({'a': LazyMapping(['b', 'c'], accessed), 'd': 'value of d'})
+    assert next(files) == ('a/b', 'value of b')
+    assert accessed == ['b']
+    assert list(files) == [('a/c', 'value of c'), ('d', 'value of d')]
+
+
+def test_iter_filesystem_pairs():
+    pairs = [('a.txt', 1), ('dir/b.txt', 2), (PurePosixPath('dir', 'c.txt'), 3)]
+    assert list(iter_filesystem_pairs(pairs)) == [('a.txt', 1), ('dir/b.txt', 2), ('dir/c.txt', 3)]
+
+
+@pytest.mark.parametrize('illegal_path', ['/a', 'a//b', 'a/../b', '', 1])
+def test_iter_filesystem_pairs_illegal_path(illegal_path):
+    with pytest.raises(ValueError, match='must be a relative path of valid file names'):
+        list(iter_filesystem_pairs([(illegal_path, 'contents')]))
+
+
 @pytest.mark.skipif(sys.version_info < (3, 6), reason="assert_called_once doesn't exist in Python <3.6")
 def test_runpytest_with_assert_mode(request):
     testdir = Mock()
@@ -171,3 +266,71 @@ def test_runpytest_with_assert_mode_without_assert_mode(request):
     testdir = Mock()
     with pytest.raises(ValueError):
         runpytest_with_assert_mode(testdir, request)
+
+
+def test_atomic_write_bytes(tmp_path):
+    path = tmp_path.joinpath('file.txt')
+    path.write_bytes(b'old')
+    atomic_write_bytes(path, b'new')
+    assert path.read_bytes() == b'new'
+    assert os.listdir(str(tmp_path)) == ['file.txt']
+
+
+def test_atomic_write_bytes_failure_keeps_old_file(tmp_path):
+    path = tmp_path.joinpath('file.txt')
+    path.write_bytes(b'old')
+    with mock.patch('os.replace', side_effect=OSError):
+        with pytest.raises(OSError):
+            atomic_write_bytes(path, b'new')
+    assert path.read_bytes() == b'old'
+    assert os.listdir(str(tmp_path)) == ['file.txt']
+
+
+def test_fsync_dirs(tmp_path):
+    with mock.patch('os.fsync') as fsync:
+        fsync_dirs([str(tmp_path), str(tmp_path.joinpath('missing'))])
+    if sys.platform != 'win32':
+        fsync.assert_called_once_with(mock.ANY)
+
+
+def test_fsync_files(tmp_path):
+    tmp_path.joinpath('file.txt').write_bytes(b'data')
+    with mock.patch('os.fsync') as fsync:
+        fsync_files([str(tmp_path.joinpath('file.txt')), str(tmp_path.joinpath('missing.txt'))])
+    fsync.assert_called_once_with(mock.ANY)
+
+
+def test_file_system_storage_fsyncs_written_files(tmp_path):
+    storage = FileSystemStorage()
+    storage.open_dir(str(tmp_path))
+    storage.write(str(tmp_path.joinpath('a.txt')), b'a')
+    storage.write_stream(str(tmp_path.joinpath('b.txt')), [b'b'])
+    storage.write(str(tmp_path.joinpath('c.txt')), b'c')
+    storage.delete(str(tmp_path.joinpath('c.txt')))
+    with mock.patch('pytest_snapshot.storage.fsync_files') as fsync_files_mock, \
+            mock.patch('pytest_snapshot.storage.fsync_dirs') as fsync_dirs_mock:
+        storage.commit()
+    fsync_files_mock.assert_called_once_with([str(tmp_path.joinpath('a.txt')), str(tmp_path.joinpath('b.txt'))])
+    fsync_dirs_mock.assert_called_once_with([str(tmp_path)])
+    assert not storage.dirty_files
+
+
+def test_snapshot_update_records_modified_dirs(testdir):
+    testdir.makeconftest("""
+        import os
+        import pytest
+
+        @pytest.hookimpl(tryfirst=True)
+        def pytest_sessionfinish(session):
+            dirty_dirs = session.config._snapshot_session.storage.dirty_dirs
+            print('dirty dirs:', sorted(os.path.relpath(d).replace(os.sep, '/') for d in dirty_dirs))
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match_dir({'a.txt': 'a', 'b.txt': 'b', 'sub': {'c.txt': 'c'}}, 'dir')
+    """)
+    result = testdir.runpytest('-s', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        "*dirty dirs: ?'snapshots/dir', 'snapshots/dir/sub'?",
+    ])
@@ -0,0 +1,214 @@
+import os
+import threading
+
+import pytest
+
+from pytest_snapshot._pack import SnapshotPack, SnapshotPacks, pack_snapshots, unpack_snapshots
+from pytest_snapshot.convert import main as convert_main
+from tests.utils import assert_outcomes
+
+
+def test_pack_roundtrip(tmpdir):
+    path = str(tmpdir.join('test_module.snappack'))
+    pack = SnapshotPack(path)
+    assert pack.names() == []
+    pack.write('test_a/a.txt', b'aaa')
+    pack.write('test_b/empty.txt', b'')
+    assert pack.flush()
+    assert not pack.flush()
+
+    pack = SnapshotPack(path)
+    assert pack.names() == ['test_a/a.txt', 'test_b/empty.txt']
+    assert pack.read('test_a/a.txt') == b'aaa'
+    assert pack.read('test_b/empty.txt') == b''
+    assert pack.size('test_a/a.txt') == 3
+    assert pack.compare('test_a/a.txt', b'aaa') is None
+    assert pack.compare('test_a/a.txt', b'aab').startswith('bytes differ at offset 2')
+    pack.close()
+
+
+def test_pack_flush_keeps_changes_of_other_writers(tmpdir):
+    path = str(tmpdir.join('test_module.snappack'))
+    first = SnapshotPack(path)
+    second = SnapshotPack(path)
+    assert first.names() == second.names() == []
+    first.write('a', b'1')
+    second.write('b', b'2')
+    first.flush()
+    second.flush()
+    assert SnapshotPack(path).names() == ['a', 'b']
+
+
+def test_pack_concurrent_flushes(tmpdir):
+    path = str(tmpdir.join('test_module.snappack'))
+    writers = 8
+    barrier = threading.Barrier(writers)
+
+    def write(i):
+        pack = SnapshotPack(path)
+        pack.write('test_{}/a.txt'.format(i), str(i).encode())
+        barrier.wait()
+        pack.flush()
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SnapshotPack(path).names() == sorted('test_{}/a.txt'.format(i) for i in range(writers))
+
+
+def test_pack_flush_removes_empty_pack(tmpdir):
+    path = str(tmpdir.join('test_module.snappack'))
+    pack = SnapshotPack(path)
+    pack.write('a', b'1')
+    pack.flush()
+    pack.delete('a')
+    assert pack.names() == []
+    assert pack.flush()
+    assert not os.path.exists(path)
+
+
+def test_pack_invalid_file(tmpdir):
+    path = tmpdir.join('test_module.snappack')
+    path.write_binary(b'not a pack')
+    with pytest.raises(ValueError, match='is not a snapshot pack'):
+        SnapshotPack(str(path)).names()
+
+
+def test_packs_index(tmpdir):
+    root = str(tmpdir.join('snapshots'))
+    packs = SnapshotPacks()
+    packs.add_root(root)
+    packs.write(os.path.join(root, 'top.txt'), b'top')
+    packs.write(os.path.join(root, 'test_module', 'test_sth', 'a.txt'), b'a')
+    assert packs.flush() == [root]
+    assert sorted(os.listdir(root)) == ['.snappack', 'test_module.snappack']
+    packs.close()
+
+    packs = SnapshotPacks()
+    packs.add_root(root)
+    assert packs.is_file(os.path.join(root, 'top.txt'))
+    assert packs.is_dir(os.path.join(root, 'test_module', 'test_sth'))
+    assert not packs.exists(os.path.join(root, 'test_module.snappack'))
+    assert sorted(packs.iter_files(root)) == ['test_module/test_sth/a.txt', 'top.txt']
+    assert packs.read(os.path.join(root, 'test_module', 'test_sth', 'a.txt')) == b'a'
+    packs.close()
+
+
+def test_packs_require_snapshots_dir(tmpdir):
+    with pytest.raises(ValueError, match='packed snapshots must be stored below a directory named "snapshots"'):
+        SnapshotPacks().add_root(str(tmpdir.join('other')))
+
+
+def test_pack_and_unpack_snapshots(tmpdir):
+    root = tmpdir.join('snapshots')
+    root.join('top.txt').write_binary(b'top', ensure=True)
+    root.join('test_module', 'test_sth', 'a.txt').write_binary(b'a', ensure=True)
+    root.join('test_module', 'test_other', 'b.bin').write_binary(b'\x00b', ensure=True)
+
+    assert pack_snapshots(str(root)) == 3
+    assert sorted(os.listdir(str(root))) == ['.snappack', 'test_module.snappack']
+
+    assert unpack_snapshots(str(root)) == 3
+    assert sorted(os.listdir(str(root))) == ['test_module', 'top.txt']
+    assert root.join('top.txt').read_binary() == b'top'
+    assert root.join('test_module', 'test_sth', 'a.txt').read_binary() == b'a'
+    assert root.join('test_module', 'test_other', 'b.bin').read_binary() == b'\x00b'
+
+
+def test_convert_finds_snapshots_dirs(tmpdir, capsys):
+    tmpdir.join('tests', 'snapshots', 'test_module', 'test_sth', 'a.txt').write_binary(b'a', ensure=True)
+    assert convert_main(['pack', str(tmpdir)]) == 0
+    assert tmpdir.join('tests', 'snapshots', 'test_module.snappack').check(file=1)
+    assert 'packed 1 snapshots in ' in capsys.readouterr().out
+
+    assert convert_main(['unpack', str(tmpdir.join('tests', 'snapshots'))]) == 0
+    assert tmpdir.join('tests', 'snapshots', 'test_module', 'test_sth', 'a.txt').read_binary() == b'a'
+    assert 'unpacked 1 snapshots in ' in capsys.readouterr().out
+
+
+def test_packed_storage(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_storage = packed
+    """)
+    testdir.makepyfile(test_module="""
+        def test_sth(snapshot):
+            snapshot.assert_match('a\\n', 'a.txt')
+            snapshot.assert_match(b'\\x00' * (1 << 20), 'large.bin')
+            snapshot.assert_match_dir({'b.txt': 'b', 'dir': {'c.txt': b'c'}}, 'dir')
+            snapshot.assert_match(iter(['s', 'tream']), 'stream.txt')
+    """)
+    result = testdir.runpytest('--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    snapshots_dir = testdir.tmpdir.join('snapshots')
+    assert sorted(os.listdir(str(snapshots_dir))) == ['test_module.snappack']
+
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=1)
+
+    packs = SnapshotPacks()
+    packs.add_root(str(snapshots_dir))
+    assert sorted(packs.iter_files(str(snapshots_dir))) == [
+        'test_module/test_sth/a.txt',
+        'test_module/test_sth/dir/b.txt',
+        'test_module/test_sth/dir/dir/c.txt',
+        'test_module/test_sth/large.bin',
+        'test_module/test_sth/stream.txt',
+    ]
+    assert packs.read(str(snapshots_dir.join('test_module', 'test_sth', 'a.txt'))) == b'a' + os.linesep.encode()
+    packs.close()
+
+
+def test_packed_storage_failure_and_deletion(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_storage = packed
+    """)
+    testdir.makepyfile(test_module="""
+        import os
+
+        def test_sth(snapshot):
+            snapshot.assert_match_dir({'a.txt': 'a', 'b.txt': 'b'} if os.environ.get('BOTH') else {'a.txt': 'a'},
+                                      'dir')
+            snapshot.assert_match('x', 'x.txt')
+    """)
+    testdir.monkeypatch.setenv('BOTH', '1')
+    testdir.runpytest('--snapshot-update')
+
+    testdir.monkeypatch.delenv('BOTH')
+    testdir.makepyfile(test_module="""
+        def test_sth(snapshot):
+            snapshot.assert_match('y', 'x.txt')
+    """)
+    result = testdir.runpytest()
+    assert_outcomes(result, failed=1)
+    result.stdout.fnmatch_lines([
+        "E* AssertionError: value does not match the expected value in snapshot snapshots?test_module?test_sth?x.txt",
+    ])
+
+    testdir.makepyfile(test_module="""
+        def test_sth(snapshot):
+            snapshot.assert_match_dir({'a.txt': 'a'}, 'dir')
+            snapshot.assert_match('x', 'x.txt')
+    """)
+    result = testdir.runpytest('--snapshot-update', '--allow-snapshot-deletion')
+    result.stdout.fnmatch_lines(['  Deleted snapshots:', '    dir?b.txt'])
+    result = testdir.runpytest()
+    assert_outcomes(result, passed=1)
+
+
+def test_invalid_snapshot_storage(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_storage = other
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            pass
+    """)
+    result = testdir.runpytest()
+    result.stderr.fnmatch_lines([
+        '*snapshot_storage must be "files", "packed", "memory" or a storage added by a plugin, got *other*',
+    ])
@@ -0,0 +1,142 @@
+import collections
+import os
+
+import pytest
+
+from pytest_snapshot.serializers import JsonSerializer, ReprSerializer, SerializerRegistry, default_registry
+from tests.utils import assert_outcomes
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __repr__(self):
+        return 'Point({}, {})'.format(self.x, self.y)
+
+
+def test_registry_dispatch():
+    registry = SerializerRegistry()
+    json_serializer = JsonSerializer()
+    repr_serializer = ReprSerializer()
+    registry.register(dict, json_serializer)
+    assert registry.get(dict) is json_serializer
+    assert registry.get(collections.OrderedDict) is json_serializer
+    assert registry.get(Point) is None
+
+    # Registering a serializer invalidates cached lookups.
+    registry.register('{}.Point'.format(__name__), repr_serializer)
+    assert registry.get(Point) is repr_serializer
+    registry.register_predicate(lambda cls: cls.__name__ == 'Other', json_serializer)
+    assert registry.get(type('Other', (), {})) is json_serializer
+
+
+def test_default_registry():
+    registry = default_registry()
+    for cls in (dict, list, tuple, int, float, bool, type(None)):
+        assert isinstance(registry.get(cls), JsonSerializer)
+    assert registry.get(set) is None
+    assert registry.get(str) is None
+
+
+def test_json_serializer():
+    serializer = JsonSerializer()
+    assert serializer.encode({'b': (1, 2), 'a': 'é'}) == '{\n  "a": "é",\n  "b": [\n    1,\n    2\n  ]\n}\n'.encode()
+    serializer.compare({'b': (1, 2)}, {'b': [1, 2]})
+    with pytest.raises(AssertionError) as excinfo:
+        serializer.compare({'a': 1, 'b': [1, 2], 'c': 3}, {'a': 1.0, 'b': [1, 3, 4], 'd': 3})
+    assert str(excinfo.value) == '\n'.join([
+        'values differ:',
+        "  value['a']: 1 != 1.0",
+        "  value['b']: length 2 != 3",
+        "  value['b'][1]: 2 != 3",
+        "  value['c']: unexpected key",
+        "  value['d']: missing key",
+    ])
+
+
+@pytest.mark.parametrize('value', [float('nan'), {'a': [1.0, float('inf')]}])
+def test_json_serializer_rejects_non_finite_floats(value):
+    with pytest.raises(TypeError, match="value can't be stored as JSON: Out of range float values"):
+        JsonSerializer().encode(value)
+
+
+def test_json_serializer_dataclass():
+    dataclasses = pytest.importorskip('dataclasses')
+
+    # Variable annotations in a class body are a syntax error on Python 3.5.
+    Item = dataclasses.make_dataclass('Item', [('name', str), ('count', int)])
+    assert default_registry().get(Item).encode(Item('a', 1)) == b'{\n  "count": 1,\n  "name": "a"\n}\n'
+
+
+def test_npy_serializer():
+    numpy = pytest.importorskip('numpy')
+    serializer = default_registry().get(numpy.ndarray)
+    value = numpy.arange(6, dtype=numpy.int32).reshape(2, 3)
+    assert serializer.encode(value) == serializer.encode(value.copy())
+    serializer.compare(value, serializer.decode(serializer.encode(value)))
+    with pytest.raises(AssertionError, match='Mismatched elements: 1 / 6'):
+        serializer.compare(value, value + (value == 5))
+    with pytest.raises(AssertionError, match='dtype int32 != int64'):
+        serializer.compare(value, value.astype(numpy.int64))
+
+
+def test_assert_match_json(testdir):
+    case_dir = testdir.mkdir('case_dir')
+    testdir.makepyfile(r"""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match({'name': 'a', 'values': [1, 2, 3]}, 'value.json')
+            snapshot.assert_match(('a', 'b'), 'tuple.json')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    assert case_dir.join('value.json').read_binary() == (
+        b'{\n  "name": "a",\n  "values": [\n    1,\n    2,\n    3\n  ]\n}\n')
+    assert case_dir.join('tuple.json').read_binary() == b'[\n  "a",\n  "b"\n]\n'
+
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=1)
+
+    case_dir.join('value.json').write_binary(b'{"name": "b", "values": [1, 2, 3]}')
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, failed=1)
+    result.stdout.fnmatch_lines([
+        'E* AssertionError: value does not match the expected value in snapshot case_dir?value.json',
+        'E*   values differ:',
+        "E*     value?'name'?: 'a' != 'b'",
+    ])
+
+
+def test_assert_match_registered_serializer(testdir):
+    case_dir = testdir.mkdir('case_dir')
+    testdir.makeconftest("""
+        from pytest_snapshot.serializers import ReprSerializer, register
+
+        class Point:
+            def __init__(self, x, y):
+                self.x = x
+                self.y = y
+
+            def __repr__(self):
+                return 'Point({}, {})'.format(self.x, self.y)
+
+        register(Point, ReprSerializer())
+    """)
+    testdir.makepyfile(r"""
+        from conftest import Point
+
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'case_dir'
+            snapshot.assert_match(Point(1, 2), 'point.txt')
+    """)
+    case_dir.join('point.txt').write_binary('Point(1, 3){}'.format(os.linesep).encode())
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, failed=1)
+    result.stdout.fnmatch_lines(['E*   Point(1, 2) != Point(1, 3)'])
+
+    result = testdir.runpytest('-v', '--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=1)
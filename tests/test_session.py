@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+from pytest_snapshot._session import SnapshotSession, SnapshotSummary
+from pytest_snapshot._manifest import SnapshotManifest
+from pytest_snapshot.plugin import pytest_sessionfinish, pytest_testnodedown
+
+
+def test_terminal_summary(testdir):
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match('a', 'a.txt')
+            snapshot.assert_match_dir({'b.txt': 'b', 'c.txt': 'c'}, 'dir')
+    """)
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines([
+        '*= snapshot summary =*',
+        'snapshots: 3 created, 0 updated, 0 deleted, 0 should be deleted (*s in snapshot assertions)',
+        '  created: snapshots?a.txt',
+        '  created: snapshots?dir?b.txt',
+        '  created: snapshots?dir?c.txt',
+    ])
+
+    result = testdir.runpytest('-v')
+    assert 'snapshot summary' not in result.stdout.str()
+
+
+def test_summary_merge():
+    summary = SnapshotSummary()
+    summary.created.append('a')
+    summary.duration = 1.0
+    merged = SnapshotSummary()
+    merged.updated.append('b')
+    merged.merge(summary.to_dict())
+    assert merged.to_dict() == {'created': ['a'], 'updated': ['b'], 'deleted': [], 'to_delete': [],
+                                'duration': 1.0}
+    assert merged
+    assert not SnapshotSummary()
+
+
+def test_testnodedown_merges_worker_output():
+    session = SnapshotSession()
+    worker_summary = SnapshotSummary()
+    worker_summary.to_delete.append('x')
+    node = SimpleNamespace(config=SimpleNamespace(_snapshot_session=session),
+                           workeroutput={'snapshot_summary': worker_summary.to_dict()})
+    pytest_testnodedown(node, None)
+    pytest_testnodedown(node, None)
+    assert session.summary.to_delete == ['x', 'x']
+
+
+def test_testnodedown_without_worker_output():
+    session = SnapshotSession()
+    pytest_testnodedown(SimpleNamespace(config=SimpleNamespace(_snapshot_session=session)), None)
+    assert not session.summary
+
+
+def test_sessionfinish_on_worker_sends_results():
+    session = SnapshotSession(manifest=SnapshotManifest({'a': [1, 2, 'abc']}))
+    session.summary.created.append('a')
+    config = SimpleNamespace(_snapshot_session=session, workeroutput={})
+    pytest_sessionfinish(SimpleNamespace(config=config))
+    assert config.workeroutput['snapshot_summary']['created'] == ['a']
+    assert config.workeroutput['snapshot_manifest'] == {'a': [1, 2, 'abc']}
+
+    controller_session = SnapshotSession(manifest=SnapshotManifest())
+    node = SimpleNamespace(config=SimpleNamespace(_snapshot_session=controller_session),
+                           workeroutput=config.workeroutput)
+    pytest_testnodedown(node, None)
+    assert controller_session.summary.created == ['a']
+    assert controller_session.manifest.to_dict() == {'a': [1, 2, 'abc']}
+    assert controller_session.manifest.modified
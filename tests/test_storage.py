@@ -0,0 +1,264 @@
+import hashlib
+import os
+
+import pytest
+
+from pytest_snapshot._session import SnapshotSession
+from pytest_snapshot.plugin import Snapshot
+from pytest_snapshot._compression import get_codec
+from pytest_snapshot.storage import BLOB_REFERENCE_PREFIX, BLOBS_DIR_NAME, CachingStorage, CompressedStorage, \
+    DeduplicatingStorage, FileSystemStorage, MemoryStorage
+from tests.utils import assert_outcomes, assert_pytest_passes
+
+
+def test_memory_storage():
+    root = os.path.abspath('snapshots')
+    storage = MemoryStorage()
+    storage.write(os.path.join(root, 'dir', 'a.txt'), b'a')
+    storage.write(os.path.join(root, 'dir', 'sub', 'b.txt'), b'b')
+    assert storage.is_file(os.path.join(root, 'dir', 'a.txt'))
+    assert storage.is_dir(os.path.join(root, 'dir', 'sub'))
+    assert not storage.exists(os.path.join(root, 'di'))
+    assert sorted(storage.list_dir(os.path.join(root, 'dir'))) == ['a.txt', 'sub/b.txt']
+    assert storage.size(os.path.join(root, 'dir', 'a.txt')) == 1
+    assert storage.compare(os.path.join(root, 'dir', 'a.txt'), b'b').startswith('bytes differ at offset 0')
+    storage.delete(os.path.join(root, 'dir', 'a.txt'))
+    assert sorted(storage.list_dir(os.path.join(root, 'dir'))) == ['sub/b.txt']
+
+
+def test_snapshot_with_memory_storage(tmp_path):
+    session = SnapshotSession(MemoryStorage())
+    with pytest.raises(pytest.fail.Exception, match='Created snapshots:'):
+        with Snapshot(True, False, tmp_path, session) as snapshot:
+            snapshot.assert_match('a', 'a.txt')
+            snapshot.assert_match_dir({'b.bin': b'b', 'c.txt': iter(['c'])}, 'dir')
+    assert os.listdir(str(tmp_path)) == []
+    assert session.storage.files == {
+        str(tmp_path.joinpath('a.txt')): b'a',
+        str(tmp_path.joinpath('dir', 'b.bin')): b'b',
+        str(tmp_path.joinpath('dir', 'c.txt')): b'c',
+    }
+
+    with Snapshot(False, False, tmp_path, session) as snapshot:
+        snapshot.assert_match('a', 'a.txt')
+        snapshot.assert_match_dir({'b.bin': b'b', 'c.txt': 'c'}, 'dir')
+        with pytest.raises(AssertionError, match="snapshot .*b.txt doesn't exist"):
+            snapshot.assert_match('b', 'b.txt')
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def read(self, path):
+        self.reads += 1
+        return super().read(path)
+
+
+def test_caching_storage():
+    counting = CountingStorage()
+    storage = CachingStorage(counting, max_size=3)
+    storage.write('a', b'aa')
+    storage.write('b', b'bb')
+    assert storage.read('a') == b'aa'
+    assert storage.read('a') == b'aa'
+    assert counting.reads == 1
+
+    # Reading b evicts a, since both don't fit in the cache.
+    assert storage.read('b') == b'bb'
+    assert storage.read('a') == b'aa'
+    assert counting.reads == 3
+
+    storage.write('a', b'x')
+    assert storage.read('a') == b'x'
+    assert storage.compare('a', b'x') is None
+    assert counting.reads == 4
+
+
+def test_local_path(tmp_path):
+    storage = FileSystemStorage()
+    storage.open_dir(str(tmp_path))
+    compressed = CompressedStorage(storage, get_codec('gzip'), threshold=10)
+    compressed.write(str(tmp_path.joinpath('small.txt')), b'small')
+    compressed.write(str(tmp_path.joinpath('large.txt')), b'large' * 10)
+    assert compressed.local_path(str(tmp_path.joinpath('small.txt'))) == str(tmp_path.joinpath('small.txt'))
+    assert compressed.local_path(str(tmp_path.joinpath('large.txt'))) is None
+    assert storage.local_path(str(tmp_path.joinpath('missing.txt'))) is None
+    assert MemoryStorage().local_path(str(tmp_path.joinpath('small.txt'))) is None
+
+
+def test_write_file(tmp_path):
+    source = tmp_path.joinpath('source.txt')
+    source.write_bytes(b'source' * 10)
+    storage = FileSystemStorage()
+    storage.open_dir(str(tmp_path))
+    storage.write_file(str(tmp_path.joinpath('dir', 'copy.txt')), str(source))
+    assert storage.read(str(tmp_path.joinpath('dir', 'copy.txt'))) == b'source' * 10
+
+    memory = MemoryStorage()
+    compressed = CompressedStorage(memory, get_codec('gzip'), threshold=10)
+    compressed.write_file(str(tmp_path.joinpath('copy.txt')), str(source))
+    assert memory.is_file(str(tmp_path.joinpath('copy.txt.compressed.gz')))
+    assert compressed.read(str(tmp_path.joinpath('copy.txt'))) == b'source' * 10
+
+
+def test_memory_storage_option(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_storage = memory
+        snapshot_storage_cache = true
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.assert_match('a', 'a.txt')
+    """)
+    result = testdir.runpytest('--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+    assert not testdir.tmpdir.join('snapshots').check()
+
+
+def test_storage_hook(testdir):
+    testdir.makeconftest("""
+        import os
+        from pytest_snapshot.storage import MemoryStorage
+
+        class PrefilledStorage(MemoryStorage):
+            def open_dir(self, snapshot_dir):
+                self.files.setdefault(os.path.join(snapshot_dir, 'a.txt'), b'a')
+
+        def pytest_snapshot_storage(config, name):
+            if name == 'prefilled':
+                return PrefilledStorage()
+    """)
+    testdir.makeini("""
+        [pytest]
+        snapshot_storage = prefilled
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.assert_match('a', 'a.txt')
+    """)
+    result = testdir.runpytest()
+    assert_outcomes(result, passed=1)
+
+
+class SizedCountingStorage(CountingStorage):
+    def size(self, path):
+        return len(self.files[path])
+
+
+def test_deduplicating_storage():
+    root = os.path.abspath('snapshots')
+    counting = SizedCountingStorage()
+    counting.files[os.path.join(root, 'plain.txt')] = b'plain'
+    storage = DeduplicatingStorage(counting)
+    storage.open_dir(os.path.join(root, 'test_module', 'test_a'))
+    for case in ('1', '2'):
+        storage.write(os.path.join(root, 'test_module', 'test_a', case, 'value.txt'), b'shared value')
+    storage.write(os.path.join(root, 'other.txt'), b'other value')
+
+    reference = BLOB_REFERENCE_PREFIX + hashlib.sha256(b'shared value').hexdigest().encode() + b'\n'
+    assert counting.files[os.path.join(root, 'test_module', 'test_a', '1', 'value.txt')] == reference
+    assert len([p for p in counting.files if BLOBS_DIR_NAME in p]) == 2
+    assert sorted(storage.list_dir(root)) == ['other.txt', 'plain.txt', 'test_module/test_a/1/value.txt',
+                                              'test_module/test_a/2/value.txt']
+
+    # A fresh storage reads every reference and blob once and compares values by hash.
+    storage = DeduplicatingStorage(counting)
+    storage.open_dir(root)
+    counting.reads = 0
+    for case in ('1', '2'):
+        path = os.path.join(root, 'test_module', 'test_a', case, 'value.txt')
+        assert storage.size(path) == len(b'shared value')
+        assert storage.read(path) == b'shared value'
+        assert storage.compare(path, b'shared value') is None
+        assert storage.known_to_contain(path, [b'shared ', b'value'])
+        assert storage.compare(path, b'shared valuE').startswith('bytes differ at offset 11')
+    assert counting.reads == 3
+    assert storage.read(os.path.join(root, 'plain.txt')) == b'plain'
+
+
+def test_dedup_option(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_dedup = true
+    """)
+    testdir.makepyfile("""
+        import pytest
+
+        @pytest.mark.parametrize('case', range(5))
+        def test_sth(snapshot, case):
+            snapshot.assert_match('same for every case' if case else 'different', 'value.txt')
+    """)
+    result = testdir.runpytest('--snapshot-update')
+    assert_outcomes(result, passed=5, errors=5)
+    assert len(testdir.tmpdir.join('snapshots', '.blobs').listdir()) == 2
+    result = testdir.runpytest('-v', '--snapshot-detect-unused')
+    assert_outcomes(result, passed=5)
+
+    testdir.tmpdir.join('snapshots', 'test_dedup_option', 'test_sth', '0', 'value.txt').write_binary(b'changed')
+    result = testdir.runpytest('-v')
+    assert_outcomes(result, passed=4, failed=1)
+
+
+def test_dedup_missing_blob(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_dedup = true
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.assert_match('value', 'value.txt')
+    """)
+    testdir.runpytest('--snapshot-update')
+    blobs_dir = testdir.tmpdir.join('snapshots', '.blobs')
+    blobs_dir.remove()
+
+    result = testdir.runpytest('-v')
+    result.stdout.fnmatch_lines(['*::test_sth FAILED*', 'E* AssertionError: value does not match*'])
+    result = testdir.runpytest('-v', '--snapshot-update')
+    result.stdout.fnmatch_lines(['*::test_sth ERROR*', '  Updated snapshots:', '    value.txt'])
+    assert len(blobs_dir.listdir()) == 1
+    assert_pytest_passes(testdir)
+
+
+def test_dedup_deletes_unreferenced_blobs(testdir):
+    testdir.makeini("""
+        [pytest]
+        snapshot_dedup = true
+    """)
+    testdir.makepyfile("""
+        import os
+        import pytest
+
+        @pytest.mark.parametrize('case', range(2))
+        def test_sth(snapshot, case):
+            value = os.environ.get('VALUE', 'old') if case == 0 else 'old'
+            snapshot.assert_match(value, 'value.txt')
+    """)
+    testdir.runpytest('--snapshot-update')
+    blobs_dir = testdir.tmpdir.join('snapshots', '.blobs')
+
+    def blobs():
+        return sorted(path.basename for path in blobs_dir.visit() if path.isfile())
+
+    def digest(value):
+        return hashlib.sha256(value).hexdigest()
+
+    assert blobs() == [digest(b'old')]
+    # The old blob is still referenced by case 1.
+    testdir.monkeypatch.setenv('VALUE', 'new')
+    testdir.runpytest('--snapshot-update')
+    assert blobs() == sorted([digest(b'old'), digest(b'new')])
+
+    testdir.monkeypatch.setenv('VALUE', 'newer')
+    testdir.runpytest('--snapshot-update', 'test_dedup_deletes_unreferenced_blobs.py::test_sth[0]')
+    assert blobs() == sorted([digest(b'old'), digest(b'newer')])
+    assert_outcomes(testdir.runpytest(), passed=2)
+
+
+def test_dedup_outside_snapshots_dir(tmp_path):
+    storage = DeduplicatingStorage(MemoryStorage())
+    with pytest.raises(ValueError, match='must be inside a directory named "snapshots"'):
+        storage.write(str(tmp_path.joinpath('case_dir', 'value.txt')), b'value')
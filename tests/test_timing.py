@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+from pytest_snapshot._session import SnapshotSession
+from pytest_snapshot._timing import PHASES, SnapshotDurations, SnapshotTiming
+from pytest_snapshot.plugin import pytest_testnodedown
+from tests.utils import assert_outcomes
+
+
+def test_timing_phases():
+    timing = SnapshotTiming('assert_match', 'test.py::test_sth')
+    with timing.phase('read'):
+        timing.bytes_read += 3
+    timing.stop()
+    data = timing.to_dict()
+    assert data['kind'] == 'assert_match'
+    assert data['nodeid'] == 'test.py::test_sth'
+    assert data['bytes_read'] == 3
+    assert set(data['phases']) == set(PHASES)
+    assert data['phases']['read'] > 0
+    assert data['duration'] >= data['phases']['read']
+
+
+def test_timing_add():
+    timing = SnapshotTiming('assert_match_dir')
+    file_timing = SnapshotTiming('assert_match_dir')
+    file_timing.phases['write'] = 1.5
+    file_timing.bytes_written = 10
+    timing.add(file_timing)
+    timing.add(file_timing)
+    assert timing.phases['write'] == 3.0
+    assert timing.bytes_written == 20
+
+
+def _assertion(duration, snapshot):
+    timing = SnapshotTiming('assert_match', 'test.py::test_sth')
+    timing.snapshot = snapshot
+    timing.phases['compare'] = duration
+    timing.bytes_read = 2048
+    timing.duration = duration
+    return timing
+
+
+def test_durations_report_and_terminal_lines():
+    durations = SnapshotDurations()
+    durations.add(_assertion(1.0, 'a.txt'))
+    durations.merge([_assertion(2.0, 'b.txt').to_dict()])
+
+    report = durations.report()
+    assert [a['snapshot'] for a in report['assertions']] == ['a.txt', 'b.txt']
+    assert report['totals']['duration'] == 3.0
+    assert report['totals']['phases']['compare'] == 3.0
+    assert report['totals']['bytes_read'] == 4096
+
+    lines = durations.terminal_lines(1)
+    assert lines[0] == '2.000s assert_match test.py::test_sth b.txt (compare 2.000s)'
+    assert lines[1].startswith('totals: 3.000s in 2 assertions (path 0.000s, read 0.000s, codec 0.000s, ')
+    assert lines[1].endswith(', 4.0 KiB read, 0 B written')
+    assert len(durations.terminal_lines(0)) == 3
+
+
+def test_testnodedown_merges_worker_durations():
+    session = SnapshotSession(durations=SnapshotDurations())
+    node = SimpleNamespace(config=SimpleNamespace(_snapshot_session=session),
+                           workeroutput={'snapshot_durations': [_assertion(1.0, 'a.txt').to_dict()]})
+    pytest_testnodedown(node, None)
+    assert len(session.durations.assertions) == 1
+
+
+def test_snapshot_durations_option(testdir):
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match('a', 'a.txt')
+            snapshot.assert_match_dir({'b.txt': 'b', 'c.txt': 'c'}, 'dir')
+    """)
+    testdir.runpytest('--snapshot-update')
+
+    result = testdir.runpytest('--snapshot-durations=1')
+    assert_outcomes(result, passed=1)
+    result.stdout.fnmatch_lines([
+        '*= slowest 1 snapshot assertions =*',
+        '*s assert_match* test_snapshot_durations_option.py::test_sth *',
+        'totals: *s in 2 assertions (path *s, read *s, codec *s, compare *s, diff *s, write *s), 3 B read, 0 B written',
+    ])
+
+    result = testdir.runpytest()
+    assert 'snapshot assertions' not in result.stdout.str()
+
+
+def test_snapshot_durations_hook(testdir):
+    testdir.makeconftest("""
+        import json
+
+        def pytest_snapshot_durations(config, report):
+            with open('report.json', 'w') as f:
+                json.dump(report, f)
+    """)
+    testdir.makepyfile("""
+        def test_sth(snapshot):
+            snapshot.snapshot_dir = 'snapshots'
+            snapshot.assert_match('abc', 'a.txt')
+    """)
+    result = testdir.runpytest('--snapshot-update')
+    assert_outcomes(result, passed=1, errors=1)
+
+    report = testdir.tmpdir.join('report.json').read()
+    assert '"kind": "assert_match"' in report
+    assert '"bytes_written": 3' in report
+    assert 'slowest' not in result.stdout.str()
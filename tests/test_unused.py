@@ -0,0 +1,187 @@
+import os
+
+from pytest_snapshot._unused import SnapshotUsage
+from pytest_snapshot.storage import MemoryStorage
+from tests.utils import assert_outcomes
+
+
+def test_snapshot_usage_merge():
+    root = os.path.abspath('snapshots')
+    module_dir = os.path.join(root, 'test_module')
+    storage = MemoryStorage({
+        os.path.join(module_dir, 'test_a', 'a.txt'): b'a',
+        os.path.join(module_dir, 'test_b', 'b.txt'): b'b',
+        os.path.join(module_dir, 'test_c', 'c.txt'): b'c',
+        os.path.join(root, 'other.txt'): b'other',
+    })
+    usage = SnapshotUsage()
+    for worker_passed in ['test_a', 'test_b']:
+        worker_usage = SnapshotUsage()
+        worker_usage.add_root(root, True)
+        for name in ['test_a', 'test_b']:
+            worker_usage.add_collected([os.path.join(module_dir, name), module_dir, root])
+        worker_usage.add_passed([os.path.join(module_dir, worker_passed), module_dir, root])
+        usage.merge(worker_usage.to_dict())
+    usage.used.add(os.path.join(module_dir, 'test_a', 'a.txt'))
+
+    assert usage.find_unused(storage) == [
+        os.path.join(root, 'other.txt'),
+        os.path.join(module_dir, 'test_b', 'b.txt'),
+        os.path.join(module_dir, 'test_c', 'c.txt'),
+    ]
+
+    usage.incomplete.add(root)
+    assert usage.find_unused(storage) == [
+        os.path.join(module_dir, 'test_b', 'b.txt'),
+        os.path.join(module_dir, 'test_c', 'c.txt'),
+    ]
+
+
+def test_detect_unused(testdir):
+    testdir.makepyfile(test_module="""
+        import os
+        import pytest
+
+        def test_a(snapshot):
+            snapshot.assert_match('a', 'a.txt')
+
+        @pytest.mark.parametrize('param', [1, 2])
+        def test_b(snapshot, param):
+            snapshot.assert_match(str(param), 'b.txt')
+            assert param == 1 or not os.environ.get('FAIL')
+    """)
+    snapshots_dir = testdir.tmpdir.join('snapshots', 'test_module')
+    snapshots_dir.join('test_a', 'a.txt').write('a', ensure=True)
+    snapshots_dir.join('test_a', 'old.txt').write('old', ensure=True)
+    snapshots_dir.join('test_b', '1', 'b.txt').write('1', ensure=True)
+    snapshots_dir.join('test_b', '1', 'old.txt').write('old', ensure=True)
+    snapshots_dir.join('test_b', '2', 'b.txt').write('2', ensure=True)
+    snapshots_dir.join('test_b', '2', 'old.txt').write('old', ensure=True)
+    snapshots_dir.join('test_removed', 'a.txt').write('a', ensure=True)
+    testdir.tmpdir.join('snapshots', 'test_removed_module', 'test_a', 'a.txt').write('a', ensure=True)
+
+    # Snapshots that aren't owned by a single test are only reported if all tests of the module passed.
+    testdir.monkeypatch.setenv('FAIL', '1')
+    result = testdir.runpytest('-v', '--snapshot-detect-unused')
+    assert_outcomes(result, passed=2, failed=1)
+    result.stdout.fnmatch_lines([
+        '*= unused snapshots =*',
+        '2 unused snapshots (run pytest with --allow-snapshot-deletion to delete them):',
+        '  snapshots?test_module?test_a?old.txt',
+        '  snapshots?test_module?test_b?1?old.txt',
+    ])
+
+    # Deselected tests don't report their snapshots, nor the snapshots shared by their module.
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', '-k', 'test_a')
+    assert_outcomes(result, passed=1)
+    assert result.ret == 1
+    result.stdout.fnmatch_lines([
+        '1 unused snapshots (run pytest with --allow-snapshot-deletion to delete them):',
+        '  snapshots?test_module?test_a?old.txt',
+    ])
+
+    # Selecting a test on the command line means other tests of its module are not collected.
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', 'test_module.py::test_b')
+    result.stdout.fnmatch_lines([
+        '1 unused snapshots (run pytest with --allow-snapshot-deletion to delete them):',
+        '  snapshots?test_module?test_b?1?old.txt',
+    ])
+
+    # Snapshots of removed tests and test modules are reported once every test passes.
+    testdir.monkeypatch.delenv('FAIL')
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', '--allow-snapshot-deletion')
+    result.stdout.fnmatch_lines([
+        'Deleted 5 unused snapshots:',
+        '  snapshots?test_module?test_a?old.txt',
+        '  snapshots?test_module?test_b?1?old.txt',
+        '  snapshots?test_module?test_b?2?old.txt',
+        '  snapshots?test_module?test_removed?a.txt',
+        '  snapshots?test_removed_module?test_a?a.txt',
+    ])
+    assert snapshots_dir.join('test_b', '2', 'b.txt').check()
+
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', '-k', 'not test_b')
+    assert_outcomes(result, passed=1)
+    assert result.ret == 0
+    assert 'unused snapshots' not in result.stdout.str()
+
+
+def test_detect_unused_deselected_custom_dir(testdir):
+    testdir.makepyfile(test_module="""
+        def test_a(snapshot):
+            snapshot.snapshot_dir = 'snapshots/custom'
+            snapshot.assert_match('custom', 'custom.txt')
+
+        def test_b(snapshot):
+            snapshot.assert_match('b', 'b.txt')
+    """)
+    snapshots_dir = testdir.tmpdir.join('snapshots')
+    snapshots_dir.join('test_module', 'test_b', 'b.txt').write('b', ensure=True)
+    snapshots_dir.join('custom', 'custom.txt').write('custom', ensure=True)
+    snapshots_dir.join('custom', 'old.txt').write('old', ensure=True)
+
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', '--allow-snapshot-deletion', '-k', 'test_b')
+    assert_outcomes(result, passed=1)
+    assert result.ret == 0
+    assert snapshots_dir.join('custom', 'custom.txt').check()
+
+    result = testdir.runpytest('-v', '--snapshot-detect-unused')
+    assert_outcomes(result, passed=2)
+    result.stdout.fnmatch_lines([
+        '1 unused snapshots (run pytest with --allow-snapshot-deletion to delete them):',
+        '  snapshots?custom?old.txt',
+    ])
+
+
+def test_detect_unused_deselected_shared_snapshots(testdir):
+    testdir.makepyfile(test_module="""
+        import pytest
+
+        @pytest.fixture(scope='module')
+        def artifact(module_snapshot, session_snapshot):
+            module_snapshot.assert_match('module', 'module.txt')
+            session_snapshot.assert_match('session', 'session.txt')
+
+        def test_a(artifact, snapshot):
+            snapshot.snapshot_dir = 'snapshots/custom'
+            snapshot.assert_match('custom', 'custom.txt')
+
+        def test_b(snapshot):
+            snapshot.assert_match('b', 'b.txt')
+    """)
+    snapshots_dir = testdir.tmpdir.join('snapshots')
+    snapshots_dir.join('test_module', 'module-snapshots', 'module.txt').write('module', ensure=True)
+    snapshots_dir.join('test_module', 'module-snapshots', 'old.txt').write('old', ensure=True)
+    snapshots_dir.join('test_module', 'test_b', 'b.txt').write('b', ensure=True)
+    snapshots_dir.join('custom', 'custom.txt').write('custom', ensure=True)
+    snapshots_dir.join('custom', 'old.txt').write('old', ensure=True)
+    snapshots_dir.join('session.txt').write('session', ensure=True)
+    snapshots_dir.join('old.txt').write('old', ensure=True)
+
+    # The custom, module and session snapshots of deselected tests are never reported.
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', '--allow-snapshot-deletion', '-k', 'test_b')
+    assert_outcomes(result, passed=1)
+    assert result.ret == 0
+    assert 'unused snapshots' not in result.stdout.str()
+    assert snapshots_dir.join('test_module', 'module-snapshots', 'module.txt').check()
+    assert snapshots_dir.join('custom', 'custom.txt').check()
+    assert snapshots_dir.join('session.txt').check()
+
+    # Test modules that aren't collected as part of a directory may leave other tests out.
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', 'test_module.py')
+    result.stdout.fnmatch_lines([
+        '1 unused snapshots (run pytest with --allow-snapshot-deletion to delete them):',
+        '  snapshots?test_module?module-snapshots?old.txt',
+    ])
+
+    result = testdir.runpytest('-v', '--snapshot-detect-unused', '--allow-snapshot-deletion')
+    assert_outcomes(result, passed=2)
+    result.stdout.fnmatch_lines([
+        'Deleted 3 unused snapshots:',
+        '  snapshots?custom?old.txt',
+        '  snapshots?old.txt',
+        '  snapshots?test_module?module-snapshots?old.txt',
+    ])
+    assert snapshots_dir.join('test_module', 'module-snapshots', 'module.txt').check()
+    assert snapshots_dir.join('custom', 'custom.txt').check()
+    assert snapshots_dir.join('session.txt').check()
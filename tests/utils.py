@@ -25,3 +25,16 @@ def assert_pytest_passes(testdir):
     result = testdir.runpytest('-v')
     result.stdout.fnmatch_lines(['*::test_sth PASSED*'])
     assert result.ret == 0
+
+
+def assert_outcomes(result, passed=0, failed=0, errors=0):
+    """
+    Like `result.assert_outcomes`, which only accepts `errors` since pytest 6 (it was called `error` before).
+    """
+    outcomes = result.parseoutcomes()
+    actual = {
+        'passed': outcomes.get('passed', 0),
+        'failed': outcomes.get('failed', 0),
+        'errors': outcomes.get('errors', outcomes.get('error', 0)),
+    }
+    assert actual == {'passed': passed, 'failed': failed, 'errors': errors}